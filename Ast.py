@@ -0,0 +1,308 @@
+from Lexer import Token
+
+# Syntax tree of a Pytme program, built by Parser.pytme_pl:
+#   parser = Parser(tokens)
+#   program = parser.pytme_pl()
+#   print(Ast.dump(program))
+# Every node has the line and column of its first token. The classes only
+# declare __slots__, so a node costs its fields and nothing more (no
+# per-instance __dict__), which keeps the trees of large programs compact.
+# Operators are kept as their Token (Token.ADD, Token.ASSIGNADD, ...) and
+# literals as Python values.
+#
+# Expressions  : Literal, Name, Binary, Unary, Input
+# Statements   : Declaration (of Variables), Assign, Call, Display,
+#                Dispatch, If, For, While, DoWhile, Function
+# Program      : the top-level statements
+
+
+class Node:
+    """Base of the tree nodes, holding the source position."""
+
+    __slots__ = ("line", "column")
+
+    def fields(self):
+        """The names of the fields of the node, without the position."""
+        return type(self).__slots__
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields())
+        return f"{type(self).__name__}({values})"
+
+
+# expressions
+
+
+class Literal(Node):
+    """A constant: int for INTEGER, float for FLOAT, str for STRING and bool for BOOLEAN."""
+
+    __slots__ = ("value", "kind")
+
+    def __init__(self, value, kind, line, column):
+        self.value = value
+        self.kind = kind
+        self.line = line
+        self.column = column
+
+
+class Name(Node):
+    """A variable."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name, line, column):
+        self.name = name
+        self.line = line
+        self.column = column
+
+
+class Binary(Node):
+    """left operator right, operator is a Token of BINARY_POWERS."""
+
+    __slots__ = ("operator", "left", "right")
+
+    def __init__(self, operator, left, right, line, column):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.line = line
+        self.column = column
+
+
+class Unary(Node):
+    """operator operand, operator is Token.NOT."""
+
+    __slots__ = ("operator", "operand")
+
+    def __init__(self, operator, operand, line, column):
+        self.operator = operator
+        self.operand = operand
+        self.line = line
+        self.column = column
+
+
+class Input(Node):
+    """input(), the value of a declaration or an assignment."""
+
+    __slots__ = ()
+
+    def __init__(self, line, column):
+        self.line = line
+        self.column = column
+
+
+# statements
+
+
+class Declaration(Node):
+    """modifier kind name = value, name = value, ...
+
+    Attributes:
+        modifier : "plaza", "incantation", "absolute" or None
+        kind : the data type
+        variables : [Variable]
+    """
+
+    __slots__ = ("modifier", "kind", "variables")
+
+    def __init__(self, modifier, kind, variables, line, column):
+        self.modifier = modifier
+        self.kind = kind
+        self.variables = variables
+        self.line = line
+        self.column = column
+
+
+class Variable(Node):
+    """One name = value of a Declaration, value is None for a name alone."""
+
+    __slots__ = ("name", "value")
+
+    def __init__(self, name, value, line, column):
+        self.name = name
+        self.value = value
+        self.line = line
+        self.column = column
+
+
+class Assign(Node):
+    """target operator value, target is a variable name and operator Token.ASSIGN or an ASSIGNADD-like Token."""
+
+    __slots__ = ("target", "operator", "value")
+
+    def __init__(self, target, operator, value, line, column):
+        self.target = target
+        self.operator = operator
+        self.value = value
+        self.line = line
+        self.column = column
+
+
+class Call(Node):
+    """name(arguments)"""
+
+    __slots__ = ("name", "arguments")
+
+    def __init__(self, name, arguments, line, column):
+        self.name = name
+        self.arguments = arguments
+        self.line = line
+        self.column = column
+
+
+class Display(Node):
+    """display(value), value is None for display()."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value, line, column):
+        self.value = value
+        self.line = line
+        self.column = column
+
+
+class Dispatch(Node):
+    """dispatch value"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value, line, column):
+        self.value = value
+        self.line = line
+        self.column = column
+
+
+class If(Node):
+    """if/elseif branches as [(condition, body)], orelse is the else body or None."""
+
+    __slots__ = ("branches", "orelse")
+
+    def __init__(self, branches, orelse, line, column):
+        self.branches = branches
+        self.orelse = orelse
+        self.line = line
+        self.column = column
+
+
+class For(Node):
+    """for ( point variable = start ; condition ; increment++ ) { body }
+
+    variable and increment are names, start is the INTEGER Literal.
+    """
+
+    __slots__ = ("variable", "start", "condition", "increment", "body")
+
+    def __init__(self, variable, start, condition, increment, body, line, column):
+        self.variable = variable
+        self.start = start
+        self.condition = condition
+        self.increment = increment
+        self.body = body
+        self.line = line
+        self.column = column
+
+
+class While(Node):
+    """while ( condition ) { body }"""
+
+    __slots__ = ("condition", "body")
+
+    def __init__(self, condition, body, line, column):
+        self.condition = condition
+        self.body = body
+        self.line = line
+        self.column = column
+
+
+class DoWhile(Node):
+    """do { body } while ( condition );"""
+
+    __slots__ = ("body", "condition")
+
+    def __init__(self, body, condition, line, column):
+        self.body = body
+        self.condition = condition
+        self.line = line
+        self.column = column
+
+
+class Function(Node):
+    """modifier returns name( parameters ) { body }
+
+    Attributes:
+        modifier : "plaza", "incantation", "absolute" or None
+        returns : the return type, a data type or "abyss"
+        parameters : [(data type, name)]
+    """
+
+    __slots__ = ("modifier", "returns", "name", "parameters", "body")
+
+    def __init__(self, modifier, returns, name, parameters, body, line, column):
+        self.modifier = modifier
+        self.returns = returns
+        self.name = name
+        self.parameters = parameters
+        self.body = body
+        self.line = line
+        self.column = column
+
+
+class Program(Node):
+    """The top-level statements of a file."""
+
+    __slots__ = ("statements",)
+
+    def __init__(self, statements, line=1, column=1):
+        self.statements = statements
+        self.line = line
+        self.column = column
+
+
+def children(node):
+    """The nodes directly below a node, in source order."""
+    for name in node.fields():
+        yield from nodesIn(getattr(node, name))
+
+
+def nodesIn(value):
+    # the nodes in a field: a node, or lists and tuples of them (bodies, branches)
+    if isinstance(value, Node):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from nodesIn(item)
+
+
+def walk(node):
+    """Every node of the tree below and including node, parents first."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(children(node))))
+
+
+def dump(node, indent=0):
+    """The tree as indented text, one node per line."""
+    lines = []
+    dumpInto(node, indent, lines)
+    return "\n".join(lines)
+
+
+def dumpInto(node, indent, lines):
+    pad = "  " * indent
+    scalars = []
+    nested = []
+    for name in node.fields():
+        value = getattr(node, name)
+        if any(True for _ in nodesIn(value)):
+            nested.append((name, value))
+        elif isinstance(value, Token):
+            scalars.append(f"{name}={value.name}")
+        else:
+            scalars.append(f"{name}={value!r}")
+    lines.append(" ".join([pad + type(node).__name__] + scalars + [f"@{node.line}:{node.column}"]))
+    for name, value in nested:
+        lines.append(f"{pad}  .{name}")
+        for child in nodesIn(value):
+            dumpInto(child, indent + 2, lines)
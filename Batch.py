@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from Cache import DEFAULT_MAX_BYTES, Cache, parseOutcome
+from Lexer import Lexer
+
+# Batch checking of many .pyt files:
+#   python Main.py scripts/ more/file.pyt --batch
+# The files are lexed and parsed in a ProcessPoolExecutor sized to the
+# machine, one result per file is collected into a report and the exit code
+# is non-zero when any file fails. No symbol table is written. With a cache
+# directory, unchanged files are answered from the Cache.
+
+
+def collectFiles(paths):
+    """Expand the paths into the sorted list of .pyt files they name.
+
+    Args:
+        paths ([string]): files and directories, directories are searched recursively
+    """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.update(os.path.join(root, name) for name in names if name.lower().endswith(".pyt"))
+        else:
+            files.add(path)
+    return sorted(files)
+
+
+def checkFile(address, engine="table", cache=None, cacheSize=None):
+    """Lex and parse one file, in a worker process.
+
+    Returns:
+        dict: file, status ("ok", "syntax error" or "error"), line, column and
+              message of the first error, every syntax error (see
+              Cache.parseOutcome), lex/parse times in seconds and whether the
+              result came from the cache
+    """
+    result = {
+        "file": address,
+        "status": "ok",
+        "line": None,
+        "column": None,
+        "message": None,
+        "errors": [],
+        "cached": False,
+    }
+    start = time.perf_counter()
+    if cache is not None:
+        return checkCached(address, Cache(cache, cacheSize or DEFAULT_MAX_BYTES, engine), result, start)
+    parsed = start
+    try:
+        with open(address, "r") as myfile:
+            lines = myfile.readlines()
+        lexer = Lexer(engine)
+        lexer.processText(lines)
+        parsed = time.perf_counter()
+        result.update(parseOutcome(lexer.lexemeList))
+    except Exception as error:
+        result.update(status="error", message=f"{type(error).__name__}: {error}")
+    end = time.perf_counter()
+    if parsed == start:  # failed before parsing
+        parsed = end
+    result["lexSeconds"] = parsed - start
+    result["parseSeconds"] = end - parsed
+    return result
+
+
+def checkCached(address, cache, result, start):
+    # checkFile through the Cache
+    try:
+        with open(address, "rb") as myfile:
+            data = myfile.read()
+        _, outcome, hit = cache.check(data)
+        result.update(outcome, cached=hit)
+    except Exception as error:
+        result.update(status="error", message=f"{type(error).__name__}: {error}")
+    # lexing and parsing are not told apart
+    result["lexSeconds"] = time.perf_counter() - start
+    result["parseSeconds"] = 0.0
+    return result
+
+
+def runBatch(files, workers=None, engine="table", cache=None, cacheSize=None):
+    """Check the files in parallel.
+
+    Args:
+        files ([string]): the .pyt files
+        workers (int): number of processes, defaults to the number of CPUs
+        engine (string): Lexer engine used by the workers
+        cache (string): cache directory, None to lex and parse every file
+        cacheSize (int): size limit of the cache in bytes
+
+    Returns:
+        [dict]: the checkFile result of every file, in the order of files
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) <= 1:
+        return [checkFile(address, engine, cache, cacheSize) for address in files]
+
+    # a few chunks per worker keeps them busy without paying IPC per file
+    chunksize = max(1, len(files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        count = len(files)
+        return list(
+            executor.map(checkFile, files, [engine] * count, [cache] * count, [cacheSize] * count, chunksize=chunksize)
+        )
+
+
+def writeReport(results, elapsed, sink):
+    """Write the per-file statuses and a summary line to a text sink."""
+    for result in results:
+        if result["status"] == "ok":
+            sink.write(f"ok            {result['file']}\n")
+        elif result["status"] == "syntax error":
+            label = "syntax error"
+            for error in result["errors"]:
+                sink.write(f"{label:14}{result['file']}:{error['line']}:{error['column']}: {error['message']}\n")
+                label = ""
+        else:
+            sink.write(f"error         {result['file']}: {result['message']}\n")
+
+    failed = sum(result["status"] != "ok" for result in results)
+    cached = sum(result["cached"] for result in results)
+    lexSeconds = sum(result["lexSeconds"] for result in results)
+    parseSeconds = sum(result["parseSeconds"] for result in results)
+    sink.write(
+        f"{len(results)} files, {failed} failed, {cached} cached in {elapsed:.2f}s "
+        f"(lex {lexSeconds:.2f}s, parse {parseSeconds:.2f}s of CPU in the workers)\n"
+    )
+
+
+def main(paths, workers=None, engine="table", jsonPath=None, sink=None, cache=None, cacheSize=None):
+    """Check the paths, report and return the exit code (1 if any file failed)."""
+    files = collectFiles(paths)
+    start = time.perf_counter()
+    results = runBatch(files, workers, engine, cache, cacheSize)
+    elapsed = time.perf_counter() - start
+
+    if sink is not None:
+        writeReport(results, elapsed, sink)
+    if jsonPath is not None:
+        with open(jsonPath, "w") as file:
+            json.dump({"elapsed": elapsed, "files": results}, file, indent=1)
+    return 1 if any(result["status"] != "ok" for result in results) else 0
@@ -0,0 +1,408 @@
+import argparse
+import io
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+import Generator
+import Interpreter
+from Lexer import KEYWORDS, OPERATOR_TOKENS, Lexer, State, Token, TokenList
+from Parser import Parser
+from Runtime import Console
+import SymbolTable
+import Transpiler
+import VM
+
+# Compares the Lexer engines on a .pyt file:
+#   python Benchmark.py myfile.pyt --scale 2000 --repeat 3
+# The file is concatenated --scale times to get a large input, every engine
+# lexes it --repeat times and the best time is reported. With --memory the
+# retained size of the token stream is compared against plain list records,
+# with --classify the cost of classifying one lexeme is measured on an
+# identifier-heavy corpus (the file argument is then ignored). --offsets lexes
+# into an OffsetTokenList of source offsets.
+#
+# --suite ignores the file too and measures the scaling of every phase on
+# programs from Generator, for each of --sizes (lines) and --shapes:
+#   python Benchmark.py --suite --sizes 1000 10000 100000 --json before.json
+# lex, the symbol table writers (to memory) and parse are each reported in
+# tokens/s, MB/s of source and peak traced memory. The JSON file records the
+# git commit, so runs of two commits can be compared side by side.
+#
+# --execute ignores the file too and times the execution engines on the
+# loop-heavy programs of EXECUTE_PROGRAMS, --iterations scaling their loops:
+#   python Benchmark.py --execute --iterations 100000 --json vm.json
+# Parsing is not timed, compiling (to bytecode or to Python) is. The speedup
+# is reported against the tree-walking interpreter and the output of every
+# engine must match its output.
+
+
+def loadLines(address, scale):
+    with open(address, "r") as myfile:
+        lines = myfile.readlines()
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] = lines[-1] + "\n"
+    return lines * scale
+
+
+def timeEngine(engine, lines, repeat, offsets=False):
+    best = None
+    lexemeList = None
+    for _ in range(repeat):
+        lexer = Lexer(engine, offsets)
+        start = time.perf_counter()
+        lexer.processText(lines)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+        lexemeList = lexer.lexemeList
+    return best, lexemeList
+
+
+def firstDifference(expected, actual):
+    for index, (a, b) in enumerate(zip(expected, actual)):
+        if list(a) != list(b):
+            return index, a, b
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual)), len(expected), len(actual)
+    return None
+
+
+def compareEngines(lines, engines, repeat, offsets=False):
+    size = sum(len(line) for line in lines)
+    print(f"{len(lines)} lines, {size} characters")
+
+    baseline = None
+    for engine in engines:
+        elapsed, lexemeList = timeEngine(engine, lines, repeat, offsets)
+        if baseline is None:
+            baseline = (elapsed, lexemeList)
+            status = "baseline"
+        else:
+            difference = firstDifference(baseline[1], lexemeList)
+            status = "identical" if difference is None else f"DIFFERS at token {difference}"
+            status = f"{baseline[0] / elapsed:.2f}x, {status}"
+        print(f"{engine:8} {elapsed:8.3f}s  {len(lexemeList) / elapsed:12.0f} tokens/s  {status}")
+
+
+def retainedBytes(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def freshRecords(records):
+    # copies of the lexemes, as the lexer builds a new string for every token
+    for lexeme, line, col, token in records:
+        yield ["".join(list(lexeme)), line, col, token]
+
+
+def compareFootprint(lines):
+    lexer = Lexer("table")
+    lexer.processText(lines)
+    records = list(lexer.lexemeList)
+    del lexer
+
+    listSize = retainedBytes(lambda: list(freshRecords(records)))
+    compactSize = retainedBytes(lambda: TokenList(freshRecords(records)))
+    print(f"list records {listSize / len(records):8.1f} bytes/token")
+    print(f"TokenList    {compactSize / len(records):8.1f} bytes/token  ({compactSize / listSize:.0%} of list records)")
+
+    # the source is held by the caller anyway, only the offset columns are retained
+    source = "".join(lines)
+    offsetSize = retainedBytes(lambda: offsetTokens(source, lines))
+    print(f"offsets      {offsetSize / len(records):8.1f} bytes/token  ({offsetSize / listSize:.0%} of list records)")
+
+
+def offsetTokens(source, lines):
+    lexer = Lexer("table", offsets=True)
+    lexer.processText(lines)
+    lexemeList = lexer.lexemeList
+    lexemeList.source = source  # share the caller's copy
+    return lexemeList
+
+
+def linearClassify(lexeme, state, keywordList=sorted(KEYWORDS) * 2):
+    # classification as it was done before the lookup tables: a linear scan
+    # of the keyword list and an elif chain over the operators
+    if state == State.string:
+        if lexeme in ["true", "false"]:
+            return Token.BOOLEAN
+        elif lexeme in keywordList:
+            return Token.KEYWORD
+        return Token.IDENTIFIER
+    for operator, token in OPERATOR_TOKENS.items():
+        if lexeme == operator:
+            return token
+    return Token.INVALID
+
+
+def classificationCorpus(size, seed=0):
+    rnd = random.Random(seed)
+    keywords = sorted(KEYWORDS)
+    operators = sorted(OPERATOR_TOKENS)
+    corpus = []
+    for _ in range(size):
+        roll = rnd.random()
+        if roll < 0.7:
+            word = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(1, 10)))
+            corpus.append((word, State.string))
+        elif roll < 0.85:
+            corpus.append((rnd.choice(keywords), State.string))
+        else:
+            corpus.append((rnd.choice(operators), State.operator))
+    return corpus
+
+
+def compareClassification(size, repeat):
+    corpus = classificationCorpus(size)
+    classify = Lexer().getTokenBeforeAppend
+
+    results = {}
+    for name, function in [("linear scan", linearClassify), ("lookup tables", classify)]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tokens = [function(lexeme, state) for lexeme, state in corpus]
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = tokens
+        print(f"{name:14} {best / size * 1e9:8.1f} ns/lexeme")
+
+    if results["linear scan"] != results["lookup tables"]:
+        print("DIFFERENT classifications")
+
+
+SUITE_SIZES = [1000, 10000, 100000]
+
+# phase name and the function timed on the tokens of the table engine, after
+# a "lex <engine>" phase for every engine
+SUITE_PHASES = [
+    ("table text", lambda tokens: SymbolTable.writeText(tokens, io.StringIO())),
+    ("table jsonl", lambda tokens: SymbolTable.writeJsonl(tokens, io.StringIO())),
+    ("table binary", lambda tokens: SymbolTable.writeBinary(tokens, io.BytesIO())),
+    ("parse", lambda tokens: Parser(parserTokens(tokens), pause_gc=True).pytme_pl()),
+]
+
+
+def parserTokens(tokens):
+    # Parser does not skip comments, the comments shape is parsed without them
+    return TokenList(record for record in tokens if record[3] != Token.COMMENT)
+
+
+def measure(function, repeat):
+    """Best wall time of repeat calls, and the peak traced memory of one more.
+
+    The peak is taken in a separate call, tracemalloc would slow the timed ones.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def currentCommit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def runSuite(sizes, shapes, engines=Lexer.ENGINES, repeat=3, seed=0):
+    """Measure lexing with the engines and every phase of SUITE_PHASES on generated programs.
+
+    Returns:
+        [dict]: one result per shape, size and phase with seconds, tokens/s,
+                MB/s of source and the peak traced memory in bytes
+    """
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            lines = Generator.generate(size, shape, seed)
+            megabytes = sum(len(line) for line in lines) / 1e6
+            lexer = Lexer("table")
+            lexer.processText(lines)
+            tokens = lexer.lexemeList
+            del lexer
+            phases = [(f"lex {engine}", lambda engine=engine: Lexer(engine).processText(lines)) for engine in engines]
+            phases += [(phase, lambda function=function: function(tokens)) for phase, function in SUITE_PHASES]
+            for phase, function in phases:
+                seconds, peak = measure(function, repeat)
+                result = {
+                    "shape": shape,
+                    "lines": len(lines),
+                    "tokens": len(tokens),
+                    "phase": phase,
+                    "seconds": seconds,
+                    "tokensPerSecond": len(tokens) / seconds,
+                    "megabytesPerSecond": megabytes / seconds,
+                    "peakBytes": peak,
+                }
+                results.append(result)
+                print(
+                    f"{shape:11} {len(lines):8} lines  {phase:12} {seconds:8.3f}s  "
+                    f"{result['tokensPerSecond']:11.0f} tokens/s  {result['megabytesPerSecond']:7.2f} MB/s  "
+                    f"peak {peak / 1e6:8.2f} MB"
+                )
+    return results
+
+
+# loop-heavy programs of --execute, ITERATIONS is replaced by --iterations
+# (primes searches up to a twentieth of it, its inner loop grows with n)
+EXECUTE_PROGRAMS = {
+    "count": """point total = 0  ;
+for ( point i = 0  ; i < ITERATIONS  ; i++ ){
+    total += i %  7  ;
+}
+display( total );
+""",
+    "floats": """figure x = 0.5  ;
+figure sum = 0.0  ;
+point i = 0  ;
+do {
+    sum += x *  x /  ( x +  1.0  ) ;
+    x += 0.25  ;
+    i += 1  ;
+ } while ( i < ITERATIONS  );
+display( sum );
+""",
+    "calls": """point acc = 0  ;
+abyss last = 0  ;
+plaza abyss step( point k){
+    abyss seen = k ;
+    acc += k %  3  ;
+    last = seen ;
+}
+for ( point i = 0  ; i < ITERATIONS  ; i++ ){
+    step( i );
+}
+display( acc );
+display( last );
+""",
+    "primes": """point count = 0  ;
+point n = 2  ;
+while ( n < ITERATIONS  /_  20  ) {
+    point d = 2  ;
+    truth prime = true ;
+    while ( d *  d < n +  1  && prime ) {
+        if ( n %  d < 1  ) {
+            prime = false ;
+        }
+        d += 1  ;
+    }
+    if ( prime ) {
+        count += 1  ;
+    }
+    n += 1  ;
+}
+display( count );
+""",
+}
+
+EXECUTE_ENGINES = {"tree": Interpreter.run, "vm": VM.run, "python": Transpiler.run}
+
+
+def parseProgram(source):
+    lexer = Lexer()
+    lexer.processText(source.splitlines(keepends=True))
+    return Parser(lexer.lexemeList).pytme_pl()
+
+
+def runExecution(programs, engines, iterations, repeat=3):
+    """Time the engines on EXECUTE_PROGRAMS, the first engine is the baseline.
+
+    Returns:
+        [dict]: one result per program and engine with seconds, the speedup
+                over the baseline and whether the output matched it
+    """
+    results = []
+    for name in programs:
+        program = parseProgram(EXECUTE_PROGRAMS[name].replace("ITERATIONS", str(iterations)))
+        baseline = None
+        for engine in engines:
+            output = io.StringIO()
+            run = EXECUTE_ENGINES[engine]
+
+            def execute():
+                output.seek(0)
+                output.truncate()
+                run(program, Console(output))
+
+            seconds = measure(execute, repeat)[0]
+            if baseline is None:
+                baseline = (seconds, output.getvalue())
+            result = {
+                "program": name,
+                "iterations": iterations,
+                "engine": engine,
+                "seconds": seconds,
+                "speedup": baseline[0] / seconds,
+                "identical": output.getvalue() == baseline[1],
+            }
+            results.append(result)
+            status = "identical" if result["identical"] else "DIFFERENT output"
+            print(f"{name:8} {engine:6} {seconds:8.3f}s  {result['speedup']:6.2f}x  {status}")
+    return results
+
+
+def writeSuite(results, path):
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "commit": currentCommit(),
+                "python": platform.python_version(),
+                "results": results,
+            },
+            file,
+            indent=1,
+        )
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Benchmark the Pytme lexer engines.")
+    argParser.add_argument("file", nargs="?", help="the .pyt file to lex")
+    argParser.add_argument("--scale", type=int, default=1, help="number of copies of the file to lex at once")
+    argParser.add_argument("--repeat", type=int, default=3, help="runs per engine, the best one is reported")
+    argParser.add_argument("--engines", nargs="+", default=Lexer.ENGINES, choices=Lexer.ENGINES)
+    argParser.add_argument("--memory", action="store_true", help="compare the token stream footprint instead")
+    argParser.add_argument("--offsets", action="store_true", help="store tokens as source offsets")
+    argParser.add_argument("--classify", type=int, metavar="N", help="time lexeme classification on N lexemes instead")
+    argParser.add_argument("--suite", action="store_true", help="measure every phase on generated programs instead")
+    argParser.add_argument("--sizes", type=int, nargs="+", default=SUITE_SIZES, help="program sizes of --suite, in lines")
+    argParser.add_argument("--shapes", nargs="+", default=Generator.SHAPES, choices=Generator.SHAPES)
+    argParser.add_argument("--execute", action="store_true", help="time the execution engines on loop-heavy programs instead")
+    argParser.add_argument("--programs", nargs="+", default=list(EXECUTE_PROGRAMS), choices=EXECUTE_PROGRAMS)
+    argParser.add_argument("--runners", nargs="+", default=list(EXECUTE_ENGINES), choices=EXECUTE_ENGINES, help="execution engines of --execute, the first is the baseline")
+    argParser.add_argument("--iterations", type=int, default=100000, help="loop bound of the --execute programs")
+    argParser.add_argument("--json", metavar="PATH", help="also write the --suite or --execute results to a JSON file")
+    args = argParser.parse_args()
+    if args.file is None and not (args.suite or args.classify or args.execute):
+        argParser.error("a .pyt file is required unless --suite, --classify or --execute is given")
+
+    if args.suite:
+        results = runSuite(args.sizes, args.shapes, args.engines, args.repeat)
+        if args.json:
+            writeSuite(results, args.json)
+    elif args.execute:
+        results = runExecution(args.programs, args.runners, args.iterations, args.repeat)
+        if args.json:
+            writeSuite(results, args.json)
+    elif args.classify:
+        compareClassification(args.classify, args.repeat)
+    elif args.memory:
+        compareFootprint(loadLines(args.file, args.scale))
+    else:
+        compareEngines(loadLines(args.file, args.scale), args.engines, args.repeat, args.offsets)
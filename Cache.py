@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import struct
+from Lexer import LEXER_VERSION, Lexer
+from Parser import PARSER_VERSION, Parser
+import SymbolTable
+
+# On-disk cache of the token stream and parse outcome of .pyt files, like
+# __pycache__ for Python. An entry is keyed by the SHA-256 of the file's
+# bytes, the lexer engine and LEXER_VERSION/PARSER_VERSION, so a changed file
+# or a new lexer or parser never hits a stale entry. Every entry is one file:
+#   a JSON line with the parse outcome
+#   the tokens in SymbolTable's binary format
+# Loading an entry touches it, and storing one evicts the least recently used
+# entries once the directory grows beyond maxBytes.
+
+DEFAULT_DIRECTORY = ".pytmecache"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+EXTENSION = ".pytc"
+
+
+def parseOutcome(tokens):
+    """Parse the tokens and describe the result as a JSON-friendly dict.
+
+    Returns:
+        dict: {"status": "ok"} or {"status": "syntax error", "line", "column",
+              "message"} of the first error and "errors", the Diagnostic.to_dict
+              of every error
+    """
+    parser = Parser(tokens)
+    parser.pytme_pl()
+    if not parser.diagnostics:
+        return {"status": "ok"}
+    first = parser.diagnostics[0]
+    return {
+        "status": "syntax error",
+        "line": first.line,
+        "column": first.column,
+        "message": first.message,
+        "errors": [diagnostic.to_dict() for diagnostic in parser.diagnostics],
+    }
+
+
+class Cache:
+    """A size-bounded, content-addressed cache directory.
+
+    Attributes:
+        directory : where the entries are stored
+        maxBytes : total size of the entries kept by eviction
+        engine : Lexer engine of the cached tokens
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, maxBytes=DEFAULT_MAX_BYTES, engine="table"):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.engine = engine
+
+    def key(self, data):
+        """Key of the source bytes, in hexadecimal."""
+        digest = hashlib.sha256(f"{LEXER_VERSION}:{PARSER_VERSION}:{self.engine}:".encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, data):
+        return os.path.join(self.directory, self.key(data) + EXTENSION)
+
+    def load(self, data):
+        """Get the cached (tokens, outcome) of the source bytes, or None on a miss."""
+        path = self.path(data)
+        try:
+            with open(path, "rb") as file:
+                outcome = json.loads(file.readline())
+                tokens = SymbolTable.readBinary(file)
+            os.utime(path)  # most recently used
+        except (OSError, ValueError, struct.error):
+            return None  # missing, evicted meanwhile or damaged
+        return tokens, outcome
+
+    def store(self, data, tokens, outcome):
+        """Cache the tokens and parse outcome of the source bytes."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(data)
+        # written aside and renamed, so concurrent readers never see half an entry
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(json.dumps(outcome).encode() + b"\n")
+            SymbolTable.writeBinary(tokens, file)
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in maxBytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(EXTENSION):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.maxBytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by another process
+            total -= size
+
+    def check(self, data):
+        """Lex and parse the source bytes unless they are cached.
+
+        Returns:
+            tuple: (tokens, outcome, hit), hit is True when nothing was lexed or parsed
+        """
+        entry = self.load(data)
+        if entry is not None:
+            return entry[0], entry[1], True
+
+        lexer = Lexer(self.engine)
+        lexer.processBuffer(data)
+        outcome = parseOutcome(lexer.lexemeList)
+        self.store(data, lexer.lexemeList, outcome)
+        return lexer.lexemeList, outcome, False
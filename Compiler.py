@@ -0,0 +1,447 @@
+import Ast
+from Lexer import Token
+import Runtime
+
+# Compiler of the Ast built by Parser into bytecode for the VM:
+#   code = Compiler.compileProgram(parser.pytme_pl())
+#   print(Compiler.disassemble(code))
+# The bytecode of the program and of every function is a flat list of ints,
+# two per instruction: the opcode and its argument (0 when it takes none).
+# Variables are resolved while compiling: the variables of a function are
+# slots of a list in its frame and the globals are slots of one list, so no
+# name is looked up while running. A value stored in a declared variable is
+# converted to its type, unless the compiler can tell it already has it.
+
+# opcodes
+CONST = 0  # push constants[arg]
+LOAD_LOCAL = 1  # push the local variable arg
+STORE_LOCAL = 2  # pop into the local variable arg
+LOAD_GLOBAL = 3  # push the declared global arg
+LOAD_UNTYPED = 4  # push the untyped global arg, which may not be assigned yet
+STORE_GLOBAL = 5  # pop into the global arg
+ADD = 6  # replace the two top values by their sum (Runtime.add)
+BINARY = 7  # replace the two top values by BINARY_OPERATORS[arg] applied to them
+JUMP = 8  # continue at arg
+JUMP_IF_FALSE = 9  # pop, continue at arg if it is false
+JUMP_IF_TRUE = 10  # pop, continue at arg if it is true
+JUMP_IF_FALSE_OR_POP = 11  # if the top is false replace it by false and continue at arg, else pop (&&)
+JUMP_IF_TRUE_OR_POP = 12  # if the top is true replace it by true and continue at arg, else pop (||)
+NOT = 13  # replace the top by its negation
+TRUTH = 14  # replace the top by its truth value
+CONVERT = 15  # convert the top to Runtime.DATA_TYPES[arg]
+DISPLAY = 16  # display the popped value, or an empty line when arg is 0
+INPUT = 17  # push a line of input
+CALL = 18  # call the function constants[arg] = (name, number of arguments) with the arguments popped
+RETURN = 19  # pop the dispatched value and return to the caller
+FUNCTION = 20  # define the function of the Code constants[arg]
+HALT = 21  # end the program
+ADD_CONST = 22  # add constants[arg] to the top value
+BINARY_CONST = 23  # apply constants[arg] = (operation, right operand) to the top value
+INCREMENT_LOCAL = 24  # add 1 to the local point variable arg
+INCREMENT_GLOBAL = 25  # add 1 to the global point variable arg
+
+OPCODE_NAMES = [
+    "CONST",
+    "LOAD_LOCAL",
+    "STORE_LOCAL",
+    "LOAD_GLOBAL",
+    "LOAD_UNTYPED",
+    "STORE_GLOBAL",
+    "ADD",
+    "BINARY",
+    "JUMP",
+    "JUMP_IF_FALSE",
+    "JUMP_IF_TRUE",
+    "JUMP_IF_FALSE_OR_POP",
+    "JUMP_IF_TRUE_OR_POP",
+    "NOT",
+    "TRUTH",
+    "CONVERT",
+    "DISPLAY",
+    "INPUT",
+    "CALL",
+    "RETURN",
+    "FUNCTION",
+    "HALT",
+    "ADD_CONST",
+    "BINARY_CONST",
+    "INCREMENT_LOCAL",
+    "INCREMENT_GLOBAL",
+]
+
+# the operators of BINARY, by argument
+BINARY_OPERATORS = [operator for operator in Runtime.OPERATIONS if operator != Token.ADD]
+BINARY_INDEX = {operator: index for index, operator in enumerate(BINARY_OPERATORS)}
+# the operator of every function of Runtime.OPERATIONS, for BINARY_CONST
+OPERATORS = {function: operator for operator, function in Runtime.OPERATIONS.items()}
+
+# the name of the Code of the top-level statements
+PROGRAM = "<program>"
+
+LITERAL_KINDS = {Token.INTEGER: "point", Token.FLOAT: "figure", Token.STRING: "party", Token.BOOLEAN: "truth"}
+TEXT_KINDS = ("party", "avatar")
+NUMBER_KINDS = ("point", "figure", "truth")
+TRUTH_OPERATORS = frozenset(
+    [Token.LESS, Token.GREAT, Token.LESSEQ, Token.GREATQ, Token.EQUAL, Token.NOTEQUAL, Token.AND, Token.OR]
+)
+
+
+class Code:
+    """The bytecode of the program or of one function.
+
+    Attributes:
+        name : the function name, "<program>" for the top-level statements
+        instructions : [opcode, argument, opcode, argument, ...]
+        lines : the source line of every instruction, for runtime errors
+        constants : the values of CONST, CALL and FUNCTION
+        parameters : number of parameters, the first local variables
+        converters : (slot, Runtime converter) of the typed parameters, applied to the arguments
+        defaults : the initial values of the other local variables
+        localNames : the names of the local variables, by slot
+        globalNames : the names of the globals, by slot, shared by all the Code of a program
+    """
+
+    __slots__ = (
+        "name",
+        "instructions",
+        "lines",
+        "constants",
+        "parameters",
+        "converters",
+        "defaults",
+        "localNames",
+        "globalNames",
+    )
+
+    def __init__(self, name, globalNames) -> None:
+        self.name = name
+        self.instructions = []
+        self.lines = []
+        self.constants = []
+        self.parameters = 0
+        self.converters = []
+        self.defaults = []
+        self.localNames = []
+        self.globalNames = globalNames
+
+
+class Compiler:
+    """Compiles an Ast.Program into the Code of its top-level statements.
+
+    Attributes:
+        globalSlots : {name: slot} of every global of the program
+        globalKinds : {name: data type} of the declared globals
+    """
+
+    def __init__(self) -> None:
+        self.globalSlots = {}
+        self.globalKinds = {}
+        self.globalNames = []
+        # the scope being compiled
+        self.code = None
+        self.localSlots = {}  # {name: slot}, empty at the top level
+        self.localKinds = {}
+        self.returns = None
+        self.constantIndex = {}
+        self.line = 1
+
+    def compileProgram(self, program):
+        """The Code of the program, the Code of its functions are among its constants."""
+        self.globalKinds = Runtime.declaredKinds(program.statements)
+        code = self.enter(PROGRAM, {}, None)
+        # the declared globals exist from the start
+        for name, kind in self.globalKinds.items():
+            self.emit(CONST, self.constant(Runtime.DEFAULTS.get(kind)))
+            self.emit(STORE_GLOBAL, self.globalSlot(name))
+        self.block(program.statements)
+        self.emit(HALT)
+        return code
+
+    def enter(self, name, kinds, returns):
+        # start the Code of a scope with the local variables kinds
+        self.code = Code(name, self.globalNames)
+        self.localSlots = {name: slot for slot, name in enumerate(kinds)}
+        self.localKinds = kinds
+        self.returns = returns
+        self.constantIndex = {}
+        self.code.localNames = list(kinds)
+        return self.code
+
+    # emitting
+    def emit(self, opcode, argument=0):
+        self.code.instructions += (opcode, argument)
+        self.code.lines.append(self.line)
+
+    def jump(self, opcode):
+        # emit a jump, its target is set by land
+        self.emit(opcode)
+        return len(self.code.instructions) - 1
+
+    def land(self, jump):
+        # make a jump continue at the next instruction
+        self.code.instructions[jump] = len(self.code.instructions)
+
+    def constant(self, value, key=None):
+        # the index of a constant, 1 and 1.0 and true are kept apart
+        key = (type(value), value) if key is None else key
+        if key not in self.constantIndex:
+            self.constantIndex[key] = len(self.code.constants)
+            self.code.constants.append(value)
+        return self.constantIndex[key]
+
+    def globalSlot(self, name):
+        if name not in self.globalSlots:
+            self.globalSlots[name] = len(self.globalNames)
+            self.globalNames.append(name)
+        return self.globalSlots[name]
+
+    def kindOf(self, name):
+        if name in self.localSlots:
+            return self.localKinds[name]
+        return self.globalKinds.get(name)
+
+    def load(self, name):
+        if name in self.localSlots:
+            self.emit(LOAD_LOCAL, self.localSlots[name])
+        elif name in self.globalKinds:
+            self.emit(LOAD_GLOBAL, self.globalSlot(name))
+        else:
+            self.emit(LOAD_UNTYPED, self.globalSlot(name))
+
+    def store(self, name, valueKind):
+        # store the top value, converted to the type of the variable
+        self.convert(self.kindOf(name), valueKind)
+        if name in self.localSlots:
+            self.emit(STORE_LOCAL, self.localSlots[name])
+        else:
+            self.emit(STORE_GLOBAL, self.globalSlot(name))
+
+    def convert(self, kind, valueKind):
+        if kind not in Runtime.CONVERTER or kind == valueKind:
+            return
+        if kind in TEXT_KINDS and valueKind in TEXT_KINDS:
+            return
+        self.emit(CONVERT, Runtime.DATA_TYPES.index(kind))
+
+    # statements
+    def block(self, statements):
+        line = self.line
+        for statement in statements:
+            self.line = statement.line
+            self.statement(statement)
+        self.line = line
+
+    def statement(self, node):
+        kind = type(node)
+        if kind is Ast.Declaration:
+            for variable in node.variables:
+                if variable.value is None:
+                    self.emit(CONST, self.constant(Runtime.DEFAULTS.get(self.kindOf(variable.name))))
+                    self.store(variable.name, self.kindOf(variable.name))
+                else:
+                    self.store(variable.name, self.expression(variable.value))
+        elif kind is Ast.Assign:
+            if node.operator == Token.ASSIGN:
+                valueKind = self.expression(node.value)
+            else:
+                self.load(node.target)
+                valueKind = self.operation(Runtime.ASSIGN_OPERATORS[node.operator], self.kindOf(node.target), node.value)
+            self.store(node.target, valueKind)
+        elif kind is Ast.Call:
+            for argument in node.arguments:
+                self.expression(argument)
+            self.emit(CALL, self.constant((node.name, len(node.arguments))))
+        elif kind is Ast.Display:
+            if node.value is None:
+                self.emit(DISPLAY, 0)
+            else:
+                self.expression(node.value)
+                self.emit(DISPLAY, 1)
+        elif kind is Ast.Dispatch:
+            valueKind = self.expression(node.value)
+            if self.code.name == PROGRAM:
+                self.emit(HALT)
+            else:
+                self.convert(self.returns, valueKind)
+                self.emit(RETURN)
+        elif kind is Ast.If:
+            self.ifStatement(node)
+        elif kind is Ast.For:
+            self.forStatement(node)
+        elif kind is Ast.While:
+            start = self.jump(JUMP)
+            body = len(self.code.instructions)
+            self.block(node.body)
+            self.land(start)
+            self.condition(node.condition, JUMP_IF_TRUE, body)
+        elif kind is Ast.DoWhile:
+            body = len(self.code.instructions)
+            self.block(node.body)
+            self.condition(node.condition, JUMP_IF_TRUE, body)
+        elif kind is Ast.Function:
+            self.emit(FUNCTION, self.constant(self.function(node)))
+
+    def condition(self, node, opcode, target):
+        # evaluate the condition and jump to target on its truth
+        if type(node) is Ast.Literal:
+            # a constant condition (see Optimizer) jumps always or never
+            if bool(node.value) == (opcode == JUMP_IF_TRUE):
+                self.emit(JUMP, target)
+            return
+        self.expression(node)
+        self.emit(opcode, target)
+
+    def ifStatement(self, node):
+        ends = []
+        for index, (condition, body) in enumerate(node.branches):
+            self.expression(condition)
+            skip = self.jump(JUMP_IF_FALSE)
+            self.block(body)
+            if index < len(node.branches) - 1 or node.orelse is not None:
+                ends.append(self.jump(JUMP))
+            self.land(skip)
+        if node.orelse is not None:
+            self.block(node.orelse)
+        for end in ends:
+            self.land(end)
+
+    def forStatement(self, node):
+        # the condition is tested at the bottom, one jump per iteration
+        self.emit(CONST, self.constant(node.start.value))
+        self.store(node.variable, "point")
+        start = self.jump(JUMP)
+        body = len(self.code.instructions)
+        self.block(node.body)
+        if self.kindOf(node.increment) == "point":
+            local = node.increment in self.localSlots
+            slot = self.localSlots[node.increment] if local else self.globalSlot(node.increment)
+            self.emit(INCREMENT_LOCAL if local else INCREMENT_GLOBAL, slot)
+        else:
+            self.load(node.increment)
+            self.emit(ADD_CONST, self.constant(1))
+            self.store(node.increment, resultKind(Token.ADD, self.kindOf(node.increment), "point"))
+        self.land(start)
+        self.condition(node.condition, JUMP_IF_TRUE, body)
+
+    def function(self, node):
+        # the Code of a function, compiled in its own scope
+        outer = (self.code, self.localSlots, self.localKinds, self.returns, self.constantIndex, self.line)
+        kinds = Runtime.functionKinds(node)
+        code = self.enter(node.name, kinds, Runtime.returnKind(node))
+        code.parameters = len(node.parameters)
+        code.converters = [(slot, Runtime.CONVERTER[kind]) for slot, (kind, _) in enumerate(node.parameters)]
+        code.defaults = [Runtime.DEFAULTS.get(kind) for kind in list(kinds.values())[code.parameters :]]
+        self.block(node.body)
+        self.emit(CONST, self.constant(None))
+        self.emit(RETURN)
+        self.code, self.localSlots, self.localKinds, self.returns, self.constantIndex, self.line = outer
+        return code
+
+    # expressions, each returns the data type of its value when it is known
+    def expression(self, node):
+        kind = type(node)
+        if kind is Ast.Literal:
+            self.emit(CONST, self.constant(node.value))
+            return LITERAL_KINDS.get(node.kind)
+        if kind is Ast.Name:
+            self.load(node.name)
+            return self.kindOf(node.name)
+        if kind is Ast.Binary:
+            return self.binary(node)
+        if kind is Ast.Unary:
+            self.expression(node.operand)
+            self.emit(NOT)
+            return "truth"
+        if kind is Ast.Input:
+            self.emit(INPUT)
+            return "party"
+
+    def binary(self, node):
+        # a chain like a + b + c nests to the left, it is compiled with a loop
+        # so a long expression does not go one Python call deeper per operator
+        chain = []
+        while type(node) is Ast.Binary:
+            chain.append(node)
+            node = node.left
+        left = self.expression(node)
+        for node in reversed(chain):
+            operator = node.operator
+            if operator in (Token.AND, Token.OR):
+                skip = self.jump(JUMP_IF_FALSE_OR_POP if operator == Token.AND else JUMP_IF_TRUE_OR_POP)
+                if self.expression(node.right) != "truth":
+                    self.emit(TRUTH)
+                self.land(skip)
+                left = "truth"
+            else:
+                left = self.operation(operator, left, node.right)
+        return left
+
+    def operation(self, operator, left, right):
+        # apply a binary operator to the top value, whose type is left, and
+        # the expression right; returns the type of the result
+        if type(right) is Ast.Literal:
+            # the right operand is part of the instruction
+            value = right.value
+            right = LITERAL_KINDS[right.kind]
+            if operator == Token.ADD:
+                self.emit(ADD_CONST, self.constant(value))
+            else:
+                function = Runtime.OPERATIONS[operator]
+                self.emit(BINARY_CONST, self.constant((function, value), (function, type(value), value)))
+        else:
+            right = self.expression(right)
+            if operator == Token.ADD:
+                self.emit(ADD)
+            else:
+                self.emit(BINARY, BINARY_INDEX[operator])
+        return resultKind(operator, left, right)
+
+
+def resultKind(operator, left, right):
+    # the type of the result of a binary operator on operands of the types
+    # left and right, None when it is not known
+    if operator in TRUTH_OPERATORS:
+        return "truth"
+    if operator == Token.ADD and (left in TEXT_KINDS or right in TEXT_KINDS):
+        return "party"
+    if left not in NUMBER_KINDS or right not in NUMBER_KINDS or operator == Token.EXPONENT:
+        return None
+    if operator == Token.DIVIDE or "figure" in (left, right):
+        return "figure"
+    return "point"
+
+
+def compileProgram(program):
+    """The Code of an Ast.Program, see Compiler."""
+    return Compiler().compileProgram(program)
+
+
+def disassemble(code):
+    """The instructions of a Code and of its functions as text, one per line."""
+    lines = [f"{code.name}:"]
+    functions = []
+    instructions = code.instructions
+    for pc in range(0, len(instructions), 2):
+        opcode, argument = instructions[pc], instructions[pc + 1]
+        detail = ""
+        if opcode in (CONST, CALL, ADD_CONST):
+            detail = repr(code.constants[argument])
+        elif opcode == BINARY_CONST:
+            operation, value = code.constants[argument]
+            detail = f"{Runtime.SYMBOLS[OPERATORS[operation]]} {value!r}"
+        elif opcode == FUNCTION:
+            detail = code.constants[argument].name
+            functions.append(code.constants[argument])
+        elif opcode in (LOAD_LOCAL, STORE_LOCAL, INCREMENT_LOCAL):
+            detail = code.localNames[argument]
+        elif opcode in (LOAD_GLOBAL, LOAD_UNTYPED, STORE_GLOBAL, INCREMENT_GLOBAL):
+            detail = code.globalNames[argument]
+        elif opcode == BINARY:
+            detail = Runtime.SYMBOLS[BINARY_OPERATORS[argument]]
+        elif opcode == CONVERT:
+            detail = Runtime.DATA_TYPES[argument]
+        lines.append(f"{code.lines[pc // 2]:6} {pc:6} {OPCODE_NAMES[opcode]:22} {argument:<6} {detail}".rstrip())
+    for function in functions:
+        lines.append("")
+        lines.append(disassemble(function))
+    return "\n".join(lines)
@@ -0,0 +1,188 @@
+import argparse
+import random
+
+# Generator of syntactically valid Pytme programs for benchmarks:
+#   python Generator.py --lines 10000 --shape nested --seed 1 > big.pyt
+# The statements follow grammar.ebnf as Parser implements it, written with
+# the spacing the Lexer needs to split them the same way: the character after
+# a number or an arithmetic operator is dropped, so two spaces follow them,
+# and a "}" followed by more on its line is never the first character of it.
+#
+# Shapes:
+#   mixed       : a bit of everything
+#   nested      : deeply nested if/while/for/do blocks
+#   expressions : long arithmetic and logical expressions
+#   functions   : many plaza functions with parameters and calls
+#   comments    : one or more // or /* */ comment lines per statement
+
+SHAPES = ["mixed", "nested", "expressions", "functions", "comments"]
+
+DATA_TYPES = ["point", "party", "truth", "avatar", "figure"]
+ARITHMETIC = ["+", "-", "*", "/", "%"]
+COMPARISONS = ["<", ">"]
+LOGICAL = ["&&", "||"]
+WORDS = ["alpha", "beta", "gamma", "delta", "omega", "sigma", "kappa", "theta"]
+
+
+class ProgramGenerator:
+    """Random Pytme programs of a given shape, reproducible from the seed.
+
+    Attributes:
+        shape : one of SHAPES
+        depth : maximum nesting of blocks
+        terms : maximum number of terms of an expression
+    """
+
+    def __init__(self, shape="mixed", seed=0, depth=None, terms=None):
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown program shape '{shape}', expected one of {SHAPES}")
+        self.shape = shape
+        self.random = random.Random(seed)
+        self.depth = depth if depth is not None else (12 if shape == "nested" else 3)
+        self.terms = terms if terms is not None else (40 if shape == "expressions" else 4)
+        self.functions = []  # (name, number of parameters) of the functions generated so far
+        self.counter = 0
+
+    def name(self):
+        self.counter += 1
+        return f"{self.random.choice(WORDS)}{self.counter}"
+
+    def variable(self):
+        return f"{self.random.choice(WORDS)}{self.random.randint(1, 50)}"
+
+    # expressions, numbers carry the extra space they need
+    def value(self, depth):
+        roll = self.random.random()
+        if roll < 0.35:
+            return self.variable()
+        if roll < 0.6:
+            return f"{self.random.randint(0, 999)} "
+        if roll < 0.7:
+            return f"{self.random.randint(0, 99)}.{self.random.randint(0, 99)} "
+        if roll < 0.8:
+            return f'"{self.random.choice(WORDS)} {self.random.choice(WORDS)}"'
+        if roll < 0.9 or depth <= 0:
+            return self.random.choice(["true", "false"])
+        return f"( {self.expression(depth - 1, 3)} )"
+
+    def arithmetic(self, depth, terms):
+        text = self.value(depth)
+        for _ in range(self.random.randint(0, terms - 1)):
+            text += f" {self.random.choice(ARITHMETIC)}  {self.value(depth)}"
+        return text
+
+    def expression(self, depth=2, terms=None):
+        terms = terms or self.terms
+        text = self.arithmetic(depth, max(1, terms // 2))
+        if self.random.random() < 0.3:
+            text += f" {self.random.choice(COMPARISONS)} {self.arithmetic(depth, max(1, terms // 2))}"
+        if self.random.random() < 0.2:
+            text += f" {self.random.choice(LOGICAL)} {self.arithmetic(depth, max(1, terms // 2))}"
+        return text
+
+    # statements, returned as lists of lines
+    def simple(self, indent):
+        roll = self.random.random()
+        pad = "    " * indent
+        if roll < 0.3:
+            return [f"{pad}{self.variable()} = {self.expression()} ;"]
+        if roll < 0.5:
+            # a declaration needs an initial value or a second variable
+            names = [f"{self.variable()} = {self.expression()}"]
+            names += [self.variable() for _ in range(self.random.randint(0, 2))]
+            return [f"{pad}{self.random.choice(DATA_TYPES)} {' , '.join(names)} ;"]
+        if roll < 0.7:
+            return [f"{pad}display( {self.expression()} );"]
+        if roll < 0.8:
+            return [f"{pad}{self.variable()} = input();"]
+        if self.functions:
+            name, parameters = self.random.choice(self.functions)
+            arguments = " , ".join(self.expression(1, 2) for _ in range(parameters))
+            return [f"{pad}{name}( {arguments} );" if arguments else f"{pad}{name}();"]
+        return [f"{pad}{self.variable()} += {self.expression()} ;"]
+
+    def block(self, indent, depth, nest=True):
+        # only the first statement of a nesting block may nest further, so
+        # the program grows with the depth instead of exponentially, and a
+        # simple statement ends it since Parser wants none of the line
+        # breaks loops leave before a "}"
+        lines = self.statement(indent + 1, depth - 1 if nest else 0, inBlock=True)
+        for _ in range(self.random.randint(1 if nest else 0, 2)):
+            lines.extend(self.statement(indent + 1, 0, inBlock=True))
+        return lines
+
+    def condition(self):
+        return f"{self.arithmetic(1, 2)} {self.random.choice(COMPARISONS)} {self.arithmetic(1, 2)}"
+
+    def compound(self, indent, depth):
+        pad = "    " * indent
+        closer = pad or " "  # see the top of the file
+        roll = self.random.random()
+        if roll < 0.4:
+            lines = [f"{pad}if ( {self.condition()} ) {{"] + self.block(indent, depth)
+            for _ in range(self.random.randint(0, 2)):
+                lines += [f"{closer}}} elseif ( {self.condition()} ) {{"] + self.block(indent, depth, False)
+            if self.random.random() < 0.5:
+                lines += [f"{closer}}} else {{"] + self.block(indent, depth, False)
+            return lines + [f"{pad}}}"]
+        if roll < 0.65:
+            return [f"{pad}while ( {self.condition()} ) {{"] + self.block(indent, depth) + [f"{pad}}}"]
+        if roll < 0.85:
+            counter = self.name()
+            header = f"{pad}for ( point {counter} = 0  ; {counter} < {self.random.randint(1, 99)}  ; {counter}++ ){{"
+            return [header] + self.block(indent, depth) + [f"{pad}}}"]
+        return [f"{pad}do {{"] + self.block(indent, depth) + [f"{closer}}} while ( {self.condition()} );"]
+
+    def function(self):
+        name = self.name()
+        parameters = self.random.randint(0, 3)
+        params = " , ".join(f"{self.random.choice(DATA_TYPES)} {self.name()}" for _ in range(parameters))
+        returnType = self.random.choice(DATA_TYPES + ["abyss"])
+        header = f"plaza {returnType} {name}( {params}){{" if params else f"plaza {returnType} {name}(){{"
+        body = self.block(0, self.depth)
+        body.append(f"    dispatch {self.expression()} ;")
+        self.functions.append((name, parameters))
+        return [header] + body + ["}"]
+
+    def comment(self, indent):
+        pad = "    " * indent
+        text = " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(3, 12)))
+        if self.random.random() < 0.6:
+            return [f"{pad}// {text}"]
+        # the character after "*/" is swallowed by the lexer, a space keeps the line break
+        return [f"{pad}/* {text}", f"{pad}   {text} */ "]
+
+    def statement(self, indent=0, depth=None, inBlock=False):
+        depth = self.depth if depth is None else depth
+        lines = []
+        if self.shape == "comments":
+            for _ in range(self.random.randint(1, 3)):
+                lines.extend(self.comment(indent))
+        roll = self.random.random()
+        nesting = {"nested": 0.8, "mixed": 0.3, "functions": 0.15}.get(self.shape, 0.1)
+        if not inBlock and (self.shape == "functions" and roll < 0.5 or self.shape == "mixed" and roll < 0.1):
+            return lines + self.function()
+        if depth > 0 and self.random.random() < nesting:
+            return lines + self.compound(indent, depth)
+        return lines + self.simple(indent)
+
+    def program(self, lines):
+        """Generate statements until the program has at least the given number of lines."""
+        program = []
+        while len(program) < lines:
+            program.extend(self.statement())
+        return [line + "\n" for line in program]
+
+
+def generate(lines, shape="mixed", seed=0):
+    """The lines of a random program of at least the given length, see ProgramGenerator."""
+    return ProgramGenerator(shape, seed).program(lines)
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Generate a random valid Pytme program.")
+    argParser.add_argument("--lines", type=int, default=1000, help="minimum number of lines")
+    argParser.add_argument("--shape", default="mixed", choices=SHAPES)
+    argParser.add_argument("--seed", type=int, default=0)
+    args = argParser.parse_args()
+    print("".join(generate(args.lines, args.shape, args.seed)), end="")
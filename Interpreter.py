@@ -0,0 +1,233 @@
+import sys
+import Ast
+from Lexer import Token
+import Runtime
+from Runtime import Console, PytmeError
+
+# Tree-walking interpreter of the Ast built by Parser:
+#   Interpreter.run(parser.pytme_pl())
+# It evaluates the nodes directly, one method per node class, and is the
+# reference the bytecode VM is checked and benchmarked against (see
+# Benchmark.py --execute). The semantics are those of Runtime.
+
+
+class Return(Exception):
+    # unwinds a dispatch to its function, or to run at the top level
+    def __init__(self, value) -> None:
+        self.value = value
+
+
+class Frame:
+    """The variables of one function call.
+
+    Attributes:
+        variables : {name: value} of the parameters and declared variables
+        kinds : {name: data type} of the same names
+        returns : the data type of the dispatched value, None for abyss
+    """
+
+    __slots__ = ("variables", "kinds", "returns")
+
+    def __init__(self, variables, kinds, returns) -> None:
+        self.variables = variables
+        self.kinds = kinds
+        self.returns = returns
+
+
+class Interpreter:
+    """Runs an Ast.Program.
+
+    Attributes:
+        console : the Runtime.Console of display and input()
+        globals : {name: value} of the global variables
+        globalKinds : {name: data type} of the declared globals
+        functions : {name: Ast.Function} of the functions defined so far
+        frame : the Frame of the running function, None at the top level
+    """
+
+    def __init__(self, console=None) -> None:
+        self.console = console or Console()
+        self.globals = {}
+        self.globalKinds = {}
+        self.functions = {}
+        self.frame = None
+        self.depth = 0
+        self.functionKinds = {}  # Runtime.functionKinds of every function node, by id
+        self.statements = {
+            Ast.Declaration: self.declaration,
+            Ast.Assign: self.assign,
+            Ast.Call: self.call,
+            Ast.Display: self.display,
+            Ast.Dispatch: self.dispatch,
+            Ast.If: self.ifStatement,
+            Ast.For: self.forStatement,
+            Ast.While: self.whileStatement,
+            Ast.DoWhile: self.doWhileStatement,
+            Ast.Function: self.function,
+        }
+        self.expressions = {
+            Ast.Literal: lambda node: node.value,
+            Ast.Name: self.name,
+            Ast.Binary: self.binary,
+            Ast.Unary: lambda node: not self.evaluate(node.operand),
+            Ast.Input: lambda node: self.console.input(),
+        }
+
+    def run(self, program):
+        """Run the statements of the program, raises PytmeError on a runtime error."""
+        Runtime.check(program)
+        self.globalKinds = Runtime.declaredKinds(program.statements)
+        self.globals = {name: Runtime.DEFAULTS.get(kind) for name, kind in self.globalKinds.items()}
+        # a Pytme call is a handful of Python calls deep
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, Runtime.MAX_CALL_DEPTH * 50))
+        try:
+            self.block(program.statements)
+        except Return:
+            pass  # dispatch at the top level ends the program
+        except RecursionError:
+            raise Runtime.tooDeep() from None
+        finally:
+            sys.setrecursionlimit(limit)
+
+    # statements
+    def block(self, statements):
+        for statement in statements:
+            try:
+                self.statements[type(statement)](statement)
+            except PytmeError as error:
+                if error.line is None:
+                    error.line = statement.line
+                raise
+
+    def kindOf(self, name):
+        # the data type of a variable, None for an untyped global
+        if self.frame is not None and name in self.frame.kinds:
+            return self.frame.kinds[name]
+        return self.globalKinds.get(name)
+
+    def store(self, name, value):
+        if self.frame is not None and name in self.frame.variables:
+            self.frame.variables[name] = Runtime.convert(self.frame.kinds[name], value)
+        else:
+            self.globals[name] = Runtime.convert(self.globalKinds.get(name), value)
+
+    def declaration(self, node):
+        for variable in node.variables:
+            if variable.value is None:
+                self.store(variable.name, Runtime.DEFAULTS.get(self.kindOf(variable.name)))
+            else:
+                self.store(variable.name, self.evaluate(variable.value))
+
+    def assign(self, node):
+        if node.operator == Token.ASSIGN:
+            value = self.evaluate(node.value)
+        else:
+            left = self.load(node.target)
+            value = Runtime.binary(Runtime.ASSIGN_OPERATORS[node.operator], left, self.evaluate(node.value))
+        self.store(node.target, value)
+
+    def call(self, node):
+        # the arguments are evaluated before the function is looked up
+        arguments = [self.evaluate(argument) for argument in node.arguments]
+        function = self.functions.get(node.name)
+        if function is None:
+            raise Runtime.undefinedFunction(node.name)
+        if len(arguments) != len(function.parameters):
+            raise Runtime.argumentCount(node.name, len(function.parameters), len(arguments))
+        if self.depth >= Runtime.MAX_CALL_DEPTH:
+            raise Runtime.tooDeep()
+
+        kinds = self.functionKinds[id(function)]
+        variables = {name: Runtime.DEFAULTS.get(kind) for name, kind in kinds.items()}
+        for (kind, name), argument in zip(function.parameters, arguments):
+            variables[name] = Runtime.convert(kind, argument)
+
+        caller = self.frame
+        self.frame = Frame(variables, kinds, Runtime.returnKind(function))
+        self.depth += 1
+        try:
+            self.block(function.body)
+        except Return:
+            pass  # the value is not used, calls are statements
+        finally:
+            self.frame = caller
+            self.depth -= 1
+
+    def display(self, node):
+        if node.value is None:
+            self.console.write("")
+        else:
+            self.console.write(Runtime.show(self.evaluate(node.value)))
+
+    def dispatch(self, node):
+        value = self.evaluate(node.value)
+        if self.frame is not None:
+            value = Runtime.convert(self.frame.returns, value)
+        raise Return(value)
+
+    def ifStatement(self, node):
+        for condition, body in node.branches:
+            if self.evaluate(condition):
+                self.block(body)
+                return
+        if node.orelse is not None:
+            self.block(node.orelse)
+
+    def forStatement(self, node):
+        self.store(node.variable, node.start.value)
+        while self.evaluate(node.condition):
+            self.block(node.body)
+            self.store(node.increment, Runtime.binary(Token.ADD, self.load(node.increment), 1))
+
+    def whileStatement(self, node):
+        while self.evaluate(node.condition):
+            self.block(node.body)
+
+    def doWhileStatement(self, node):
+        self.block(node.body)
+        while self.evaluate(node.condition):
+            self.block(node.body)
+
+    def function(self, node):
+        if id(node) not in self.functionKinds:
+            self.functionKinds[id(node)] = Runtime.functionKinds(node)
+        self.functions[node.name] = node
+
+    # expressions
+    def evaluate(self, node):
+        return self.expressions[type(node)](node)
+
+    def load(self, name):
+        if self.frame is not None and name in self.frame.variables:
+            return self.frame.variables[name]
+        try:
+            return self.globals[name]
+        except KeyError:
+            raise Runtime.undefinedVariable(name) from None
+
+    def name(self, node):
+        return self.load(node.name)
+
+    def binary(self, node):
+        # a chain like a + b + c nests to the left, it is evaluated with a loop
+        # so a long expression does not go one Python call deeper per operator
+        chain = []
+        while type(node) is Ast.Binary:
+            chain.append(node)
+            node = node.left
+        value = self.evaluate(node)
+        for node in reversed(chain):
+            operator = node.operator
+            if operator == Token.AND:
+                value = bool(value) and bool(self.evaluate(node.right))
+            elif operator == Token.OR:
+                value = bool(value) or bool(self.evaluate(node.right))
+            else:
+                value = Runtime.binary(operator, value, self.evaluate(node.right))
+        return value
+
+
+def run(program, console=None):
+    """Run an Ast.Program with an Interpreter, see Interpreter.run."""
+    Interpreter(console).run(program)
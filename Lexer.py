@@ -1,4 +1,15 @@
-from enum import Enum, auto
+import io
+import os
+import queue
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from enum import Enum, IntEnum, auto
+
+# bumped whenever the tokens produced for a source change, it is part of the Cache keys
+LEXER_VERSION = 1
 
 
 class Token(Enum):
@@ -134,6 +145,9 @@ class Token(Enum):
         """Function called if state is used as string such as in print()"""
         return self.name
 
+    # members are singletons, so identity hashing keeps dictionary lookups cheap
+    __hash__ = object.__hash__
+
 
 class State(Enum):
     """An enum class for defining States and accessed through its attributes.
@@ -175,6 +189,709 @@ class State(Enum):
         """Function called if state is used as string such as in print()"""
         return self.name
 
+    # members are singletons, so identity hashing keeps dictionary lookups cheap
+    __hash__ = object.__hash__
+
+
+# Reserved words, looked up in O(1) when a word lexeme is classified
+KEYWORDS = frozenset(
+    [
+        "abyss",
+        "absolute",
+        "archane",
+        "arsenal",
+        "attempt",
+        "awm",
+        "breach",
+        "cast",
+        "chamber",
+        "chunk",
+        "avatar",
+        "core",
+        "do",
+        "dispatch",
+        "display",
+        "else",
+        "elseif",
+        "enchant",
+        "ephemeral",
+        "enum",
+        "expands",
+        "false",
+        "figure",
+        "for",
+        "hero",
+        "if",
+        "incantation",
+        "instanceof",
+        "lootbox",
+        "midget",
+        "pacify",
+        "party",
+        "persist",
+        "point",
+        "portal",
+        "powerup",
+        "plaza",
+        "save",
+        "shadow",
+        "shield",
+        "shoot",
+        "shoots",
+        "spawns",
+        "stable",
+        "supreme",
+        "synchronized",
+        "this",
+        "true",
+        "toggle",
+        "truth",
+        "twin",
+        "unarmed",
+        "unstable",
+        "while",
+    ]
+)
+
+# Token of a word lexeme (State.string) that is not an identifier
+WORD_TOKENS = {keyword: Token.KEYWORD for keyword in KEYWORDS}
+WORD_TOKENS["true"] = Token.BOOLEAN
+WORD_TOKENS["false"] = Token.BOOLEAN
+
+# Token of every lexeme appended in State.operator
+OPERATOR_TOKENS = {
+    "+": Token.ADD,
+    "-": Token.SUBTRACT,
+    "*": Token.MULTIPLY,
+    "/": Token.DIVIDE,
+    "%": Token.MODULO,
+    "/_": Token.DIVFLOOR,
+    ">": Token.GREAT,
+    "<": Token.LESS,
+    "==": Token.EQUAL,
+    ">=": Token.GREATQ,
+    "<=": Token.LESSEQ,
+    "=": Token.ASSIGN,
+    "+=": Token.ASSIGNADD,
+    "-=": Token.ASSIGNSUB,
+    "*=": Token.ASSIGNMULT,
+    "/=": Token.ASSIGNDIV,
+    "%=": Token.ASSIGNMOD,
+    # Assign Floor Div?
+}
+
+# Token of every lexeme appended in State.logicalOperator
+LOGICAL_TOKENS = {
+    "&&": Token.AND,
+    "||": Token.OR,
+    "!": Token.NOT,
+}
+
+# Token of a lexeme appended in any other state, found by the lexeme alone
+LEXEME_TOKENS = {
+    "\n": Token.NEWLINE,
+    ";": Token.SEMICOLON,
+    ",": Token.COMMA,
+    "{": Token.CURLYL,
+    "}": Token.CURLYR,
+    "[": Token.BOXLEFT,
+    "]": Token.BOXRIGHT,
+    "(": Token.PARENLEFT,
+    ")": Token.PARENRIGHT,
+}
+
+# How each State classifies its lexemes:
+#   (token of each known lexeme, token of any other lexeme, token of an alphabetic lexeme)
+STATE_CLASSIFICATION = {
+    State.string: (WORD_TOKENS, Token.IDENTIFIER, None),
+    State.character: (LEXEME_TOKENS, Token.INVALID, Token.IDENTIFIER),
+    State.number: ({}, Token.INTEGER, None),
+    State.float: ({}, Token.FLOAT, None),
+    State.comment: ({}, Token.COMMENT, None),
+    State.operator: (OPERATOR_TOKENS, Token.INVALID, None),
+    State.logicalOperator: (LOGICAL_TOKENS, Token.INVALID, None),
+    State.semicolon: ({}, Token.SEMICOLON, None),
+    State.stringLiteral: ({}, Token.STRING, None),
+}
+OTHER_CLASSIFICATION = (LEXEME_TOKENS, Token.INVALID, None)
+
+
+class CharClass(IntEnum):
+    """An enum class for the character classes used by the table-driven engine.
+
+    Every character the state machine can meet falls into exactly one class;
+    characters that share a class are treated identically by every State.
+    """
+
+    DIGIT = auto()
+    #   isnumeric() but not isalpha()
+    NUMALPHA = auto()
+    #   both isnumeric() and isalpha() (e.g. some CJK numerals)
+    ALPHA = auto()
+    NEWLINE = auto()
+    #   \n
+    SPACE = auto()
+    #   any other isspace()
+    DQUOTE = auto()
+    #   "
+    SQUOTE = auto()
+    #   '
+    SEMICOLON = auto()
+    #   ;
+    DELIMITER = auto()
+    #   { } ( ) [ ]
+    DOT = auto()
+    #   .
+    EQUAL = auto()
+    #   =
+    SLASH = auto()
+    #   /
+    STAR = auto()
+    #   *
+    UNDERSCORE = auto()
+    #   _
+    ARITH = auto()
+    #   + - %
+    RELATIONAL = auto()
+    #   > < !
+    AMPERSAND = auto()
+    #   &
+    PIPE = auto()
+    #   |
+    OTHER = auto()
+
+
+class TableState(IntEnum):
+    """An enum class for the states of the table-driven engine.
+
+    Each member refines one State by what the hand-written engine knows about
+    the pending lexeme (e.g. State.operator holding "/" versus "."), so that a
+    transition only ever depends on (TableState, CharClass).
+    """
+
+    CHAR_EMPTY = auto()
+    CHAR_ALPHA = auto()
+    CHAR_DQUOTE = auto()
+    CHAR_SQUOTE = auto()
+    CHAR_OTHER = auto()
+    SPACE_EMPTY = auto()
+    SPACE_HELD = auto()
+    WORD = auto()
+    NUMBER = auto()
+    FLOAT = auto()
+    STRING_DQUOTE = auto()
+    STRING_SQUOTE = auto()
+    LINE_COMMENT = auto()
+    BLOCK_COMMENT = auto()
+    BLOCK_STAR = auto()
+    BLOCK_END = auto()
+    DEAD_COMMENT = auto()
+    OP_ARITH = auto()
+    OP_SLASH = auto()
+    OP_STAR = auto()
+    OP_DOT = auto()
+    OP_OTHER = auto()
+    LOGIC_AMPERSAND = auto()
+    LOGIC_PIPE = auto()
+    SEMICOLON = auto()
+    DELIMITER = auto()
+
+
+class Action(IntEnum):
+    """An enum class for what the table-driven engine does with a character.
+
+    APPEND : add the character to the lexeme.
+    START  : append the pending lexeme (if any) and start a new one with the character.
+    DROP   : append the pending lexeme (if any) and discard the character.
+    CLOSE  : add the character to the lexeme, then append the lexeme.
+    SKIP   : ignore the character.
+    """
+
+    APPEND = auto()
+    START = auto()
+    DROP = auto()
+    CLOSE = auto()
+    SKIP = auto()
+
+
+# State each TableState reports to getTokenBeforeAppend
+BASE_STATE = {
+    TableState.CHAR_EMPTY: State.character,
+    TableState.CHAR_ALPHA: State.character,
+    TableState.CHAR_DQUOTE: State.character,
+    TableState.CHAR_SQUOTE: State.character,
+    TableState.CHAR_OTHER: State.character,
+    TableState.SPACE_EMPTY: State.space,
+    TableState.SPACE_HELD: State.space,
+    TableState.WORD: State.string,
+    TableState.NUMBER: State.number,
+    TableState.FLOAT: State.float,
+    TableState.STRING_DQUOTE: State.stringLiteral,
+    TableState.STRING_SQUOTE: State.stringLiteral,
+    TableState.LINE_COMMENT: State.comment,
+    TableState.BLOCK_COMMENT: State.comment,
+    TableState.BLOCK_STAR: State.comment,
+    TableState.BLOCK_END: State.comment,
+    TableState.DEAD_COMMENT: State.comment,
+    TableState.OP_ARITH: State.operator,
+    TableState.OP_SLASH: State.operator,
+    TableState.OP_STAR: State.operator,
+    TableState.OP_DOT: State.operator,
+    TableState.OP_OTHER: State.operator,
+    TableState.LOGIC_AMPERSAND: State.logicalOperator,
+    TableState.LOGIC_PIPE: State.logicalOperator,
+    TableState.SEMICOLON: State.semicolon,
+    TableState.DELIMITER: State.delimiter,
+}
+
+# multi-line comments are the only lexemes carried over a line end
+BLOCK_STATES = frozenset([TableState.BLOCK_COMMENT, TableState.BLOCK_STAR, TableState.BLOCK_END])
+
+OPERATOR_CLASSES = frozenset(
+    [CharClass.ARITH, CharClass.SLASH, CharClass.STAR, CharClass.DOT, CharClass.EQUAL, CharClass.RELATIONAL]
+)
+LOGICAL_CLASSES = frozenset([CharClass.AMPERSAND, CharClass.PIPE])
+NUMERIC_CLASSES = frozenset([CharClass.DIGIT, CharClass.NUMALPHA])
+SPACE_CLASSES = frozenset([CharClass.NEWLINE, CharClass.SPACE])
+
+SPECIAL_CHAR_CLASS = {
+    "\n": CharClass.NEWLINE,
+    '"': CharClass.DQUOTE,
+    "'": CharClass.SQUOTE,
+    ";": CharClass.SEMICOLON,
+    "{": CharClass.DELIMITER,
+    "}": CharClass.DELIMITER,
+    "(": CharClass.DELIMITER,
+    ")": CharClass.DELIMITER,
+    "[": CharClass.DELIMITER,
+    "]": CharClass.DELIMITER,
+    ".": CharClass.DOT,
+    "=": CharClass.EQUAL,
+    "/": CharClass.SLASH,
+    "*": CharClass.STAR,
+    "_": CharClass.UNDERSCORE,
+    "+": CharClass.ARITH,
+    "-": CharClass.ARITH,
+    "%": CharClass.ARITH,
+    ">": CharClass.RELATIONAL,
+    "<": CharClass.RELATIONAL,
+    "!": CharClass.RELATIONAL,
+    "&": CharClass.AMPERSAND,
+    "|": CharClass.PIPE,
+}
+
+
+def charClassOf(char):
+    """Get the CharClass of a single character.
+
+    Args:
+        char (string): the character to classify
+    """
+    if char in SPECIAL_CHAR_CLASS:
+        return SPECIAL_CHAR_CLASS[char]
+    if char.isnumeric():
+        return CharClass.NUMALPHA if char.isalpha() else CharClass.DIGIT
+    if char.isalpha():
+        return CharClass.ALPHA
+    if char.isspace():
+        return CharClass.SPACE
+    return CharClass.OTHER
+
+
+def operatorState(charClass):
+    """TableState entered when an operator character starts a lexeme."""
+    if charClass == CharClass.ARITH:
+        return TableState.OP_ARITH
+    if charClass == CharClass.SLASH:
+        return TableState.OP_SLASH
+    if charClass == CharClass.STAR:
+        return TableState.OP_STAR
+    if charClass == CharClass.DOT:
+        return TableState.OP_DOT
+    return TableState.OP_OTHER
+
+
+def logicalState(charClass):
+    """TableState entered when a logical operator character starts a lexeme."""
+    if charClass == CharClass.AMPERSAND:
+        return TableState.LOGIC_AMPERSAND
+    return TableState.LOGIC_PIPE
+
+
+def characterState(charClass):
+    """TableState of State.character holding only a character of this class."""
+    if charClass == CharClass.DQUOTE:
+        return TableState.CHAR_DQUOTE
+    if charClass == CharClass.SQUOTE:
+        return TableState.CHAR_SQUOTE
+    if charClass in [CharClass.ALPHA, CharClass.NUMALPHA]:
+        return TableState.CHAR_ALPHA
+    return TableState.CHAR_OTHER
+
+
+def transition(state, charClass):
+    """Get the (Action, TableState) pair for a character class in a state.
+
+    Mirrors, branch for branch, the if-chains of Lexer.processText.
+
+    Args:
+        state (TableState): the current state
+        charClass (CharClass): class of the current character
+    """
+    if state in [TableState.SPACE_EMPTY, TableState.SPACE_HELD]:
+        if charClass in OPERATOR_CLASSES:
+            return Action.START, operatorState(charClass)
+        if charClass in LOGICAL_CLASSES:
+            return Action.START, logicalState(charClass)
+        if charClass in NUMERIC_CLASSES:
+            return Action.APPEND, TableState.NUMBER
+        if charClass not in SPACE_CLASSES:
+            if state == TableState.SPACE_HELD:  # held whitespace + character
+                return Action.APPEND, TableState.CHAR_OTHER
+            return Action.APPEND, characterState(charClass)
+        return Action.SKIP, state
+
+    if state in [TableState.SEMICOLON, TableState.DELIMITER]:
+        if charClass in OPERATOR_CLASSES:
+            return Action.START, operatorState(charClass)
+        if charClass in LOGICAL_CLASSES:
+            return Action.START, logicalState(charClass)
+        if charClass in NUMERIC_CLASSES:
+            return Action.START, TableState.NUMBER
+        if charClass in SPACE_CLASSES:
+            return Action.START, TableState.SPACE_HELD
+        return Action.START, characterState(charClass)
+
+    if state == TableState.WORD:
+        if charClass == CharClass.ALPHA or charClass in NUMERIC_CLASSES:
+            return Action.APPEND, TableState.WORD
+        if charClass in SPACE_CLASSES:
+            return Action.DROP, TableState.SPACE_EMPTY
+        if charClass in OPERATOR_CLASSES:
+            return Action.START, operatorState(charClass)
+        if charClass in LOGICAL_CLASSES:
+            return Action.START, logicalState(charClass)
+        return Action.START, characterState(charClass)
+
+    if state in [TableState.NUMBER, TableState.FLOAT]:
+        if charClass in NUMERIC_CLASSES:
+            return Action.APPEND, state
+        if charClass == CharClass.DOT and state == TableState.NUMBER:
+            return Action.APPEND, TableState.FLOAT
+        if charClass in OPERATOR_CLASSES:
+            return Action.START, operatorState(charClass)
+        if charClass in LOGICAL_CLASSES:
+            return Action.START, logicalState(charClass)
+        return Action.DROP, TableState.CHAR_EMPTY
+
+    if state == TableState.STRING_DQUOTE:
+        if charClass == CharClass.DQUOTE:
+            return Action.CLOSE, TableState.CHAR_EMPTY
+        return Action.APPEND, state
+
+    if state == TableState.STRING_SQUOTE:
+        if charClass == CharClass.SQUOTE:
+            return Action.CLOSE, TableState.CHAR_EMPTY
+        return Action.APPEND, state
+
+    if state == TableState.LINE_COMMENT:
+        if charClass == CharClass.NEWLINE:
+            return Action.DROP, TableState.CHAR_EMPTY
+        return Action.APPEND, state
+
+    if state in [TableState.BLOCK_COMMENT, TableState.BLOCK_STAR]:
+        if charClass == CharClass.STAR:
+            return Action.APPEND, TableState.BLOCK_STAR
+        if charClass == CharClass.SLASH and state == TableState.BLOCK_STAR:
+            return Action.APPEND, TableState.BLOCK_END
+        return Action.APPEND, TableState.BLOCK_COMMENT
+
+    if state == TableState.BLOCK_END:
+        return Action.DROP, TableState.CHAR_EMPTY
+
+    if state == TableState.DEAD_COMMENT:
+        # a two character lexeme such as "+/" or "**" that is neither "//" nor "/*"
+        return Action.SKIP, state
+
+    if state in [TableState.OP_ARITH, TableState.OP_SLASH, TableState.OP_STAR]:
+        if charClass in [CharClass.SLASH, CharClass.STAR]:
+            if state != TableState.OP_SLASH:
+                return Action.APPEND, TableState.DEAD_COMMENT
+            if charClass == CharClass.SLASH:
+                return Action.APPEND, TableState.LINE_COMMENT
+            return Action.APPEND, TableState.BLOCK_STAR
+        if charClass == CharClass.EQUAL or state == TableState.OP_SLASH and charClass == CharClass.UNDERSCORE:
+            return Action.CLOSE, TableState.CHAR_EMPTY
+        return Action.DROP, TableState.CHAR_EMPTY
+
+    if state in [TableState.OP_DOT, TableState.OP_OTHER]:
+        if charClass == CharClass.DOT:
+            return Action.START, TableState.OP_DOT
+        if state == TableState.OP_DOT and charClass in NUMERIC_CLASSES:
+            return Action.APPEND, TableState.FLOAT
+        if charClass in SPACE_CLASSES:
+            return Action.DROP, TableState.SPACE_EMPTY
+        return Action.DROP, TableState.CHAR_EMPTY
+
+    if state in [TableState.LOGIC_AMPERSAND, TableState.LOGIC_PIPE]:
+        if charClass in LOGICAL_CLASSES and logicalState(charClass) == state:
+            return Action.CLOSE, TableState.CHAR_EMPTY
+        if charClass in OPERATOR_CLASSES:
+            return Action.START, TableState.CHAR_OTHER
+        return Action.START, characterState(charClass)
+
+    # State.character holding a lone quote: whatever follows opens the string
+    if state == TableState.CHAR_DQUOTE:
+        return Action.APPEND, TableState.STRING_DQUOTE
+    if state == TableState.CHAR_SQUOTE:
+        return Action.APPEND, TableState.STRING_SQUOTE
+
+    # State.character
+    if charClass == CharClass.DQUOTE:
+        return Action.START, TableState.STRING_DQUOTE
+    if charClass == CharClass.SQUOTE:
+        return Action.START, TableState.STRING_SQUOTE
+    if charClass == CharClass.SEMICOLON:
+        return Action.START, TableState.SEMICOLON
+    if charClass == CharClass.DELIMITER:
+        return Action.START, TableState.DELIMITER
+    if charClass in OPERATOR_CLASSES:
+        return Action.START, operatorState(charClass)
+    if charClass in LOGICAL_CLASSES:
+        return Action.START, logicalState(charClass)
+    if charClass in NUMERIC_CLASSES:
+        return Action.START, TableState.NUMBER
+    if charClass == CharClass.ALPHA:
+        if state == TableState.CHAR_OTHER:
+            return Action.APPEND, state
+        return Action.APPEND, TableState.WORD
+    if charClass in SPACE_CLASSES:
+        return Action.DROP, TableState.SPACE_EMPTY
+    return Action.APPEND, TableState.CHAR_OTHER
+
+
+def buildTransitionTable():
+    """Compile transition() into a table indexed as table[state][charClass].
+
+    Entries are plain (action, state) integer pairs so the engine's hot loop
+    never touches an Enum.
+    """
+    table = [None] * (max(TableState) + 1)
+    for state in TableState:
+        row = [None] * (max(CharClass) + 1)
+        for charClass in CharClass:
+            action, nextState = transition(state, charClass)
+            row[charClass] = (int(action), int(nextState))
+        table[state] = row
+    return table
+
+
+TRANSITION_TABLE = buildTransitionTable()
+
+# plain integer views of the tables above for the table engine's hot loop
+CHAR_CLASS_CACHE = {char: int(charClass) for char, charClass in SPECIAL_CHAR_CLASS.items()}
+STATE_OF = [None] * (max(TableState) + 1)
+for tableState, state in BASE_STATE.items():
+    STATE_OF[tableState] = state
+CARRIED_STATES = frozenset(int(tableState) for tableState in BLOCK_STATES)
+APPEND, START, DROP, CLOSE = int(Action.APPEND), int(Action.START), int(Action.DROP), int(Action.CLOSE)
+SKIP = int(Action.SKIP)
+
+# Token of the lexemes ending in each TableState when it does not depend on
+# the lexeme (numbers, comments, string literals), else None
+CONSTANT_TOKEN = [None] * (max(TableState) + 1)
+for tableState, state in BASE_STATE.items():
+    lexemeTokens, token, alphaToken = STATE_CLASSIFICATION.get(state, OTHER_CLASSIFICATION)
+    if not lexemeTokens and alphaToken is None:
+        CONSTANT_TOKEN[tableState] = token
+
+# what the table engine carries into a line that does not continue a comment
+LINE_START = (int(TableState.CHAR_EMPTY), "")
+
+# Master pattern of the regex engine, alternatives are tried in this order
+MASTER_PATTERN = re.compile(
+    r"""
+    (?P<LINECOMMENT>//[^\n]*)
+    |(?P<BLOCKCOMMENT>/\*.*?\*/.?|/\*.*)
+    |(?P<STRING>"[^"\n]*(?:"|\n|\Z)|'[^'\n]*(?:'|\n|\Z))
+    |(?P<FLOAT>\d+\.\d*|\.\d+)
+    |(?P<INTEGER>\d+)
+    |(?P<WORD>[^\W\d_][^\W_]*)
+    |(?P<STEP>\+\+|--)
+    |(?P<OPERATOR>\+=|-=|\*=|/=|%=|/_|==|>=|<=|!=|&&|\|\||[-+*/%<>=!.,])
+    |(?P<DELIMITER>[;{}()\[\]])
+    |(?P<NEWLINE>\n)
+    |(?P<SPACE>[^\S\n]+)
+    |(?P<INVALID>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Tokens of the regex engine's OPERATOR and DELIMITER lexemes
+SYMBOL_TOKENS = {**OPERATOR_TOKENS, **LOGICAL_TOKENS, **LEXEME_TOKENS}
+SYMBOL_TOKENS["!="] = Token.NOTEQUAL
+SYMBOL_TOKENS["."] = Token.DOT
+
+
+# Line breaks of a byte buffer, with the universal newlines of text mode files
+LINE_BREAK = re.compile(rb"\r\n?|\n")
+
+
+def bufferLines(buffer, encoding="utf-8"):
+    """Split a byte buffer into lines, locating the line breaks on the fly.
+
+    Works on anything with the buffer protocol (mmap, memoryview, bytes) without
+    decoding it as a whole: only the current line is copied into a string.
+    "\r\n" and a lone "\r" are turned into "\n", so the lines are the same as
+    readlines() of the file opened in text mode.
+
+    Args:
+        buffer (buffer): the encoded source, e.g. an mmap of the file
+        encoding (string): encoding of the source
+
+    Yields:
+        string: every line, including its line break
+    """
+    start = 0
+    for lineBreak in LINE_BREAK.finditer(buffer):
+        yield str(buffer[start : lineBreak.start()], encoding) + "\n"
+        start = lineBreak.end()
+    if start < len(buffer):
+        yield str(buffer[start:], encoding)
+
+
+# Token of each kind code stored in a TokenList
+TOKEN_OF_KIND = [None] * (max(token.value for token in Token) + 1)
+for token in Token:
+    TOKEN_OF_KIND[token.value] = token
+KIND_OF_TOKEN = {token: token.value for token in Token}
+
+
+class TokenList:
+    """A compact token stream stored as parallel columns.
+
+    Kind, line and column numbers live in typed arrays and lexemes in a list of
+    interned strings, so a token costs a few bytes plus its (shared) lexeme
+    instead of a four element list. Indexing still gives the usual
+    [lexeme, line, col, token] record; the parser reads single fields with
+    lexeme(), line(), column() and token().
+    """
+
+    __slots__ = ("lexemes", "kinds", "lines", "cols")
+
+    def __init__(self, records=()):
+        self.lexemes = []
+        self.kinds = array("B")
+        self.lines = array("i")
+        self.cols = array("i")
+        for record in records:
+            self.append(record)
+
+    def add(self, lexeme, lineNumber, colNumber, token):
+        """Append one token given as separate fields."""
+        self.lexemes.append(sys.intern(lexeme))
+        self.kinds.append(KIND_OF_TOKEN[token])
+        self.lines.append(lineNumber)
+        self.cols.append(colNumber)
+
+    def append(self, record):
+        """Append one [lexeme, line, col, token] record."""
+        self.add(*record)
+
+    def extend(self, other):
+        """Append all the tokens of another TokenList."""
+        self.lexemes.extend(other.lexemes)
+        self.kinds.extend(other.kinds)
+        self.lines.extend(other.lines)
+        self.cols.extend(other.cols)
+
+    def lexeme(self, index):
+        return self.lexemes[index]
+
+    def line(self, index):
+        return self.lines[index]
+
+    def column(self, index):
+        return self.cols[index]
+
+    def token(self, index):
+        return TOKEN_OF_KIND[self.kinds[index]]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return [self.lexemes[index], self.lines[index], self.cols[index], TOKEN_OF_KIND[self.kinds[index]]]
+
+    def __iter__(self):
+        for lexeme, kind, lineNumber, colNumber in zip(self.lexemes, self.kinds, self.lines, self.cols):
+            yield [lexeme, lineNumber, colNumber, TOKEN_OF_KIND[kind]]
+
+
+class OffsetTokenList:
+    """A token stream whose lexemes are (start, end) offsets into the source.
+
+    No lexeme string is kept: lexeme() slices it out of the source when the
+    parser or a symbol table writer asks for it. The few lexemes that are not
+    a contiguous part of the source (characters skipped by the lexer in the
+    middle of them) are stored as text, marked by a negative start. Otherwise
+    it reads like a TokenList.
+    """
+
+    __slots__ = ("source", "starts", "ends", "texts", "kinds", "lines", "cols")
+
+    def __init__(self, source=""):
+        self.source = source
+        offsetType = "i" if len(source) < 2**31 else "q"
+        self.starts = array(offsetType)
+        self.ends = array(offsetType)
+        self.texts = []
+        self.kinds = array("B")
+        self.lines = array("i")
+        self.cols = array("i")
+
+    def add(self, start, end, lineNumber, colNumber, token):
+        """Append one token whose lexeme is source[start:end]."""
+        self.starts.append(start)
+        self.ends.append(end)
+        self.kinds.append(KIND_OF_TOKEN[token])
+        self.lines.append(lineNumber)
+        self.cols.append(colNumber)
+
+    def addText(self, lexeme, lineNumber, colNumber, token):
+        """Append one token whose lexeme is not a slice of the source."""
+        self.add(~len(self.texts), 0, lineNumber, colNumber, token)
+        self.texts.append(lexeme)
+
+    def append(self, record):
+        """Append one [lexeme, line, col, token] record."""
+        self.addText(*record)
+
+    def lexeme(self, index):
+        start = self.starts[index]
+        if start < 0:
+            return self.texts[~start]
+        return self.source[start : self.ends[index]]
+
+    def line(self, index):
+        return self.lines[index]
+
+    def column(self, index):
+        return self.cols[index]
+
+    def token(self, index):
+        return TOKEN_OF_KIND[self.kinds[index]]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return [self.lexeme(index), self.lines[index], self.cols[index], TOKEN_OF_KIND[self.kinds[index]]]
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
 
 class Lexer:
     """The Lexical Analyzer class.
@@ -182,177 +899,69 @@ class Lexer:
     Attributes:
         state : the current State
         symbolTable [] : list containing all lexemes detected.
+        engine : "state" for the hand-written state machine, "table" for
+                 the table-driven engine (same lexemeList) or "regex" for the
+                 master-regex tokenizer used for bulk lexing.
+        offsets : store lexemeList as an OffsetTokenList of source offsets
+                  (the state engine then runs as the table engine, same tokens)
     """
 
+    ENGINES = ["state", "table", "regex"]
+
     # Constructor
-    def __init__(self):
-        self.state = State.initialized
+    def __init__(self, engine="state", offsets=False):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}', expected one of {self.ENGINES}")
+        self.engine = engine
+        self.offsets = offsets
         # self.symbolTable = [];
-        self.lexemeList = []
+        self.reset()
+        self.keywordList = KEYWORDS
+
+    def reset(self):
+        """Forget the previous input, so that the instance can lex another one.
 
+        processText calls it first, so a Lexer can be reused; an instance
+        must still not be used by two threads at once (see LexerPool).
+        """
+        self.state = State.initialized
         self.lineNumber = 0
-        self.keywordList = [
-            "abyss",
-            "absolute",
-            "archane",
-            "arsenal",
-            "attempt",
-            "awm",
-            "breach",
-            "cast",
-            "chamber",
-            "chunk",
-            "avatar",
-            "core",
-            "do",
-            "dispatch",
-            "display",
-            "else",
-            "elseif",
-            "enchant",
-            "ephemeral",
-            "enum",
-            "expands",
-            "false",
-            "figure",
-            "for",
-            "hero",
-            "if",
-            "incantation",
-            "instanceof",
-            "lootbox",
-            "midget",
-            "pacify",
-            "party",
-            "persist",
-            "point",
-            "portal",
-            "powerup",
-            "plaza",
-            "save",
-            "shadow",
-            "shield",
-            "shoot",
-            "shoots",
-            "spawns",
-            "stable",
-            "supreme",
-            "synchronized",
-            "this",
-            "true",
-            "toggle ",
-            "truth",
-            "twin",
-            "unarmed",
-            "unstable",
-            "while",
-            "truth",
-            "true",
-            "false",
-        ]
-
-    def getTokenBeforeAppend(self, lexeme):
+        self.lexemeList = TokenList()
+
+    def getTokenBeforeAppend(self, lexeme, state=None):
         """Get token based on lexeme and/or current state
 
+        Costs one lookup of the state in STATE_CLASSIFICATION and one of the
+        lexeme in the dictionary it gives.
+
         Args:
             lexeme (string): the lexeme used
+            state (State): state to classify with, defaults to the current state
         """
-        token = "INVALID"
-        if lexeme == "\n":
-            token = Token.NEWLINE
-        if self.state == State.character and lexeme.isalpha():
-            token = Token.IDENTIFIER
-        elif self.state == State.string:
-            if lexeme in ["true", "false"]:
-                token = Token.BOOLEAN
-            elif lexeme in self.keywordList:
-                token = Token.KEYWORD
-            else:
-                token = Token.IDENTIFIER
-
-        elif self.state == State.number:
-            token = Token.INTEGER
-        elif self.state == State.float:
-            token = Token.FLOAT
-        elif self.state == State.comment:
-            token = Token.COMMENT
-        elif self.state == State.operator:
-            if lexeme == "+":
-                token = Token.ADD
-            elif lexeme == "-":
-                token = Token.SUBTRACT
-            elif lexeme == "*":
-                token = Token.MULTIPLY
-            elif lexeme == "/":
-                token = Token.DIVIDE
-            elif lexeme == "%":
-                token = Token.MODULO
-            elif lexeme == "/_":
-                token = Token.DIVFLOOR
-            elif lexeme == ">":
-                token = Token.GREAT
-            elif lexeme == "<":
-                token = Token.LESS
-            elif lexeme == "==":
-                token = Token.EQUAL
-            elif lexeme == ">=":
-                token = Token.GREATQ
-            elif lexeme == "<=":
-                token = Token.LESSEQ
-            elif lexeme == "=":
-                token = Token.ASSIGN
-            elif lexeme == "+=":
-                token = Token.ASSIGNADD
-            elif lexeme == "-=":
-                token = Token.ASSIGNSUB
-            elif lexeme == "*=":
-                token = Token.ASSIGNMULT
-            elif lexeme == "/=":
-                token = Token.ASSIGNDIV
-            elif lexeme == "%=":
-                token = Token.ASSIGNMOD
-            # Assign Floor Div?
-
-        elif self.state == State.logicalOperator:
-            if lexeme == "&&":
-                token = Token.AND
-            elif lexeme == "||":
-                token = Token.OR
-            elif lexeme == "!":
-                token = Token.NOT
-
-        elif self.state == State.semicolon or lexeme == ";":
-            token = Token.SEMICOLON
-
-        elif lexeme == ",":
-            token = Token.COMMA
-
-        elif self.state == State.stringLiteral:
-            token = Token.STRING
-
-        # elif(self.state == State.delimiter):
-        elif lexeme == "{":
-            token = Token.CURLYL
-        elif lexeme == "}":
-            token = Token.CURLYR
-        elif lexeme == "[":
-            token = Token.BOXLEFT
-        elif lexeme == "]":
-            token = Token.BOXRIGHT
-        elif lexeme == "(":
-            token = Token.PARENLEFT
-        elif lexeme == ")":
-            token = Token.PARENRIGHT
-
-        return token
+        if state is None:
+            state = self.state
+        lexemeTokens, token, alphaToken = STATE_CLASSIFICATION.get(state, OTHER_CLASSIFICATION)
+        if alphaToken is not None and lexeme.isalpha():
+            return alphaToken
+        return lexemeTokens.get(lexeme, token)
 
     def processText(self, inputText):
+        self.reset()
+        if self.offsets and self.engine != "regex":
+            self.processTextOffsets(inputText)
+            return
+        if self.engine == "table":
+            self.processTextTable(inputText)
+            return
+        if self.engine == "regex":
+            self.processTextRegex(inputText)
+            return
+
         # TODO check if inputText is valid ===================
-        global lexemeList
         operatorList = ["+", "-", "*", "/", "%", ">", "<", "!", "=", "."]
         logicalOpList = ["&", "|", "!"]
 
-        lexemeList = []
+        lexemeList = TokenList()
 
         lexeme = ""
 
@@ -910,25 +1519,674 @@ class Lexer:
 
         self.state = State.activated
 
+    def lexLine(self, inputLine, lineNumber, carry, emit):
+        """Lex a single line with the precomputed TRANSITION_TABLE.
+
+        Each character costs one dictionary lookup for its CharClass and one
+        table lookup instead of a chain of State comparisons.
+
+        Args:
+            inputLine (string): the line, including its line break
+            lineNumber (int): number of the line, starting at 1
+            carry (tuple): (state, lexeme) returned for the previous line, or LINE_START
+            emit (function): called with lexeme, line, col and token of every token of the line
+
+        Returns:
+            tuple: the (state, lexeme) to carry into the next line
+        """
+        table = TRANSITION_TABLE
+        charClasses = CHAR_CLASS_CACHE
+        stateOf = STATE_OF
+        getToken = self.getTokenBeforeAppend
+        state, lexeme = carry
+
+        colNumber = 0
+        for colNumber, charCurrent in enumerate(inputLine):
+            charClass = charClasses.get(charCurrent)
+            if charClass is None:
+                charClass = charClasses[charCurrent] = int(charClassOf(charCurrent))
+
+            action, nextState = table[state][charClass]
+            if action == APPEND:
+                lexeme = lexeme + charCurrent
+            elif action == START:
+                if lexeme:
+                    emit(lexeme, lineNumber, colNumber, getToken(lexeme, stateOf[state]))
+                lexeme = charCurrent
+            elif action == DROP:
+                if lexeme:
+                    emit(lexeme, lineNumber, colNumber, getToken(lexeme, stateOf[state]))
+                    lexeme = ""
+            elif action == CLOSE:
+                lexeme = lexeme + charCurrent
+                emit(lexeme, lineNumber, colNumber, getToken(lexeme, stateOf[state]))
+                lexeme = ""
+            state = nextState
+
+        # end of line: everything but a multi-line comment is appended
+        if state in CARRIED_STATES:
+            return state, lexeme
+        if lexeme:
+            emit(lexeme, lineNumber, colNumber, getToken(lexeme, stateOf[state]))
+        return LINE_START
+
+    def processTextTable(self, inputText):
+        """Lex the lines with lexLine.
+
+        Produces exactly the lexemeList of the hand-written state machine.
+
+        Args:
+            inputText ([string]): lines of the source, as from readlines()
+        """
+        lexemeList = TokenList()
+        carry = LINE_START
+        for lineNumber, inputLine in enumerate(inputText, 1):
+            carry = self.lexLine(inputLine, lineNumber, carry, lexemeList.add)
+
+        # an unterminated multi-line comment is discarded, as in processText
+        lexemeList.append(
+            [
+                "",
+                0,
+                0,
+                Token.EOF,
+            ]
+        )
+        self.lexemeList = lexemeList
+
+        self.state = State.activated
+
+    def processTextOffsets(self, inputText):
+        """Table engine producing an OffsetTokenList over the joined source.
+
+        Runs TRANSITION_TABLE like lexLine, but the pending lexeme is only the
+        offset where it starts: it always ends just before the current
+        character, so appending a character costs nothing and no string is
+        built per character. A lexeme is sliced out of the source only when
+        its token depends on the text (words, operators, delimiters); the rare
+        lexeme that the table skips characters inside of is kept as text.
+
+        Args:
+            inputText ([string]): lines of the source, as from readlines()
+        """
+        lines = inputText if isinstance(inputText, list) else list(inputText)
+        source = "".join(lines)
+        lexemeList = OffsetTokenList(source)
+        add = lexemeList.add
+        addText = lexemeList.addText
+
+        table = TRANSITION_TABLE
+        charClasses = CHAR_CLASS_CACHE
+        stateOf = STATE_OF
+        constantToken = CONSTANT_TOKEN
+        carried = CARRIED_STATES
+        getToken = self.getTokenBeforeAppend
+        state = LINE_START[0]
+
+        # the pending lexeme is source[start:position], or held when that is not contiguous
+        start = 0
+        held = None
+        lineStart = 0
+        for lineNumber, inputLine in enumerate(lines, 1):
+            position = lineStart
+            for position, charCurrent in enumerate(inputLine, lineStart):
+                charClass = charClasses.get(charCurrent)
+                if charClass is None:
+                    charClass = charClasses[charCurrent] = int(charClassOf(charCurrent))
+
+                action, nextState = table[state][charClass]
+                if action == APPEND:
+                    if held is not None:
+                        held = held + charCurrent
+                elif held is not None:
+                    # rare: characters were skipped inside the pending lexeme
+                    if action != SKIP:
+                        if action == CLOSE:
+                            held = held + charCurrent
+                        addText(held, lineNumber, position - lineStart, getToken(held, stateOf[state]))
+                        held = None
+                        start = position if action == START else position + 1
+                elif action == SKIP:
+                    if start < position:
+                        held = source[start:position]
+                    else:
+                        start = position + 1
+                else:
+                    end = position + 1 if action == CLOSE else position
+                    if start < end:
+                        token = constantToken[state]
+                        if token is None:
+                            token = getToken(source[start:end], stateOf[state])
+                        add(start, end, lineNumber, position - lineStart, token)
+                    start = position if action == START else position + 1
+                state = nextState
+
+            # end of line: everything but a multi-line comment is appended
+            lineStart += len(inputLine)
+            if state in carried:
+                continue
+            if held is not None:
+                addText(held, lineNumber, position - lineStart + len(inputLine), getToken(held, stateOf[state]))
+                held = None
+            elif start < lineStart:
+                token = constantToken[state]
+                if token is None:
+                    token = getToken(source[start:lineStart], stateOf[state])
+                add(start, lineStart, lineNumber, position - lineStart + len(inputLine), token)
+            state = LINE_START[0]
+            start = lineStart
+
+        # an unterminated multi-line comment is discarded, as in processText
+        lexemeList.append(
+            [
+                "",
+                0,
+                0,
+                Token.EOF,
+            ]
+        )
+        self.lexemeList = lexemeList
+
+        self.state = State.activated
+
+    def processTextParallel(self, inputText, workers=None, executor=None):
+        """Lex a large source in chunks on a process pool.
+
+        The lines are cut at safeSplitPoints, every chunk is lexed by
+        lexChunk as if it started a line outside a comment, and the
+        TokenLists are joined with one EOF token. Each chunk's assumption is
+        checked against the carry out of the chunk before it; a chunk that
+        actually started inside a comment is lexed again here with the right
+        carry. The lexemeList is the same as processTextTable's.
+
+        Args:
+            inputText ([string]): lines of the source, as from readlines()
+            workers (int): number of processes, defaults to the number of CPUs
+            executor (Executor): pool to use instead of starting one
+        """
+        self.reset()
+        lines = inputText if isinstance(inputText, list) else list(inputText)
+        workers = workers or os.cpu_count() or 1
+        points = safeSplitPoints(lines, workers)
+        if not points:
+            self.processTextTable(lines)
+            return
+        bounds = list(zip([0] + points, points + [len(lines)]))
+
+        ownExecutor = executor is None
+        if ownExecutor:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(lexChunk, lines[start:end], start + 1) for start, end in bounds]
+            lexemeList = TokenList()
+            carry = LINE_START
+            for (start, end), future in zip(bounds, futures):
+                if carry == LINE_START:
+                    tokens, carry = future.result()
+                else:
+                    future.cancel()
+                    tokens, carry = lexChunk(lines[start:end], start + 1, carry)
+                lexemeList.extend(tokens)
+        finally:
+            if ownExecutor:
+                executor.shutdown(cancel_futures=True)
+
+        # an unterminated multi-line comment is discarded, as in processText
+        lexemeList.append(
+            [
+                "",
+                0,
+                0,
+                Token.EOF,
+            ]
+        )
+        self.lexemeList = lexemeList
+
+        self.state = State.activated
+
+    def processBuffer(self, buffer, encoding="utf-8"):
+        """Lex an encoded source, e.g. an mmap of a very large file.
+
+        The lines are decoded one at a time by bufferLines, so no list of all
+        the lines is built. The state engine needs the whole list of lines, so
+        it lexes the buffer with lexLine instead, which gives the same
+        lexemeList; the regex engine and offsets need the decoded source as
+        one string and join the lines.
+
+        Args:
+            buffer (buffer): the encoded source (mmap, memoryview, bytes)
+            encoding (string): encoding of the source
+        """
+        lines = bufferLines(buffer, encoding)
+        if self.engine == "regex":
+            self.processTextRegex(lines)
+        elif self.offsets:
+            self.processTextOffsets(lines)
+        else:
+            self.processTextTable(lines)
+
+    def iterTokens(self, inputText):
+        """Generator version of the table engine for lazy, streaming lexing.
+
+        Lines are pulled from inputText one at a time (an open file works) and
+        their tokens are yielded before the next line is read, so memory use
+        does not grow with the size of the source. The tokens are the same as
+        processText's, ending with the EOF token; lexemeList is not filled.
+
+        Args:
+            inputText (iterable): lines of the source, e.g. an open file
+
+        Yields:
+            list: [lexeme, line, col, token] of every token
+        """
+        lineTokens = []
+
+        def emit(lexeme, lineNumber, colNumber, token):
+            lineTokens.append([lexeme, lineNumber, colNumber, token])
+
+        carry = LINE_START
+        for lineNumber, inputLine in enumerate(inputText, 1):
+            carry = self.lexLine(inputLine, lineNumber, carry, emit)
+            yield from lineTokens
+            lineTokens.clear()
+
+        yield ["", 0, 0, Token.EOF]
+
+    def processTextRegex(self, inputText):
+        """Lex the whole source with a single finditer over MASTER_PATTERN.
+
+        There is no per-character Python loop, only one iteration per match.
+        Tokens carry the same Token kinds, line numbers and column convention
+        as processText (the column where the lexeme was appended), and the
+        state machine's context is tracked per token so that NEWLINE tokens
+        appear exactly where processText emits them. The output is identical
+        on conventionally spaced sources; this engine follows the lexical
+        grammar rather than the character quirks of the state machine, so it
+        differs where processText drops or merges characters (e.g. "==",
+        "a+b", "5;", "f(x)" or an empty string after a space). Every lexeme
+        is a slice of the source, so with offsets only its span is stored.
+
+        Args:
+            inputText ([string]): lines of the source, as from readlines()
+        """
+        source = "".join(inputText)
+        sourceEnd = len(source)
+        wordTokens = WORD_TOKENS
+        IDENTIFIER, STRING, COMMENT, NEWLINE, INVALID = (
+            Token.IDENTIFIER,
+            Token.STRING,
+            Token.COMMENT,
+            Token.NEWLINE,
+            Token.INVALID,
+        )
+        numberTokens = {"INTEGER": Token.INTEGER, "FLOAT": Token.FLOAT}
+
+        spans = self.offsets
+        lexemeList = OffsetTokenList(source) if spans else TokenList()
+        add = lexemeList.add
+        lineNumber = 1
+        lineStart = 0
+
+        # What processText is doing when the next character arrives:
+        #   "empty" : State.character with nothing pending
+        #   "space" : State.space
+        #   "alpha" : State.character holding a one letter identifier
+        #   "held"  : State.semicolon/State.delimiter, a line break becomes NEWLINE
+        #   "other" : State.character holding a ; or delimiter
+        #   "word"  : State.string
+        #   "value" : a number or arithmetic operator, one space ends it in "empty"
+        context = "empty"
+
+        for match in MASTER_PATTERN.finditer(source):
+            kind = match.lastgroup
+            lexeme = match.group()
+            start, end = match.span()
+
+            if kind == "SPACE":
+                context = "empty" if context == "value" and end - start == 1 else "space"
+                continue
+            if kind == "NEWLINE":
+                if context == "held" and spans:
+                    add(start, end, lineNumber, start - lineStart, NEWLINE)
+                elif context == "held":
+                    add(lexeme, lineNumber, start - lineStart, NEWLINE)
+                lineNumber += 1
+                lineStart = end
+                context = "empty"
+                continue
+
+            if kind == "BLOCKCOMMENT":
+                # the character after "*/" is swallowed with the comment, as in processText
+                closing = lexeme.find("*/", 2) + 2
+                lineBreaks = lexeme.count("\n", 0, closing)
+                if lineBreaks:
+                    lineNumber += lineBreaks
+                    lineStart = start + lexeme.rfind("\n", 0, closing) + 1
+                if closing < 4 or closing == len(lexeme):
+                    continue  # unterminated or ending the file: discarded like processText
+                if spans:
+                    add(start, start + closing, lineNumber, end - 1 - lineStart, COMMENT)
+                else:
+                    add(lexeme[:closing], lineNumber, end - 1 - lineStart, COMMENT)
+                if lexeme[-1] == "\n":
+                    lineNumber += 1
+                    lineStart = end
+                context = "empty"
+                continue
+
+            colNumber = end - lineStart
+            if kind == "WORD":
+                token = wordTokens.get(lexeme, IDENTIFIER)
+                context = "alpha" if len(lexeme) == 1 and context in ["space", "held"] else "word"
+            elif kind == "DELIMITER":
+                token = SYMBOL_TOKENS[lexeme]
+                context = "held" if context in ["empty", "alpha", "other"] else "other"
+            elif kind == "STEP":
+                # "i++" is lexed as "+" with the second character dropped
+                lexeme = lexeme[0]
+                token = SYMBOL_TOKENS[lexeme]
+                colNumber -= 1
+                context = "empty"
+            elif kind == "OPERATOR":
+                token = SYMBOL_TOKENS[lexeme]
+                if len(lexeme) == 2:
+                    colNumber -= 1
+                    context = "empty"
+                else:
+                    context = "value" if lexeme in "+-*/%" else "word"
+            elif kind == "STRING":
+                token = STRING
+                colNumber -= 1
+                context = "empty"
+            elif kind == "INTEGER" or kind == "FLOAT":
+                token = numberTokens[kind]
+                context = "value"
+            elif kind == "LINECOMMENT":
+                token = COMMENT
+                context = "empty"
+            else:
+                token = INVALID
+                context = "word"
+
+            if end == sourceEnd and colNumber == end - lineStart:
+                colNumber -= 1  # the last lexeme of the file is appended at its own last character
+            if spans:
+                add(start, start + len(lexeme), lineNumber, colNumber, token)
+            else:
+                add(lexeme, lineNumber, colNumber, token)
+            if lexeme[-1] == "\n":  # unterminated string literal
+                lineNumber += 1
+                lineStart = end
+
+        lexemeList.append(
+            [
+                "",
+                0,
+                0,
+                Token.EOF,
+            ]
+        )
+        self.lexemeList = lexemeList
+
+        self.state = State.activated
+
+    def writeOutput(self, sink):
+        """Stream the symbol table of lexemeList to a text sink, row by row.
+
+        Args:
+            sink (file): an open text file or any object with write() and writelines()
+        """
+        from SymbolTable import writeText
+
+        writeText(self.lexemeList, sink)
+
     def getOutput(self):
+        """Get the whole symbol table as one string, see writeOutput."""
+        output = io.StringIO()
+        self.writeOutput(output)
+        return output.getvalue()
+
+
+def safeSplitPoints(lines, chunks):
+    """Pick up to chunks - 1 line indexes to cut the source at for parallel lexing.
+
+    Only a /* */ comment carries the table engine's state from one line to
+    the next, so a cut is safe where no comment is open. This is a quick scan
+    that follows "/*", "*/" and "//" only (e.g. not string literals); a wrong
+    guess is caught by processTextParallel, which then re-lexes the chunk.
+
+    Args:
+        lines ([string]): lines of the source
+        chunks (int): number of chunks wanted
+
+    Returns:
+        [int]: increasing indexes of the first line of every chunk but the first
+    """
+    points = []
+    targets = [len(lines) * k // chunks for k in range(chunks - 1, 0, -1)]
+    inComment = False
+    for index, line in enumerate(lines):
+        if targets and index >= targets[-1] and not inComment:
+            if index > 0:
+                points.append(index)
+            while targets and targets[-1] <= index:
+                targets.pop()
+        if not inComment and "/*" not in line:
+            continue
+
+        position = 0
+        while True:
+            if inComment:
+                end = line.find("*/", position)
+                if end < 0:
+                    break
+                inComment = False
+                position = end + 2
+            else:
+                start = line.find("/*", position)
+                if start < 0 or 0 <= line.find("//", position, start):
+                    break
+                inComment = True
+                position = start + 2
+    return points
+
+
+def lexChunk(lines, firstLineNumber, carry=LINE_START):
+    """Lex consecutive lines with the table engine, in a worker process.
+
+    Args:
+        lines ([string]): the lines of the chunk
+        firstLineNumber (int): line number of lines[0] in the whole source
+        carry (tuple): state carried into the first line
+
+    Returns:
+        tuple: the TokenList of the chunk (no EOF token) and the carry out of its last line
+    """
+    lexer = Lexer("table")
+    tokens = TokenList()
+    for lineNumber, inputLine in enumerate(lines, firstLineNumber):
+        carry = lexer.lexLine(inputLine, lineNumber, carry, tokens.add)
+    return tokens, carry
+
+
+class LineCounts:
+    """The number of tokens of every line, with the sums of their prefixes.
+
+    A Fenwick tree over the counts: the tokens before a line are summed, and
+    the count of a line changed, in O(log n) steps. Inserting or removing
+    lines rebuilds it in O(n), as many steps as the renumbering of the tokens
+    after them that IncrementalLexer.update does anyway.
+
+    Attributes:
+        counts : counts[i] is the number of tokens of line i
+        tree : tree[i] is the sum of counts[i & (i + 1) : i + 1]
+    """
+
+    def __init__(self, counts=()):
+        self.counts = array("i", counts)
+        self.build()
+
+    def build(self):
+        tree = array("i", self.counts)
+        size = len(tree)
+        for index in range(size):
+            parent = index | (index + 1)
+            if parent < size:
+                tree[parent] += tree[index]
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.counts)
+
+    def prefix(self, stop):
+        """The number of tokens of lines[:stop]."""
+        tree = self.tree
+        total = 0
+        while stop > 0:
+            total += tree[stop - 1]
+            stop &= stop - 1
+        return total
+
+    def replace(self, start, stop, counts):
+        """Replace the counts of lines[start:stop] with counts."""
+        if len(counts) != stop - start:
+            self.counts[start:stop] = array("i", counts)
+            self.build()
+            return
+        tree = self.tree
+        size = len(tree)
+        for index, count in enumerate(counts, start):
+            change = count - self.counts[index]
+            if change:
+                self.counts[index] = count
+                while index < size:
+                    tree[index] += change
+                    index |= index + 1
+
+
+class IncrementalLexer:
+    """Lexes a source once and then only the lines an edit touches.
+
+    Besides the TokenList it keeps the table engine's carry into every line
+    and the number of tokens every line emitted, so an edit re-lexes the
+    changed lines, and the lines after them only as long as the carry out of
+    a line differs from before (e.g. a "/*" was typed), and splices the new
+    tokens into lexemeList. The lexemeList is always the same as
+    processTextTable's on the edited lines.
+
+    An edit inside lines costs the lines re-lexed plus moving the token
+    columns, the tokens before it are counted with LineCounts; one that adds or removes lines also renumbers the tokens after
+    it, a single pass over the columns that is still far cheaper than lexing.
+
+    Attributes:
+        lines [] : the current lines of the source
+        lexemeList : the TokenList of the source, ending with the EOF token
+        edit : (first, oldEnd, newEnd) of the last update, tokens[first:oldEnd]
+               were replaced by tokens[first:newEnd] (see Parser.parse_incremental)
+    """
+
+    def __init__(self, inputText):
+        self.lexer = Lexer("table")
+        self.lines = list(inputText)
+        self.lexemeList = TokenList()
+        self.carries = [LINE_START]  # carries[i] is the carry into line i
+        tokens, carries, counts = self.lexLines(0, len(self.lines), LINE_START)
+        self.lexemeList.extend(tokens)
+        self.carries.extend(carries)
+        self.lineCounts = LineCounts(counts)  # the number of tokens emitted by every line
+        self.lexemeList.append(["", 0, 0, Token.EOF])
+        self.edit = None
+
+    def lexLines(self, start, stop, carry):
+        """Lex lines[start:stop], returning their tokens, the carry out of every line and token counts."""
+        tokens = TokenList()
+        carries = []
+        counts = array("i")
+        lexLine = self.lexer.lexLine
+        before = 0
+        for index in range(start, stop):
+            carry = lexLine(self.lines[index], index + 1, carry, tokens.add)
+            carries.append(carry)
+            counts.append(len(tokens) - before)
+            before = len(tokens)
+        return tokens, carries, counts
+
+    def update(self, start, end, newLines):
+        """Replace lines[start:end] with newLines and re-lex what changed.
+
+        Args:
+            start (int): index of the first replaced line, from 0
+            end (int): index after the last replaced line (start for a pure insertion)
+            newLines ([string]): the new lines, each with its line break
+
+        Returns:
+            tuple: (start, stop), the indexes of the lines that were re-lexed
+        """
+        delta = len(newLines) - (end - start)
+        oldCarries = self.carries
+        self.lines[start:end] = newLines
+
+        # re-lex the new lines, then go on while the carry differs from before
+        stop = start + len(newLines)
+        tokens, carries, counts = self.lexLines(start, stop, oldCarries[start])
+        carry = carries[-1] if carries else oldCarries[start]
+        while stop < len(self.lines) and carry != oldCarries[stop - delta]:
+            more, moreCarries, moreCounts = self.lexLines(stop, stop + 1, carry)
+            tokens.extend(more)
+            carries.extend(moreCarries)
+            counts.extend(moreCounts)
+            carry = moreCarries[-1]
+            stop += 1
+        oldStop = stop - delta
+
+        # splice the tokens of lines[start:stop] over those of the old lines[start:oldStop]
+        first = self.lineCounts.prefix(start)
+        oldEnd = self.lineCounts.prefix(oldStop)
+        lexemeList = self.lexemeList
+        lexemeList.lexemes[first:oldEnd] = tokens.lexemes
+        lexemeList.kinds[first:oldEnd] = tokens.kinds
+        lexemeList.cols[first:oldEnd] = tokens.cols
+        lexemeList.lines[first:oldEnd] = tokens.lines
+        if delta:
+            # renumber the lines after the edit, but not the EOF token
+            newEnd = first + len(tokens)
+            lexemeList.lines[newEnd:-1] = array("i", [line + delta for line in lexemeList.lines[newEnd:-1]])
+
+        self.lineCounts.replace(start, oldStop, counts)
+        self.carries[start + 1 : oldStop + 1] = carries
+        self.edit = (first, oldEnd, first + len(tokens))
+        return start, stop
+
+
+class LexerPool:
+    """A thread-safe pool of reusable Lexer instances for long-running services.
+
+    Every Lexer keeps its state in the instance, so each thread borrows its
+    own from the pool; a thread that finds all of them busy waits for one.
+
+    Attributes:
+        size : number of Lexer instances
+        engine, offsets : passed to every Lexer
+    """
 
-        output = "TOKEN                LINE#  COL#  \tLEXEME\n"
-        output = output + "=========================================================\n"
-        for i in self.lexemeList:
-            a, b, c, d = i
-            # a = Token
-            # b = Line
-            # c = Col
-            # d = Lexeme
-            # print(i);
-            output = output + (
-                f"{repr(str(d)):20}"
-                + " "
-                + f"{repr(str(b)):3}"
-                + "   "
-                + f"{repr(str(c)):3}"
-                + "   \t"
-                + repr(str(a))
-                + "\n"
-            )
-        return output
+    def __init__(self, size=4, engine="state", offsets=False):
+        self.size = size
+        self.idle = queue.LifoQueue()
+        for _ in range(size):
+            self.idle.put(Lexer(engine, offsets))
+
+    @contextmanager
+    def lexer(self):
+        """Borrow a Lexer for the duration of a with block."""
+        lexer = self.idle.get()
+        try:
+            yield lexer
+        finally:
+            lexer.reset()  # do not keep the tokens alive in the pool
+            self.idle.put(lexer)
+
+    def lex(self, inputText):
+        """Lex the lines with a pooled Lexer and return its lexemeList."""
+        with self.lexer() as lexer:
+            lexer.processText(inputText)
+            return lexer.lexemeList
@@ -1,7 +1,19 @@
-import sys
+import argparse
+import mmap
 import os
+import sys
+import threading
+import Batch
+from Cache import Cache
+import Interpreter
 from Lexer import Lexer
+import Optimizer
 from Parser import Parser
+import Profile
+from Runtime import PytmeError
+import SymbolTable
+import Transpiler
+import VM
 
 # from Parser import Parser;
 
@@ -11,29 +23,327 @@ from Parser import Parser
 dir_path = os.path.dirname(os.path.realpath(__file__))
 # Initialize path of the system
 
+# the ways --run can execute a program
+RUN_ENGINES = {"vm": VM.run, "tree": Interpreter.run, "python": Transpiler.run}
+
+
+def writeTable(tokens, path, format):
+    if format == "binary":
+        with open(path, "wb") as file:
+            SymbolTable.writeBinary(tokens, file)
+    else:
+        with open(path, "w") as file:
+            SymbolTable.write(tokens, file, format)
+    print(path + " is written.")
+
+
+def runProgram(program, engine, phase=Profile.noPhase):
+    # run a parsed program with one of RUN_ENGINES, exits with status 1
+    # after reporting a runtime error
+    with phase("run"):
+        try:
+            RUN_ENGINES[engine](program)
+        except PytmeError as error:
+            print(error)
+            sys.exit(1)
+
+
+def useProgram(program, run, optimize, phase=Profile.noPhase):
+    # optimize the tree of a parsed program and report the changes, then run
+    # it with one of RUN_ENGINES; either step is skipped when not asked for
+    if optimize:
+        with phase("optimize"):
+            changes = Optimizer.optimize(program)
+        for line, change in changes:
+            print(f"Optimized line {line}: {change}")
+    if run is not None:
+        runProgram(program, run, phase)
+
+
+def loadCached(
+    address, cache, format="text", tablePath=None, phase=Profile.noPhase, run=None, optimize=False, rules=None
+):
+    # like loadFile, but an unchanged file is neither lexed nor parsed again,
+    # unless its rules are traced, or it is run or optimized
+
+    with phase("read"):
+        with open(address, "rb") as myfile:
+            data = myfile.read()
+    with phase("cache") as counts:
+        tokens, outcome, hit = cache.check(data)
+        counts["tokens"] = len(tokens)
+    print("LEXICAL ANALYSIS COMPLETE" + (" (cached)" if hit else ""))
+
+    if tablePath is not None:
+        with phase("table") as counts:
+            writeTable(tokens, tablePath, format)
+            counts["tokens"] = len(tokens)
+
+    program = None
+    if rules is not None or run is not None or optimize:
+        # the cache keeps no tree, the cached tokens are parsed again
+        with phase("parse") as counts:
+            counts["tokens"] = len(tokens)
+            parser = Parser(tokens, pause_gc=True)
+            if rules is not None:
+                rules.attach(parser)
+            program = parser.pytme_pl()
 
-def loadFile(address):
+    if outcome["status"] != "ok":
+        for error in outcome["errors"]:
+            print(f"Syntax Error at line {error['line']} column {error['column']}: {error['message']}")
+        sys.exit(1)
+    print("Parsing successful")
+    if program is not None:
+        useProgram(program, run, optimize, phase)
+
+
+def loadFile(
+    address,
+    format="text",
+    tablePath=None,
+    writeAsync=False,
+    mapped=False,
+    offsets=False,
+    jobs=None,
+    cache=None,
+    profiler=None,
+    rules=None,
+    run=None,
+    optimize=False,
+):
+    # tablePath None skips the symbol table, writeAsync writes it on a
+    # background thread while the parser runs, mapped lexes an mmap of the
+    # file, offsets keeps the tokens as offsets into the source, jobs lexes
+    # chunks of the file on that many processes, cache is a Cache to consult,
+    # profiler a Profile.Profiler measuring the phases, rules a
+    # Profile.RuleProfiler tracing the parser, run one of RUN_ENGINES to
+    # execute the program once it parsed, optimize to simplify its tree with
+    # Optimizer first. Exits with status 1 after reporting the syntax errors,
+    # if any.
+    phase = profiler.phase if profiler is not None else Profile.noPhase
+    if cache is not None:
+        loadCached(address, cache, format, tablePath, phase, run, optimize, rules)
+        return
+
+    lexer = Lexer(offsets=offsets)
+
+    if mapped:
+        with open(address, "rb") as myfile:
+            # the pages are read as the lexer touches them
+            with phase("lex") as counts:
+                if os.fstat(myfile.fileno()).st_size == 0:
+                    lexer.processBuffer(b"")  # an empty file cannot be mapped
+                else:
+                    with mmap.mmap(myfile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                        lexer.processBuffer(buffer)
+                counts["tokens"] = len(lexer.lexemeList)
+        print("LEXICAL ANALYSIS COMPLETE")
+    else:
+        with open(address, "r") as myfile:
+            with phase("read"):
+                lines = myfile.readlines()
+
+            with phase("lex") as counts:
+                if jobs:
+                    lexer.processTextParallel(lines, jobs)
+                else:
+                    lexer.processText(lines)
+                counts["tokens"] = len(lexer.lexemeList)
+            print("LEXICAL ANALYSIS COMPLETE")
+
+    writer = None
+    if tablePath is not None:
+        if writeAsync:
+            # the parser only reads lexemeList, so it can be shared with the writer
+            writer = threading.Thread(target=writeTable, args=(lexer.lexemeList, tablePath, format))
+            writer.start()
+        else:
+            with phase("table") as counts:
+                writeTable(lexer.lexemeList, tablePath, format)
+                counts["tokens"] = len(lexer.lexemeList)
+
+    with phase("parse") as counts:
+        counts["tokens"] = len(lexer.lexemeList)
+        parser = Parser(lexer.lexemeList, pause_gc=True)
+        if rules is not None:
+            rules.attach(parser)
+        diagnostics = parser.parse()
+    if writer:
+        # only the wait for the writer remains, it ran during parsing
+        with phase("table wait"):
+            writer.join()
+    if diagnostics:
+        sys.exit(1)
+    useProgram(parser.program, run, optimize, phase)
+
+
+def streamFile(address, profiler=None, rules=None, run=None, optimize=False):
 
     lexer = Lexer()
+    phase = profiler.phase if profiler is not None else Profile.noPhase
 
     with open(address, "r") as myfile:
-        lines = myfile.readlines()
+        # the file is lexed line by line, only as far as the parser asks, so
+        # reading, lexing and parsing are one phase
+        with phase("stream"):
+            parser = Parser(lexer.iterTokens(myfile), keep_tree=run is not None or optimize, pause_gc=True)
+            if rules is not None:
+                rules.attach(parser)
+            diagnostics = parser.parse()
+    if diagnostics:
+        sys.exit(1)
+    useProgram(parser.program, run, optimize, phase)
+
+
+def reportProfile(profiler, rules, address, show, jsonPath):
+    # print and/or save the measurements of --profile and --trace-rules
+    if profiler is not None:
+        profiler.finish()
+        if show:
+            profiler.report(sys.stdout)
+    if rules is not None:
+        rules.report(sys.stdout)
+    if jsonPath is not None:
+        details = {"file": address}
+        if rules is not None:
+            details["rules"] = rules.records()
+        (profiler or Profile.Profiler()).writeJson(jsonPath, **details)
 
-        lexer.processText(lines)
-        print("LEXICAL ANALYSIS COMPLETE")
 
-    with open("symboltable.txt", "w") as file:
-        file.write(lexer.getOutput())
-        print("symboltable.txt is written.")
+# --batch workers may re-import this module (spawn start method), the command line runs only here
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description="Lexical and syntax analyzer for Pytme (.pyt) files.")
+    argParser.add_argument("file", nargs="+", help="the .pyt file to analyze, or files and directories with --batch")
+    argParser.add_argument("--batch", action="store_true", help="check many files in parallel and print a report")
+    argParser.add_argument("--workers", type=int, help="worker processes of --batch (default: number of CPUs)")
+    argParser.add_argument("--report", metavar="PATH", help="also write the --batch report as JSON")
+    argParser.add_argument(
+        "--stream",
+        action="store_true",
+        help="lex lazily while parsing, in constant memory (symboltable.txt is not written)",
+    )
+    argParser.add_argument(
+        "--format",
+        default="text",
+        choices=SymbolTable.FORMATS,
+        help="format of the symbol table: the text table, JSON Lines or the compact binary token stream",
+    )
+    argParser.add_argument("--table", metavar="PATH", help="path of the symbol table (default: symboltable.txt/.jsonl/.bin)")
+    argParser.add_argument("--no-table", action="store_true", help="do not write the symbol table, only check the syntax")
+    argParser.add_argument(
+        "--async-table",
+        action="store_true",
+        help="write the symbol table on a background thread while parsing",
+    )
+    argParser.add_argument("--mmap", action="store_true", help="lex a memory map of the file instead of a list of its lines")
+    argParser.add_argument("--offsets", action="store_true", help="keep lexemes as offsets into the source, sliced when needed")
+    argParser.add_argument("--jobs", type=int, metavar="N", help="lex chunks of a large file on N processes")
+    argParser.add_argument(
+        "--cache",
+        nargs="?",
+        const=".pytmecache",
+        metavar="DIR",
+        help="reuse the tokens and parse result of unchanged files from a cache directory (default: .pytmecache)",
+    )
+    argParser.add_argument("--cache-size", type=int, default=64, metavar="MB", help="size limit of the cache")
+    argParser.add_argument(
+        "--profile",
+        action="store_true",
+        help="report the wall and CPU time and tokens/s of every phase (see --profile-memory for memory)",
+    )
+    argParser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="--profile with the peak memory of every phase (tracemalloc, much slower)",
+    )
+    argParser.add_argument("--profile-json", metavar="PATH", help="write the --profile measurements as JSON")
+    argParser.add_argument(
+        "--trace-rules",
+        action="store_true",
+        help="count the calls, tokens and time of every grammar rule of the parser",
+    )
+    argParser.add_argument(
+        "--run",
+        nargs="?",
+        const="vm",
+        choices=RUN_ENGINES,
+        help="run the program once it parsed, on the bytecode VM (default), the tree-walking interpreter or as translated Python",
+    )
+    argParser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="fold constant expressions and remove dead branches before --run, and report the changes",
+    )
+    args = argParser.parse_args()
 
-    parser = Parser(lexer.lexemeList)
-    parser.parse()
+    if args.batch:
+        cacheSize = args.cache_size * 1024 * 1024
+        sys.exit(Batch.main(args.file, args.workers, jsonPath=args.report, sink=sys.stdout, cache=args.cache, cacheSize=cacheSize))
+    if len(args.file) > 1:
+        argParser.error("several files can only be checked with --batch")
+    address = args.file[0]
+    if args.cache:
+        # a cached file is not lexed, these options would do nothing
+        ignored = [
+            option
+            for option, given in [
+                ("--stream", args.stream),
+                ("--async-table", args.async_table),
+                ("--mmap", args.mmap),
+                ("--offsets", args.offsets),
+                ("--jobs", args.jobs),
+            ]
+            if given
+        ]
+        if ignored:
+            argParser.error(f"--cache cannot be combined with {', '.join(ignored)}")
+    if args.jobs:
+        # the chunks are lexed from lines into a TokenList, a map or offsets would be ignored
+        ignored = [option for option, given in [("--mmap", args.mmap), ("--offsets", args.offsets)] if given]
+        if ignored:
+            argParser.error(f"--jobs cannot be combined with {', '.join(ignored)}")
 
+    profiler = None
+    if args.profile or args.profile_memory or args.profile_json:
+        profiler = Profile.Profiler(args.profile_memory)
+    rules = Profile.RuleProfiler() if args.trace_rules else None
+    finishProfile = None
+    if profiler is not None or rules is not None:
+        finishProfile = lambda: reportProfile(
+            profiler, rules, address, args.profile or args.profile_memory, args.profile_json
+        )
 
-if sys.argv[1][-4] + (sys.argv[1][-3] + sys.argv[1][-2] + sys.argv[1][-1]).lower() == ".pyt":
-    loadFile(sys.argv[1])
-else:
-    print("Invalid filetype")
-# try:
-# except:
-#     print("No file found at address found")
+    if address[-4] + (address[-3] + address[-2] + address[-1]).lower() == ".pyt":
+        try:
+            if args.stream:
+                streamFile(address, profiler, rules, args.run, args.optimize)
+            else:
+                if args.no_table:
+                    tablePath = None
+                else:
+                    tablePath = args.table or "symboltable" + SymbolTable.EXTENSIONS[args.format]
+                cache = Cache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+                loadFile(
+                    address,
+                    args.format,
+                    tablePath,
+                    args.async_table,
+                    args.mmap,
+                    args.offsets,
+                    args.jobs,
+                    cache,
+                    profiler,
+                    rules,
+                    args.run,
+                    args.optimize,
+                )
+        finally:
+            # also after a syntax error, which exits with sys.exit
+            if finishProfile is not None:
+                finishProfile()
+    else:
+        print("Invalid filetype")
+    # try:
+    # except:
+    #     print("No file found at address found")
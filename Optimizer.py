@@ -0,0 +1,252 @@
+import Ast
+from Lexer import Token
+import Runtime
+from Runtime import PytmeError
+
+# Simplification of the Ast built by Parser, before it is run:
+#   program = parser.pytme_pl()
+#   for line, change in Optimizer.optimize(program):
+#       print(line, change)
+# Operators on literals only (5 < 6, 2 * 3 + 1, "a" + 1, !true) are folded
+# into a literal with Runtime.binary, so they are computed once instead of at
+# every evaluation; an operation that fails (1 / 0) is left to fail when it
+# runs. && and || fold as soon as their left literal decides them.
+#
+# A condition folded to a literal then decides the statement: the branches
+# of an if that are never taken are removed and an always taken one replaces
+# the if, a while that never runs is removed and a do-while that never
+# repeats becomes its body. Dead code is only removed when it declares no
+# variable and defines no function: the variables of a scope exist from its
+# start with the type of their first declaration, wherever it is.
+#
+# The tree is changed in place and optimize returns what was changed.
+
+# the literals folding may create, by the type of their value
+LITERAL_TOKENS = {int: Token.INTEGER, float: Token.FLOAT, str: Token.STRING, bool: Token.BOOLEAN}
+
+# the largest string (in characters) or integer (in bits) a fold may create,
+# larger values are left to be computed when they are needed
+MAX_FOLDED_SIZE = 4096
+
+
+class Optimizer:
+    """Folds constant expressions and removes dead branches of an Ast.Program.
+
+    Attributes:
+        changes : (line, description) of every change, in source order
+    """
+
+    def __init__(self) -> None:
+        self.changes = []
+
+    def optimize(self, program):
+        """Optimize the program in place, returns the changes."""
+        program.statements = self.block(program.statements)
+        self.changes.sort(key=lambda change: change[0])
+        return self.changes
+
+    def note(self, line, description):
+        self.changes.append((line, description))
+
+    # statements
+    def block(self, statements):
+        optimized = []
+        for statement in statements:
+            optimized += self.statement(statement)
+        return optimized
+
+    def statement(self, node):
+        # the statements that replace a statement
+        kind = type(node)
+        if kind is Ast.Declaration:
+            for variable in node.variables:
+                if variable.value is not None:
+                    variable.value = self.fold(variable.value)
+        elif kind is Ast.Assign:
+            node.value = self.fold(node.value)
+        elif kind is Ast.Call:
+            node.arguments = [self.fold(argument) for argument in node.arguments]
+        elif kind in (Ast.Display, Ast.Dispatch):
+            if node.value is not None:
+                node.value = self.fold(node.value)
+        elif kind is Ast.If:
+            return self.ifStatement(node)
+        elif kind is Ast.For:
+            node.condition = self.fold(node.condition)
+            node.body = self.block(node.body)
+        elif kind is Ast.While:
+            # decided before the body is looked at, a removed body has nothing to report
+            condition = self.expression(node.condition)
+            if isLiteral(condition) and not condition.value and removable(node.body):
+                self.note(node.line, f"removed the while loop, {always(node.condition, False)}")
+                return []
+            node.condition = self.keep(node.condition, condition)
+            node.body = self.block(node.body)
+        elif kind is Ast.DoWhile:
+            node.body = self.block(node.body)
+            condition = self.expression(node.condition)
+            if isLiteral(condition) and not condition.value:
+                self.note(node.line, f"replaced the do-while loop by its body, {always(node.condition, False)}")
+                return node.body
+            node.condition = self.keep(node.condition, condition)
+        elif kind is Ast.Function:
+            node.body = self.block(node.body)
+        return [node]
+
+    def ifStatement(self, node):
+        # the branches are decided one by one before their bodies are looked
+        # at, so only the surviving bodies are optimized and reported
+        branches = node.branches
+        orelse = node.orelse
+        kept = []
+        removed = []  # the notes of removed branches, if the if stays
+        taken = None  # the condition of the branch always taken
+        for index, (original, body) in enumerate(branches):
+            condition = self.expression(original)
+            if isLiteral(condition):
+                if not condition.value and removable(body):
+                    removed.append((condition.line, f"removed the branch of {text(original)}, which is always false"))
+                    continue
+                later = [statement for _, rest in branches[index + 1 :] for statement in rest]
+                if condition.value and removable(later + (orelse or [])):
+                    if later or orelse:
+                        removed.append(
+                            (condition.line, f"removed the branches after the one of {text(original)}, which is always true")
+                        )
+                    orelse = body  # whenever it is reached
+                    taken = original
+                    break
+            kept.append((self.keep(original, condition), self.block(body)))
+        orelse = None if orelse is None else self.block(orelse)
+        if kept:
+            for line, description in removed:
+                self.note(line, description)
+            node.branches = kept
+            node.orelse = orelse
+            return [node]
+        if taken is not None:
+            self.note(node.line, f"replaced the if by the branch of {text(taken)}, which is always true")
+        elif orelse:
+            self.note(node.line, "replaced the if by its else, every condition is always false")
+        else:
+            self.note(node.line, "removed the if, every condition is always false")
+        return orelse or []
+
+    # expressions
+    def fold(self, node):
+        """The expression with its literal-only subexpressions folded."""
+        folded = self.expression(node)
+        if isLiteral(folded) and not isLiteral(node):
+            self.note(node.line, f"folded {text(node)} to {text(folded)}")
+        return folded
+
+    def expression(self, node):
+        kind = type(node)
+        if kind is Ast.Binary:
+            return self.binary(node)
+        if kind is Ast.Unary:
+            operand = self.expression(node.operand)
+            if isLiteral(operand):
+                return Ast.Literal(not operand.value, Token.BOOLEAN, node.line, node.column)
+            node.operand = self.keep(node.operand, operand)
+        return node
+
+    def keep(self, original, folded):
+        # a folded operand of an operator that cannot be folded itself
+        if isLiteral(folded) and not isLiteral(original):
+            self.note(original.line, f"folded {text(original)} to {text(folded)}")
+        return folded
+
+    def binary(self, node):
+        # a chain like a + b + c nests to the left, its operators are folded
+        # in a loop from the innermost one out
+        chain = []
+        while type(node) is Ast.Binary:
+            chain.append(node)
+            node = node.left
+        left = self.expression(node)
+        for node in reversed(chain):
+            left = self.operation(node, left, self.expression(node.right))
+        return left
+
+    def operation(self, node, left, right):
+        # a binary operator whose operands were optimized to left and right
+        operator = node.operator
+        if operator in (Token.AND, Token.OR) and isLiteral(left):
+            # the right operand is only evaluated when the left does not decide
+            if bool(left.value) == (operator == Token.OR):
+                return Ast.Literal(bool(left.value), Token.BOOLEAN, node.line, node.column)
+            if isLiteral(right):
+                return Ast.Literal(bool(right.value), Token.BOOLEAN, node.line, node.column)
+        elif isLiteral(left) and isLiteral(right) and not tooLarge(operator, left.value, right.value):
+            try:
+                value = Runtime.binary(operator, left.value, right.value)
+            except PytmeError:
+                pass  # it fails when it runs
+            else:
+                return Ast.Literal(value, LITERAL_TOKENS[type(value)], node.line, node.column)
+        node.left = self.keep(node.left, left)
+        node.right = self.keep(node.right, right)
+        return node
+
+
+def isLiteral(node):
+    return type(node) is Ast.Literal
+
+
+def always(condition, value):
+    # the note of a condition that is always true or false
+    if isLiteral(condition):
+        return f"its condition is {Runtime.show(value)}"
+    return f"its condition {text(condition)} is always {Runtime.show(value)}"
+
+
+def removable(statements):
+    # dead statements may go unless they declare variables of the scope or
+    # define functions, which Runtime.check looks at before the program runs
+    if Runtime.declaredKinds(statements):
+        return False
+    return not any(isinstance(node, Ast.Function) for statement in statements for node in Ast.walk(statement))
+
+
+def tooLarge(operator, left, right):
+    # whether an operation on literals would create a value over MAX_FOLDED_SIZE
+    if operator == Token.MULTIPLY:
+        if isinstance(left, str) and isinstance(right, int):
+            return len(left) * right > MAX_FOLDED_SIZE
+        if isinstance(right, str) and isinstance(left, int):
+            return len(right) * left > MAX_FOLDED_SIZE
+    if operator == Token.EXPONENT and type(left) is int and type(right) is int and right > 0:
+        return abs(left).bit_length() * right > MAX_FOLDED_SIZE
+    return False
+
+
+def text(node):
+    """A literal-only expression as Pytme source, for the changes."""
+    kind = type(node)
+    if kind is Ast.Literal:
+        return f'"{node.value}"' if node.kind == Token.STRING else Runtime.show(node.value)
+    if kind is Ast.Unary:
+        return Runtime.SYMBOLS[node.operator] + operand(node.operand)
+    if kind is Ast.Binary:
+        chain = []
+        while type(node) is Ast.Binary:
+            chain.append(node)
+            node = node.left
+        written = text(node)
+        for index, node in enumerate(reversed(chain)):
+            left = f"( {written} )" if index else written
+            written = f"{left} {Runtime.SYMBOLS[node.operator]} {operand(node.right)}"
+        return written
+    if kind is Ast.Name:
+        return node.name
+    return "input()"
+
+
+def operand(node):
+    return f"( {text(node)} )" if type(node) is Ast.Binary else text(node)
+
+
+def optimize(program):
+    """Optimize an Ast.Program in place, see Optimizer. Returns the changes."""
+    return Optimizer().optimize(program)
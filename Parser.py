@@ -1,24 +1,216 @@
-import os
-from Lexer import Token
+import gc
+import sys
+import unicodedata
+from bisect import bisect_left
+from collections import deque
+from Ast import Assign, Binary, Call, Declaration, Dispatch, Display, DoWhile, For, Function, If, Input, Literal
+from Ast import Name, Program, Unary, Variable, While
+from Lexer import OffsetTokenList, Token, TokenList
+
+# bumped whenever the language accepted by the Parser or what it reports
+# changes, it is part of the Cache keys
+PARSER_VERSION = 4
+
+# Binding powers of the binary operators of expressions, loosest first. NOT
+# is a prefix at its own level: it applies to a whole comparison chain and
+# only starts an operand of AND or OR. EXPONENT is not produced by the Lexer
+# ("**" opens a comment), the entry is there for when it is.
+OR_POWER = 1
+AND_POWER = 2
+NOT_POWER = 3
+COMPARISON_POWER = 4
+BINARY_POWERS = {
+    Token.OR: OR_POWER,
+    Token.AND: AND_POWER,
+    Token.LESS: COMPARISON_POWER,
+    Token.GREAT: COMPARISON_POWER,
+    Token.EQUAL: COMPARISON_POWER,
+    Token.NOTEQUAL: COMPARISON_POWER,
+    Token.GREATQ: COMPARISON_POWER,
+    Token.LESSEQ: COMPARISON_POWER,
+    Token.ADD: 5,
+    Token.SUBTRACT: 5,
+    Token.MULTIPLY: 6,
+    Token.DIVIDE: 6,
+    Token.MODULO: 6,
+    Token.DIVFLOOR: 6,
+    Token.EXPONENT: 7,
+}
+RIGHT_ASSOCIATIVE = frozenset([Token.EXPONENT])
+# "a && b && c" is not an expression
+NON_ASSOCIATIVE = frozenset([Token.AND])
+
+# tokens that can start a value, reported as expected by an invalid one
+VALUE_START = (Token.IDENTIFIER, Token.INTEGER, Token.FLOAT, Token.STRING, Token.BOOLEAN, Token.PARENLEFT)
+
+
+def number_value(lexeme, kind):
+    # int or float of a number lexeme. The Lexer takes every str.isnumeric
+    # character for a digit, so numerals Python does not read (like "²") count
+    # as their digit value; ValueError when one has none (like "½")
+    try:
+        return kind(lexeme)
+    except ValueError:
+        return kind("".join(char if char == "." else str(unicodedata.digit(char)) for char in lexeme))
+
+
+# the Python value of the lexeme of every literal token, STRING lexemes keep
+# their quotes; the numbers raise ValueError for lexemes without a value
+LITERAL_VALUES = {
+    Token.INTEGER: lambda lexeme: number_value(lexeme, int),
+    Token.FLOAT: lambda lexeme: number_value(lexeme, float),
+    Token.STRING: lambda lexeme: lexeme[1:-1],
+    Token.BOOLEAN: lambda lexeme: lexeme == "true",
+}
+
+
+class TokenStream:
+    """Forward-only view of a token iterator that can be indexed like a token list.
+
+    Tokens are pulled from the iterator only when the parser asks for them and
+    are released once the parser moves past them, so at most `lookahead`
+    tokens are held in memory.
+    """
+
+    def __init__(self, tokens, lookahead=2) -> None:
+        self.tokens = iter(tokens)
+        self.buffer = deque()
+        self.offset = 0  # index of buffer[0]
+        self.lookahead = lookahead
+        self.exhausted = False
+
+    def __getitem__(self, index):
+        if index < self.offset:
+            raise IndexError(f"token {index} was already released by the stream")
+
+        # release the tokens the parser has moved past
+        while self.buffer and self.offset < index:
+            self.buffer.popleft()
+            self.offset += 1
+        if index - self.offset >= self.lookahead:
+            raise IndexError(f"token {index} is beyond the lookahead of the stream")
+
+        while len(self.buffer) <= index - self.offset:
+            try:
+                self.buffer.append(next(self.tokens))
+            except StopIteration:
+                self.exhausted = True
+                raise IndexError("token index out of range")
+        return self.buffer[index - self.offset]
+
+    def lexeme(self, index):
+        return self[index][0]
+
+    def line(self, index):
+        return self[index][1]
+
+    def column(self, index):
+        return self[index][2]
+
+    def token(self, index):
+        return self[index][3]
+
+    def __len__(self):
+        # unknown until the iterator runs out
+        if self.exhausted:
+            return self.offset + len(self.buffer)
+        return sys.maxsize
+
+
+class Diagnostic:
+    """One syntax error found by the Parser.
+
+    Attributes:
+        line : line of the offending token
+        column : column of the offending token
+        message : what is wrong
+        expected : the Token kinds that would have been accepted, empty when
+                   the error is not about one missing token
+    """
+
+    __slots__ = ("line", "column", "message", "expected")
+
+    def __init__(self, line, column, message, expected=()) -> None:
+        self.line = line
+        self.column = column
+        self.message = message
+        self.expected = tuple(expected)
+
+    def __str__(self):
+        return f"Syntax Error at line {self.line} column {self.column}: {self.message}"
+
+    def __repr__(self):
+        return f"Diagnostic({self.line}, {self.column}, {self.message!r}, {self.expected!r})"
+
+    def to_dict(self):
+        """JSON-friendly form, the expected tokens by name."""
+        return {
+            "line": self.line,
+            "column": self.column,
+            "message": self.message,
+            "expected": [token.name for token in self.expected],
+        }
+
+
+class ParseError(Exception):
+    """A syntax error, raised by a Parser created with recover=False.
+
+    A recovering Parser catches it and keeps its Diagnostic instead.
+    """
+
+    def __init__(self, message, line, column, expected=()) -> None:
+        super().__init__(f"Syntax Error at line {line} column {column}: {message}")
+        self.message = message
+        self.line = line
+        self.column = column
+        self.expected = tuple(expected)
+
+    def diagnostic(self):
+        return Diagnostic(self.line, self.column, self.message, self.expected)
 
 
 class Parser:
-    def __init__(self, tokens) -> None:
+    def __init__(self, tokens, recover=True, keep_tree=True, pause_gc=False) -> None:
+        # a token list is indexed directly, anything else (e.g. Lexer.iterTokens) is streamed
+        if not hasattr(tokens, "__getitem__"):
+            tokens = TokenStream(tokens)
+        elif not isinstance(tokens, (TokenList, OffsetTokenList)):
+            tokens = TokenList(tokens)
         self.tokens = tokens
         self.index = 0
+        # True records every syntax error in diagnostics and skips to the end
+        # of the broken statement, False raises ParseError at the first one
+        self.recover = recover
+        self.diagnostics = []
+        # called with every diagnostic as soon as it is recorded, see parse
+        self.report = None
+        # filled by pytme_pl, see parse_incremental; a stream cannot be
+        # parsed again, so its spans are not recorded
+        self.statement_spans = []
+        self.function_bodies = []
+        self.record_spans = not isinstance(tokens, TokenStream)
+        self.complete = False
+        # the Ast.Program built by pytme_pl; without keep_tree every top-level
+        # statement is dropped once parsed, so a streamed parse stays small
+        self.keep_tree = keep_tree
+        self.program = None
+        # True pauses the cyclic garbage collector while pytme_pl builds the
+        # tree (1.1-1.5x faster on 20000 line programs). The collector is
+        # process-wide, so only single-threaded callers like Main opt in
+        self.pause_gc = pause_gc
 
     # Helper methods
     def get_lexeme(self):
-        return self.tokens[self.index][0]
+        return self.tokens.lexeme(self.index)
 
     def get_line_no(self):
-        return self.tokens[self.index][1]
+        return self.tokens.line(self.index)
 
     def get_column_no(self):
-        return self.tokens[self.index][2]
+        return self.tokens.column(self.index)
 
     def get_token(self):
-        return self.tokens[self.index][3]
+        return self.tokens.token(self.index)
 
     def consume(self, token: Token | None = None):
         # just advance to the next token
@@ -32,350 +224,386 @@ class Parser:
             return True
         return False
 
-    def print_error(self, message):
-        # raise Exception(f"Syntax Error at line {self.get_line_no()} column {self.get_column_no()}: {message}")
-        print(f"Syntax Error at line {self.get_line_no()} column {self.get_column_no()}: {message}")
-        os._exit(1)
+    def error(self, message, expected=()):
+        raise ParseError(message, self.get_line_no(), self.get_column_no(), expected)
+
+    def expect(self, token, message):
+        # consume the token, or fail with the message
+        if not self.consume(token):
+            self.error(message, (token,))
+
+    def block_statements(self):
+        # the statements of a { } block, up to its '}'
+        statements = []
+        while self.get_token() != Token.CURLYR:
+            self.consume(Token.NEWLINE)
+            start = self.index
+            node = self.recovering_statement()
+            if node is not None:
+                statements.append(node)
+            if self.index == start:
+                break  # stuck at the end of the tokens, the '}' is reported missing
+        return statements
+
+    def recovering_statement(self):
+        # a statement; when recovering, a syntax error in it is recorded and
+        # the rest of it is skipped
+        if not self.recover:
+            return self.statement()
+        try:
+            return self.statement()
+        except ParseError as error:
+            last = self.diagnostics[-1] if self.diagnostics else None
+            # the enclosing statements fail again where a nested one gave up
+            if last is None or (last.line, last.column) != (error.line, error.column):
+                diagnostic = error.diagnostic()
+                self.diagnostics.append(diagnostic)
+                if self.report is not None:
+                    self.report(diagnostic)
+            self.synchronize()
+            return None
+
+    def synchronize(self):
+        # panic mode: skip past the ';' ending the broken statement or past
+        # the { } block it opened, or up to the '}' of the enclosing block
+        depth = 0
+        while True:
+            token = self.get_token()
+            if token == Token.EOF or (token == Token.CURLYR and depth == 0):
+                return
+            self.index += 1
+            if token == Token.CURLYL:
+                depth += 1
+            elif token == Token.CURLYR:
+                depth -= 1
+                if depth == 0:
+                    break
+            elif token == Token.SEMICOLON and depth == 0:
+                break
+        self.consume(Token.NEWLINE)
 
     # end of helper methods
 
     # expression
-    def expression(self):
-        self.and_expression()
-        while self.consume(Token.OR):
-            self.and_expression()
-
-    def and_expression(self):
-        self.not_expression()
-        if self.consume(Token.AND):
-            self.not_expression()
-
-    def not_expression(self):
-        self.consume(Token.NOT)
-        self.comparison()
-
-    def comparison(self):
-        comp_ops = [
-            Token.LESS,
-            Token.GREAT,
-            Token.EQUAL,
-            Token.NOTEQUAL,
-            Token.GREATQ,
-            Token.LESSEQ,
-        ]
-        self.add_subtract()
-        # if there are multiple comparisons
-        while self.get_token() in comp_ops:
-            self.consume()
-            self.add_subtract()
-
-    def add_subtract(self):
-        self.multiply_div_mod()
-        while self.get_token() in [Token.ADD, Token.SUBTRACT]:
+    def expression(self, min_power=OR_POWER):
+        # precedence climbing over BINARY_POWERS: the operand and every
+        # operator binding at least min_power
+        if min_power <= NOT_POWER and self.get_token() == Token.NOT:
+            line, column = self.get_line_no(), self.get_column_no()
             self.consume()
-            self.multiply_div_mod()
-
-    def multiply_div_mod(self):
-        self.value()
-        while self.get_token() in [Token.MULTIPLY, Token.DIVIDE, Token.MODULO]:
+            node = Unary(Token.NOT, self.expression(COMPARISON_POWER), line, column)
+            ceiling = NOT_POWER
+        else:
+            node = self.value()
+            ceiling = sys.maxsize
+
+        # ceiling is the power of the last operator taken at this level, a
+        # tighter one after it was refused by its right operand (AND)
+        while True:
+            token = self.get_token()
+            power = BINARY_POWERS.get(token)
+            if power is None or power < min_power or power > ceiling:
+                break
+            if power == ceiling and token in NON_ASSOCIATIVE:
+                break
             self.consume()
-            self.value()
+            right = self.expression(power if token in RIGHT_ASSOCIATIVE else power + 1)
+            node = Binary(token, node, right, node.line, node.column)
+            ceiling = power
+        return node
 
     def value(self):
-        token = self.get_token()
-        if token in [
-            Token.IDENTIFIER,
-            Token.INTEGER,
-            Token.FLOAT,
-            Token.STRING,
-            Token.BOOLEAN,
-        ]:
-            self.consume()
+        lexeme, line, column, token = self.tokens[self.index]
+        if token == Token.IDENTIFIER:
+            self.index += 1
+            return Name(lexeme, line, column)
+        if token in LITERAL_VALUES:
+            node = self.literal()
+            self.index += 1
+            return node
         # expression
-        elif self.consume(Token.PARENLEFT):
-            self.expression()
-            if not self.consume(Token.PARENRIGHT):
-                self.print_error("Expected closing parenthesis ')' after the expression")
-        else:
-            self.print_error(f"Invalid value '{self.get_lexeme()}'")
-            os._exit(1)
+        if self.consume(Token.PARENLEFT):
+            node = self.expression()
+            self.expect(Token.PARENRIGHT, "Expected closing parenthesis ')' after the expression")
+            return node
+        self.error(f"Invalid value '{lexeme}'", VALUE_START)
+
+    def literal(self):
+        # the Literal of the current token, which is not consumed
+        lexeme, line, column, token = self.tokens[self.index]
+        try:
+            return Literal(LITERAL_VALUES[token](lexeme), token, line, column)
+        except ValueError:
+            self.error(f"Invalid number '{lexeme}'", VALUE_START)
 
     # end expression
 
     def output_statement(self):
+        line, column = self.get_line_no(), self.get_column_no()
         self.consume(Token.KEYWORD)
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the 'display' keyword")
+        self.expect(Token.PARENLEFT, "Expected '(' after the 'display' keyword")
 
         # execute the optional expression inside display function
+        value = None
         if self.get_token() != Token.PARENRIGHT:
-            self.expression()
+            value = self.expression()
 
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected ')' after the expression")
+        self.expect(Token.PARENRIGHT, "Expected ')' after the expression")
+        return Display(value, line, column)
 
     def in_statement(self):
         if not self.get_lexeme() == "input":
-            self.print_error("Expected 'input' keyword after the identifier")
+            self.error("Expected 'input' keyword after the identifier")
+        node = Input(self.get_line_no(), self.get_column_no())
         self.consume()
 
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the 'display' keyword")
+        self.expect(Token.PARENLEFT, "Expected '(' after the 'display' keyword")
 
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected ')' after the expression")
+        self.expect(Token.PARENRIGHT, "Expected ')' after the expression")
+        return node
 
-    def ass_statement(self):
+    def ass_statement(self, name, line, column):
         ass_ops = [Token.ASSIGNADD, Token.ASSIGNDIV, Token.ASSIGNMOD, Token.ASSIGNMULT, Token.ASSIGNSUB]
-        if self.get_token() not in ass_ops + [Token.ASSIGN]:
-            self.print_error("Available assignment operators are (=, +=, -=, *=, /=. %=)")
+        operator = self.get_token()
+        if operator not in ass_ops + [Token.ASSIGN]:
+            self.error("Available assignment operators are (=, +=, -=, *=, /=. %=)")
 
         if self.consume(Token.ASSIGN):
             if self.get_lexeme() == "input":
-                self.in_statement()
-                return
-        elif self.get_token() in ass_ops:
+                return Assign(name, operator, self.in_statement(), line, column)
+        elif operator in ass_ops:
             self.consume()
 
-        self.expression()
+        return Assign(name, operator, self.expression(), line, column)
 
-    def call_statement(self):
+    def call_statement(self, name, line, column):
         self.consume(Token.PARENLEFT)
 
         # optional arguments
+        arguments = []
         while self.get_token() != Token.PARENRIGHT:
-            self.expression()
+            arguments.append(self.expression())
             if not self.consume(Token.COMMA):
                 break
 
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected ')' after the function name")
+        self.expect(Token.PARENRIGHT, "Expected ')' after the function name")
+        return Call(name, arguments, line, column)
+
+    def dec_statement(self, declaration):
+        # the declaration comes with its first variable, still without a value
+        first = declaration.variables[0]
 
-    def dec_statement(self):
         # optional assignment declaration
         if self.consume(Token.ASSIGN):
             # input statement found
             if self.get_lexeme() == "input":
-                self.in_statement()
-                return
-            self.expression()
+                first.value = self.in_statement()
+                return declaration
+            first.value = self.expression()
 
         # more identifiers
         while self.consume(Token.COMMA):
-            if not self.consume(Token.IDENTIFIER):
-                self.print_error("Expected identifier after the comma")
+            variable = Variable(self.get_lexeme(), None, self.get_line_no(), self.get_column_no())
+            self.expect(Token.IDENTIFIER, "Expected identifier after the comma")
 
             # optional assignment declaration
             if self.consume(Token.ASSIGN):
-                self.expression()
-
-    def simple_statement(self):
-        if self.get_token() in [Token.ASSIGN, Token.COMMA]:
-            self.dec_statement()
+                variable.value = self.expression()
+            declaration.variables.append(variable)
+        return declaration
+
+    def simple_statement(self, declaration=None):
+        line, column = self.get_line_no(), self.get_column_no()
+        if declaration is not None:
+            node = self.dec_statement(declaration)
         elif self.get_lexeme() == "display":
-            self.output_statement()
+            node = self.output_statement()
         elif self.get_lexeme() == "dispatch":
             self.consume(Token.KEYWORD)
-            self.expression()
+            node = Dispatch(self.expression(), line, column)
         else:
+            name = self.get_lexeme()
             self.consume(Token.IDENTIFIER)
             if self.get_token() == Token.PARENLEFT:
-                self.call_statement()
+                node = self.call_statement(name, line, column)
             else:
-                self.ass_statement()
+                node = self.ass_statement(name, line, column)
 
-        if not self.consume(Token.SEMICOLON):
-            self.print_error("Expected semicolon after the statement")
+        self.expect(Token.SEMICOLON, "Expected semicolon after the statement")
         self.consume(Token.NEWLINE)
+        return node
 
     def if_statement(self):
         # if statement
+        line, column = self.get_line_no(), self.get_column_no()
         self.consume(Token.KEYWORD)
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the 'if' keyword")
+        self.expect(Token.PARENLEFT, "Expected '(' after the 'if' keyword")
 
-        self.expression()
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected ')' after the expression")
+        condition = self.expression()
+        self.expect(Token.PARENRIGHT, "Expected ')' after the expression")
         self.consume(Token.NEWLINE)
 
-        if not self.consume(Token.CURLYL):
-            self.print_error("Expected opening curly brace '{' after the expression")
+        self.expect(Token.CURLYL, "Expected opening curly brace '{' after the expression")
 
-        while self.get_token() != Token.CURLYR:
-            self.consume(Token.NEWLINE)
-            self.statement()
+        branches = [(condition, self.block_statements())]
 
-        if not self.consume(Token.CURLYR):
-            self.print_error("Expected closing curly brace '}' after the statement")
+        self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
         self.consume(Token.NEWLINE)
 
         # optional zero or more elseif statements
         while self.get_lexeme() == "elseif":
             self.consume(Token.KEYWORD)
-            if not self.consume(Token.PARENLEFT):
-                self.print_error("Expected '(' after the 'elseif' keyword")
+            self.expect(Token.PARENLEFT, "Expected '(' after the 'elseif' keyword")
 
-            self.expression()
-            if not self.consume(Token.PARENRIGHT):
-                self.print_error("Expected ')' after the expression")
+            condition = self.expression()
+            self.expect(Token.PARENRIGHT, "Expected ')' after the expression")
             self.consume(Token.NEWLINE)
 
-            if not self.consume(Token.CURLYL):
-                self.print_error("Expected opening curly brace '{' after the expression")
+            self.expect(Token.CURLYL, "Expected opening curly brace '{' after the expression")
 
-            while self.get_token() != Token.CURLYR:
-                self.consume(Token.NEWLINE)
-                self.statement()
+            branches.append((condition, self.block_statements()))
 
-            if not self.consume(Token.CURLYR):
-                self.print_error("Expected closing curly brace '}' after the statement")
+            self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
             self.consume(Token.NEWLINE)
 
         # optional else statement
+        orelse = None
         if self.get_lexeme() == "else":
             self.consume(Token.KEYWORD)
-            if not self.consume(Token.CURLYL):
-                self.print_error("Expected opening curly brace '{' after the 'else' keyword")
+            self.expect(Token.CURLYL, "Expected opening curly brace '{' after the 'else' keyword")
 
-            while self.get_token() != Token.CURLYR:
-                self.consume(Token.NEWLINE)
-                self.statement()
+            orelse = self.block_statements()
 
-            if not self.consume(Token.CURLYR):
-                self.print_error("Expected closing curly brace '}' after the statement")
+            self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
             self.consume(Token.NEWLINE)
+        return If(branches, orelse, line, column)
 
     def for_statement(self):
+        line, column = self.get_line_no(), self.get_column_no()
         self.consume(Token.KEYWORD)
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the 'for' keyword")
+        self.expect(Token.PARENLEFT, "Expected '(' after the 'for' keyword")
 
         if not self.get_lexeme() == "point":
-            self.print_error("Expected data type for initialization of the variable in the for loop")
+            self.error("Expected data type for initialization of the variable in the for loop")
         self.consume(Token.KEYWORD)
 
         # initialize the variable
         identifier = self.get_lexeme()
-        if not self.consume(Token.IDENTIFIER):
-            self.print_error("Expected identifier after the data type")
-        if not self.consume(Token.ASSIGN):
-            self.print_error("Expected '=' after the identifier")
-        if not self.consume(Token.INTEGER):
-            self.print_error(f"Expected integer value for variable {identifier}")
-        if not self.consume(Token.SEMICOLON):
-            self.print_error("Expected semicolon after the initialization")
+        self.expect(Token.IDENTIFIER, "Expected identifier after the data type")
+        self.expect(Token.ASSIGN, "Expected '=' after the identifier")
+        start = self.literal() if self.get_token() == Token.INTEGER else None
+        self.expect(Token.INTEGER, f"Expected integer value for variable {identifier}")
+        self.expect(Token.SEMICOLON, "Expected semicolon after the initialization")
 
         # condition
-        self.expression()
-        if not self.consume(Token.SEMICOLON):
-            self.print_error("Expected semicolon after the condition")
+        condition = self.expression()
+        self.expect(Token.SEMICOLON, "Expected semicolon after the condition")
 
         # increment
-        if not self.consume(Token.IDENTIFIER):
-            self.print_error(f"Expected the variable {identifier} for increment")
-        if not self.consume(Token.ADD):
-            self.print_error(f"Expected '++' unary for increment after the variable {identifier}")
+        increment = self.get_lexeme()
+        self.expect(Token.IDENTIFIER, f"Expected the variable {identifier} for increment")
+        self.expect(Token.ADD, f"Expected '++' unary for increment after the variable {identifier}")
 
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected closing ')' of the loop condition")
+        self.expect(Token.PARENRIGHT, "Expected closing ')' of the loop condition")
         self.consume(Token.NEWLINE)
 
-        if not self.consume(Token.CURLYL):
-            self.print_error("Expected opening curly brace '{' after the loop condition")
+        self.expect(Token.CURLYL, "Expected opening curly brace '{' after the loop condition")
 
-        while self.get_token() != Token.CURLYR:
-            self.consume(Token.NEWLINE)
-            self.statement()
+        body = self.block_statements()
 
-        if not self.consume(Token.CURLYR):
-            self.print_error("Expected closing curly brace '}' after the statement")
+        self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
+        return For(identifier, start, condition, increment, body, line, column)
 
     def while_statement(self):
+        line, column = self.get_line_no(), self.get_column_no()
         self.consume(Token.KEYWORD)
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the 'for' keyword")
+        self.expect(Token.PARENLEFT, "Expected '(' after the 'for' keyword")
 
-        self.expression()
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected ')' after the expression")
+        condition = self.expression()
+        self.expect(Token.PARENRIGHT, "Expected ')' after the expression")
         self.consume(Token.NEWLINE)
 
-        if not self.consume(Token.CURLYL):
-            self.print_error("Expected opening curly brace '{' after the loop condition")
+        self.expect(Token.CURLYL, "Expected opening curly brace '{' after the loop condition")
 
-        while self.get_token() != Token.CURLYR:
-            self.consume(Token.NEWLINE)
-            self.statement()
+        body = self.block_statements()
 
-        if not self.consume(Token.CURLYR):
-            self.print_error("Expected closing curly brace '}' after the statement")
+        self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
+        return While(condition, body, line, column)
 
     def do_while_statement(self):
+        line, column = self.get_line_no(), self.get_column_no()
         self.consume(Token.KEYWORD)
-        if not self.consume(Token.CURLYL):
-            self.print_error("Expected opening curly brace '{' after the loop condition")
+        self.expect(Token.CURLYL, "Expected opening curly brace '{' after the loop condition")
 
-        while self.get_token() != Token.CURLYR:
-            self.consume(Token.NEWLINE)
-            self.statement()
+        body = self.block_statements()
 
-        if not self.consume(Token.CURLYR):
-            self.print_error("Expected closing curly brace '}' after the statement")
+        self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
 
         if self.get_lexeme != "while" and not self.consume(Token.KEYWORD):
-            self.print_error("Expected 'while' keyword after the statement")
+            self.error("Expected 'while' keyword after the statement")
 
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the 'for' keyword")
+        self.expect(Token.PARENLEFT, "Expected '(' after the 'for' keyword")
 
-        self.expression()
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected ')' after the expression")
+        condition = self.expression()
+        self.expect(Token.PARENRIGHT, "Expected ')' after the expression")
 
-        if not self.consume(Token.SEMICOLON):
-            self.print_error("Expected semicolon after the statement")
+        self.expect(Token.SEMICOLON, "Expected semicolon after the statement")
+        return DoWhile(body, condition, line, column)
 
-    def function_statement(self):
-        if not self.consume(Token.PARENLEFT):
-            self.print_error("Expected '(' after the function name")
+    def function_statement(self, modifier, returns, name, line, column):
+        self.expect(Token.PARENLEFT, "Expected '(' after the function name")
 
         # optional parameters
         data_types = ["point", "party", "truth", "avatar", "figure"]
+        parameters = []
         while self.get_token() != Token.PARENRIGHT:
-            if self.get_lexeme() not in data_types:
-                self.print_error("Expected data type for the function parameter")
+            kind = self.get_lexeme()
+            if kind not in data_types:
+                self.error("Expected data type for the function parameter")
             self.consume(Token.KEYWORD)
-            if not self.consume(Token.IDENTIFIER):
-                self.print_error("Expected identifier after the data type")
+            parameters.append((kind, self.get_lexeme()))
+            self.expect(Token.IDENTIFIER, "Expected identifier after the data type")
             if not self.consume(Token.COMMA):
                 break
 
-        if not self.consume(Token.PARENRIGHT):
-            self.print_error("Expected closing ')' after the function name")
+        self.expect(Token.PARENRIGHT, "Expected closing ')' after the function name")
 
         # function body
-        if not self.consume(Token.CURLYL):
-            self.print_error("Expected opening curly brace '{' after the function name")
+        body_start = self.index
+        self.expect(Token.CURLYL, "Expected opening curly brace '{' after the function name")
 
-        while self.get_token() != Token.CURLYR:
-            self.consume(Token.NEWLINE)
-            self.statement()
+        body = self.block_statements()
 
-        if not self.consume(Token.CURLYR):
-            self.print_error("Expected closing curly brace '}' after the statement")
+        self.expect(Token.CURLYR, "Expected closing curly brace '}' after the statement")
+        if self.record_spans:
+            self.function_bodies.append((body_start, self.index - 1))
         self.consume(Token.NEWLINE)
+        return Function(modifier, returns, name, parameters, body, line, column)
 
     def compound_statement(self):
         lexeme = self.get_lexeme()
         if lexeme == "if":
-            self.if_statement()
+            return self.if_statement()
         elif lexeme == "for":
-            self.for_statement()
+            return self.for_statement()
         elif lexeme == "while":
-            self.while_statement()
+            return self.while_statement()
         elif lexeme == "do":
-            self.do_while_statement()
+            return self.do_while_statement()
+
+    def typed_statement(self, modifier, line, column):
+        # a declaration or a function, from its data type or return type on;
+        # line and column are those of the modifier or of the type
+        kind = self.get_lexeme()
+        # consume data type
+        self.consume(Token.KEYWORD)
+        variable = Variable(self.get_lexeme(), None, self.get_line_no(), self.get_column_no())
+        self.expect(Token.IDENTIFIER, "Expected identifier after the data type or return type")
+        if self.get_token() in [Token.ASSIGN, Token.COMMA]:
+            return self.simple_statement(Declaration(modifier, kind, [variable], line, column))
+        elif self.get_token() == Token.PARENLEFT:
+            return self.function_statement(modifier, kind, variable.name, line, column)
+        self.error("Invalid statement")
 
     def statement(self):
         lexeme = self.get_lexeme()
@@ -383,47 +611,174 @@ class Parser:
         modifiers = ["plaza", "incantation", "absolute"]
 
         if lexeme in ["display", "dispatch"] or self.get_token() == Token.IDENTIFIER:
-            self.simple_statement()
-            return
+            return self.simple_statement()
 
         if lexeme in ["if", "for", "while", "do"]:
-            self.compound_statement()
+            return self.compound_statement()
+        line, column = self.get_line_no(), self.get_column_no()
         # data type begins
-        elif lexeme in data_types:
-            # consume data type
-            self.consume(Token.KEYWORD)
-            if not self.consume(Token.IDENTIFIER):
-                self.print_error("Expected identifier after the data type or return type")
-            if self.get_token() in [Token.ASSIGN, Token.COMMA]:
-                self.simple_statement()
-            elif self.get_token() == Token.PARENLEFT:
-                self.function_statement()
-            else:
-                self.print_error("Invalid statement")
+        if lexeme in data_types:
+            return self.typed_statement(None, line, column)
         elif lexeme in modifiers:
-            # consume data type
+            # consume the modifier
             self.consume(Token.KEYWORD)
             if self.get_lexeme() in data_types:
-                # consume data type
-                self.consume(Token.KEYWORD)
-                if not self.consume(Token.IDENTIFIER):
-                    self.print_error("Expected identifier after the data type or return type")
-                if self.get_token() in [Token.ASSIGN, Token.COMMA]:
-                    self.simple_statement()
-                elif self.get_token() == Token.PARENLEFT:
-                    self.function_statement()
-                else:
-                    self.print_error("Invalid statement")
-            else:
-                self.print_error("Invalid statement")
-        else:
-            self.print_error("Statements should start with a keyword or an identifier")
+                return self.typed_statement(lexeme, line, column)
+            self.error("Invalid statement")
+        self.error("Statements should start with a keyword or an identifier", (Token.KEYWORD, Token.IDENTIFIER))
 
     def pytme_pl(self):
+        """Parse the whole token list.
+
+        Returns:
+            Ast.Program: the syntax tree, also kept in self.program; with
+                         syntax errors the statements that failed are left
+                         out of it and diagnostics has the errors
+        """
+        # token spans [start, end) of the top-level statements and the indexes
+        # of the braces of every function body, for parse_incremental
+        self.statement_spans = []
+        self.function_bodies = []
+        self.diagnostics = []
+        self.complete = False
+        self.index = 0
+        statements = []
+        # parsing makes no reference cycles, so the cyclic collector would only
+        # re-scan the growing tree over and over while it is being built
+        collecting = self.pause_gc and gc.isenabled()
+        if collecting:
+            gc.disable()
+        try:
+            self.top_level_statements(statements)
+        finally:
+            if collecting:
+                gc.enable()
+        self.complete = not self.diagnostics
+        self.program = Program(statements)
+        return self.program
+
+    def top_level_statements(self, statements):
+        # the top-level statements of pytme_pl, appended to statements
         while self.get_token() != Token.EOF:
-            self.statement()
+            start = self.index
+            node = self.recovering_statement()
+            if node is not None and self.keep_tree:
+                statements.append(node)
+            if self.index == start:
+                self.index += 1  # a '}' without its '{', reported by statement
             self.consume(Token.NEWLINE)
+            # the spans cover the statements before the first error
+            if self.record_spans and not self.diagnostics:
+                self.statement_spans.append((start, self.index))
+
+    def parse_incremental(self, first, old_end, new_end):
+        """Re-validate the token list after tokens[first:old_end] were replaced by tokens[first:new_end].
+
+        Builds on the previous pytme_pl() (or parse_incremental) on the same
+        token list, e.g. the lexemeList of an IncrementalLexer. An edit inside a
+        function body re-parses that body only; otherwise the top-level
+        statements are re-parsed from the first one the edit touches until a
+        statement ends on an old statement boundary after the edit. The
+        statements after it have the same tokens and are not looked at again.
+        The first syntax error raises ParseError, there is no recovery. The
+        statements are only re-validated, program is reset to None since the
+        positions in the old tree no longer hold.
+        """
+        self.program = None
+        delta = new_end - old_end
+        recover = self.recover
+        self.recover = False
+        try:
+            if self.complete:
+                # the innermost function body strictly around the edit
+                body = None
+                for open_brace, close_brace in self.function_bodies:
+                    if open_brace < first and old_end <= close_brace and (body is None or open_brace > body[0]):
+                        body = (open_brace, close_brace)
+                if body is not None and self.reparse_body(body, old_end, delta):
+                    return
+            self.reparse_statements(first, old_end, delta)
+        finally:
+            self.recover = recover
+
+    def reparse_body(self, body, old_end, delta):
+        # re-parse one function body, False if it no longer ends at its old '}'
+        open_brace, close_brace = body
+        old_bodies = self.function_bodies
+        self.function_bodies = []
+        self.index = open_brace + 1
+        try:
+            self.block_statements()
+        except (ParseError, IndexError):
+            self.index = -1  # an error is reported by reparse_statements
+        if self.index != close_brace + delta:
+            self.function_bodies = old_bodies
+            return False
+
+        def shift(span):
+            start, end = span
+            return (start + delta if start >= old_end else start, end + delta if end >= old_end else end)
+
+        inner = self.function_bodies
+        self.function_bodies = [other for other in old_bodies if not (open_brace < other[0] and other[1] < close_brace)]
+        if delta:
+            self.function_bodies = [shift(other) for other in self.function_bodies]
+            self.statement_spans = [shift(span) for span in self.statement_spans]
+        self.function_bodies += inner
+        return True
+
+    def reparse_statements(self, first, old_end, delta):
+        spans = self.statement_spans
+        old_bodies = self.function_bodies
+        # without an error, the old statements after the edit are known to be valid
+        was_complete = self.complete
+        # the first statement whose tokens, or the token after it it looked at, were replaced
+        k = bisect_left(spans, first, key=lambda span: span[1])
+        start = spans[k][0] if k < len(spans) else (spans[-1][1] if spans else 0)
+
+        new_spans = []
+        self.function_bodies = [body for body in old_bodies if body[1] < start]
+        self.complete = False
+        self.index = start
+        try:
+            while self.get_token() != Token.EOF:
+                statement_start = self.index
+                self.statement()
+                self.consume(Token.NEWLINE)
+                new_spans.append((statement_start, self.index))
+
+                # back on an old boundary after the edit: the rest is unchanged
+                old_next = self.index - delta
+                if not was_complete or old_next < old_end:
+                    continue
+                j = bisect_left(spans, old_next, key=lambda span: span[0])
+                if j < len(spans) and spans[j][0] == old_next:
+                    self.statement_spans = spans[:k] + new_spans + [(s + delta, e + delta) for s, e in spans[j:]]
+                    self.function_bodies += [(o + delta, c + delta) for o, c in old_bodies if o >= old_next]
+                    self.complete = True
+                    self.diagnostics = []
+                    return
+        except ParseError:
+            self.statement_spans = spans[:k] + new_spans
+            raise
+        self.statement_spans = spans[:k] + new_spans
+        self.complete = True
+        self.diagnostics = []
 
     def parse(self):
-        self.pytme_pl()
-        print("Parsing successful")
+        """Parse the program and print the outcome.
+
+        Every syntax error is printed as soon as it is found, so a streamed
+        parse reports it before the rest of the file is read.
+
+        Returns:
+            [Diagnostic]: every syntax error found, empty if parsing succeeded
+        """
+        self.report = print
+        try:
+            self.pytme_pl()
+        finally:
+            self.report = None
+        if not self.diagnostics:
+            print("Parsing successful")
+        return self.diagnostics
@@ -0,0 +1,214 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Per-phase instrumentation of a run of Main:
+#   python Main.py myfile.pyt --profile
+#   python Main.py myfile.pyt --profile-memory --profile-json profile.json
+# Every phase (read, lex, table, parse, ...) records its wall time, its CPU
+# time and the number of tokens it handled. With memory it also records the
+# peak memory traced while it ran, but tracemalloc slows the lexer down many
+# times over, so the times of such a run only compare with other such runs.
+#
+# RuleProfiler goes one level deeper and counts and times every grammar
+# method of a Parser:
+#   python Main.py myfile.pyt --trace-rules
+
+
+@contextmanager
+def noPhase(name):
+    # Profiler.phase of a run that is not profiled
+    yield {"tokens": None}
+
+
+class Profiler:
+    """Collects the measurements of consecutive phases.
+
+    Attributes:
+        phases : one dict per finished phase, in order
+        current : the name of the running phase, or None
+        memory : whether the peak memory of the phases is traced
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = []
+        self.current = None
+        self.counts = {"tokens": None}
+        self.wallStart = 0.0
+        self.cpuStart = 0.0
+        self.started = False
+
+    def start(self, name):
+        """Start a phase, the running one is stopped first."""
+        if self.current is not None:
+            self.stop()
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started = True
+            tracemalloc.reset_peak()
+        self.current = name
+        self.counts = {"tokens": None}
+        self.cpuStart = time.process_time()
+        self.wallStart = time.perf_counter()
+
+    def stop(self, tokens=None):
+        """Stop the running phase.
+
+        Args:
+            tokens (int): number of tokens the phase lexed, wrote or parsed,
+                          defaults to the count given through phase
+        """
+        wall = time.perf_counter() - self.wallStart
+        cpu = time.process_time() - self.cpuStart
+        if self.current is None:
+            return  # nothing running
+        if tokens is None:
+            tokens = self.counts["tokens"]
+        self.phases.append(
+            {
+                "phase": self.current,
+                "wallSeconds": wall,
+                "cpuSeconds": cpu,
+                "tokens": tokens,
+                "tokensPerSecond": tokens / wall if tokens is not None and wall > 0 else None,
+                "peakBytes": tracemalloc.get_traced_memory()[1] if self.memory else None,
+            }
+        )
+        self.current = None
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the body of a with statement as a phase.
+
+        The yielded dict takes the token count, e.g. counts["tokens"] = len(tokens).
+        """
+        self.start(name)
+        try:
+            yield self.counts
+        finally:
+            self.stop()
+
+    def finish(self):
+        """Stop the running phase and tracing, the measurements are kept."""
+        if self.current is not None:
+            self.stop()
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+
+    def report(self, sink):
+        """Write the phases as a table to a text sink."""
+        sink.write("PHASE        WALL (s)   CPU (s)     TOKENS    TOKENS/S   PEAK (MB)\n")
+        for phase in self.phases:
+            tokens = "" if phase["tokens"] is None else phase["tokens"]
+            rate = "" if phase["tokensPerSecond"] is None else f"{phase['tokensPerSecond']:.0f}"
+            peak = "" if phase["peakBytes"] is None else f"{phase['peakBytes'] / 1e6:.2f}"
+            sink.write(
+                f"{phase['phase']:10} {phase['wallSeconds']:10.4f} {phase['cpuSeconds']:9.4f} "
+                f"{tokens:>10} {rate:>11} {peak:>11}\n"
+            )
+        wall = sum(phase["wallSeconds"] for phase in self.phases)
+        cpu = sum(phase["cpuSeconds"] for phase in self.phases)
+        sink.write(f"{'total':10} {wall:10.4f} {cpu:9.4f}\n")
+
+    def writeJson(self, path, **details):
+        """Write the phases to a JSON file, with details such as the profiled file or the rules."""
+        with open(path, "w") as file:
+            json.dump(dict(details, phases=self.phases), file, indent=1)
+
+
+# Parser's grammar methods, in the order of grammar.ebnf
+PARSER_RULES = [
+    "pytme_pl",
+    "statement",
+    "simple_statement",
+    "output_statement",
+    "in_statement",
+    "ass_statement",
+    "call_statement",
+    "dec_statement",
+    "typed_statement",
+    "compound_statement",
+    "if_statement",
+    "for_statement",
+    "while_statement",
+    "do_while_statement",
+    "function_statement",
+    "expression",
+    "value",
+]
+
+
+class RuleProfiler:
+    """Counts and times the grammar methods of Parser instances.
+
+    attach replaces the rules of one parser with instance attributes wrapping
+    its bound methods, so the Parser class and parsers that are not attached
+    pay nothing. For every rule it keeps:
+        calls        : number of entries
+        tokens       : tokens consumed, counted once for recursive entries
+        seconds      : time inside the rule, counted once for recursive entries
+        selfSeconds  : time inside the rule but not inside another traced rule
+
+    Attributes:
+        rules : {rule name: [calls, tokens, seconds, selfSeconds]}
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.depths = {}  # active entries of every rule
+        self.children = []  # time spent in traced callees, per active entry
+
+    def attach(self, parser, rules=PARSER_RULES):
+        """Trace the rules of the parser, returns the parser."""
+        for name in rules:
+            setattr(parser, name, self.wrap(parser, name, getattr(parser, name)))
+        return parser
+
+    def wrap(self, parser, name, method):
+        stats = self.rules.setdefault(name, [0, 0, 0.0, 0.0])
+        depths = self.depths
+        children = self.children
+        clock = time.perf_counter
+
+        def traced(*args):
+            stats[0] += 1
+            depth = depths.get(name, 0)
+            depths[name] = depth + 1
+            index = parser.index
+            children.append(0.0)
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                elapsed = clock() - start
+                stats[3] += elapsed - children.pop()
+                if children:
+                    children[-1] += elapsed
+                depths[name] = depth
+                if depth == 0:
+                    stats[1] += parser.index - index
+                    stats[2] += elapsed
+
+        return traced
+
+    def records(self):
+        """The rules as dicts, the most expensive (self time) first."""
+        records = [
+            {"rule": name, "calls": calls, "tokens": tokens, "seconds": seconds, "selfSeconds": selfSeconds}
+            for name, (calls, tokens, seconds, selfSeconds) in self.rules.items()
+            if calls
+        ]
+        return sorted(records, key=lambda record: record["selfSeconds"], reverse=True)
+
+    def report(self, sink):
+        """Write the rules as a table to a text sink."""
+        sink.write("RULE                     CALLS     TOKENS   TOTAL (s)    SELF (s)\n")
+        for record in self.records():
+            sink.write(
+                f"{record['rule']:20} {record['calls']:9} {record['tokens']:10} "
+                f"{record['seconds']:11.4f} {record['selfSeconds']:11.4f}\n"
+            )
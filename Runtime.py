@@ -0,0 +1,286 @@
+import operator
+import sys
+import Ast
+from Lexer import Token
+
+# Semantics of running a Pytme program, shared by the tree-walking
+# Interpreter and the bytecode Compiler and VM so both agree on every result.
+#
+# Values are Python values of the declared types:
+#   point : int      figure : float     truth : bool
+#   party : str      avatar : str
+# A variable declared with a type always holds a value of that type: what is
+# stored in it (initial value, assignment, input(), argument) is converted.
+# Names that are only assigned (var = 5;) are untyped globals.
+#
+# Scopes: the top-level statements use globals, a function uses its
+# parameters and the variables it declares anywhere in its body, and any
+# other name in it is a global. Every declared variable exists from the start
+# of its scope with the default of its type. Functions are defined when their
+# statement runs and see their own variables and the globals only. The
+# modifiers (plaza, incantation, absolute) have no effect when running.
+#
+# Arithmetic is Python's with two exceptions: "+" with a party operand joins
+# the displayed forms of both operands, and "/" always divides exactly ("/_"
+# is the floor division). && and || short-circuit and give a truth.
+
+DATA_TYPES = ["point", "figure", "truth", "party", "avatar"]
+
+DEFAULTS = {"point": 0, "figure": 0.0, "truth": False, "party": "", "avatar": ""}
+
+# the nested calls a program may make before it fails
+MAX_CALL_DEPTH = 1000
+
+
+class PytmeError(Exception):
+    """A runtime error of a Pytme program.
+
+    Attributes:
+        message : what went wrong
+        line : line of the statement that failed, set by the engine running it
+    """
+
+    def __init__(self, message, line=None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.line = line
+
+    def __str__(self):
+        if self.line is None:
+            return f"Runtime Error: {self.message}"
+        return f"Runtime Error at line {self.line}: {self.message}"
+
+
+class Console:
+    """Where display writes and input() reads, the standard streams by default."""
+
+    def __init__(self, output=None, source=None) -> None:
+        self.output = output if output is not None else sys.stdout
+        self.source = source if source is not None else sys.stdin
+
+    def write(self, text):
+        # one line of display
+        self.output.write(text + "\n")
+
+    def input(self):
+        # one line without its line break, "" at the end of the input
+        return self.source.readline().rstrip("\r\n")
+
+
+def show(value):
+    """The text display writes for a value."""
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return "abyss"
+    try:
+        return str(value)
+    except ValueError:  # a point over sys.get_int_max_str_digits() digits
+        raise PytmeError("The result is too large to display") from None
+
+
+def typeName(value):
+    """The Pytme type of a value, for error messages."""
+    if isinstance(value, bool):
+        return "truth"
+    if isinstance(value, int):
+        return "point"
+    if isinstance(value, float):
+        return "figure"
+    if isinstance(value, str):
+        return "party"
+    return "abyss"
+
+
+def toPoint(value):
+    if type(value) is int:
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            raise PytmeError(f"Cannot convert '{value}' to point") from None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):  # TypeError for abyss
+        raise PytmeError(f"Cannot convert {show(value)} to point") from None
+
+
+def toFigure(value):
+    if type(value) is float:
+        return value
+    try:
+        return float(value)
+    except OverflowError:  # a point beyond the largest figure, which may be too long to show
+        raise PytmeError("The point is too large to convert to figure") from None
+    except (TypeError, ValueError):  # TypeError for abyss
+        raise PytmeError(f"Cannot convert '{show(value)}' to figure") from None
+
+
+def toTruth(value):
+    if isinstance(value, str):
+        if value in ("true", "false"):
+            return value == "true"
+        raise PytmeError(f"Cannot convert '{value}' to truth")
+    return bool(value)
+
+
+def toText(value):
+    if type(value) is str:
+        return value
+    return show(value)
+
+
+# the conversion to every data type, in the order of DATA_TYPES
+CONVERTERS = [toPoint, toFigure, toTruth, toText, toText]
+CONVERTER = dict(zip(DATA_TYPES, CONVERTERS))
+
+
+def convert(kind, value):
+    """The value converted to a data type, unchanged for None (untyped) and abyss."""
+    converter = CONVERTER.get(kind)
+    return value if converter is None else converter(value)
+
+
+def add(left, right):
+    try:
+        return left + right
+    except TypeError:
+        if isinstance(left, str) or isinstance(right, str):
+            return show(left) + show(right)
+        raise
+
+
+# the function of every binary operator but && and ||
+OPERATIONS = {
+    Token.ADD: add,
+    Token.SUBTRACT: operator.sub,
+    Token.MULTIPLY: operator.mul,
+    Token.DIVIDE: operator.truediv,
+    Token.MODULO: operator.mod,
+    Token.DIVFLOOR: operator.floordiv,
+    Token.EXPONENT: operator.pow,
+    Token.LESS: operator.lt,
+    Token.GREAT: operator.gt,
+    Token.LESSEQ: operator.le,
+    Token.GREATQ: operator.ge,
+    Token.EQUAL: operator.eq,
+    Token.NOTEQUAL: operator.ne,
+}
+
+SYMBOLS = {
+    Token.ADD: "+",
+    Token.SUBTRACT: "-",
+    Token.MULTIPLY: "*",
+    Token.DIVIDE: "/",
+    Token.MODULO: "%",
+    Token.DIVFLOOR: "/_",
+    Token.EXPONENT: "**",
+    Token.LESS: "<",
+    Token.GREAT: ">",
+    Token.LESSEQ: "<=",
+    Token.GREATQ: ">=",
+    Token.EQUAL: "==",
+    Token.NOTEQUAL: "!=",
+    Token.AND: "&&",
+    Token.OR: "||",
+    Token.NOT: "!",
+}
+
+# the binary operator of every compound assignment
+ASSIGN_OPERATORS = {
+    Token.ASSIGNADD: Token.ADD,
+    Token.ASSIGNSUB: Token.SUBTRACT,
+    Token.ASSIGNMULT: Token.MULTIPLY,
+    Token.ASSIGNDIV: Token.DIVIDE,
+    Token.ASSIGNMOD: Token.MODULO,
+}
+
+# the Python exceptions of an operation on values it does not apply to
+OPERATION_ERRORS = (TypeError, ValueError, ZeroDivisionError, OverflowError)
+
+
+def operationError(operator, left, right, error):
+    """The PytmeError of a binary operator that failed with one of OPERATION_ERRORS."""
+    symbol = SYMBOLS[operator]
+    if isinstance(error, ZeroDivisionError):
+        return PytmeError(f"Division by zero in '{symbol}'")
+    if isinstance(error, OverflowError):
+        return PytmeError(f"The result of '{symbol}' is too large")
+    return PytmeError(f"Cannot apply '{symbol}' to {typeName(left)} and {typeName(right)}")
+
+
+def binary(operator, left, right):
+    """Apply a binary operator of OPERATIONS."""
+    try:
+        return OPERATIONS[operator](left, right)
+    except OPERATION_ERRORS as error:
+        raise operationError(operator, left, right, error) from None
+
+
+def undefinedVariable(name):
+    return PytmeError(f"Undefined variable '{name}'")
+
+
+def undefinedFunction(name):
+    return PytmeError(f"Undefined function '{name}'")
+
+
+def argumentCount(name, parameters, arguments):
+    return PytmeError(f"Function '{name}' takes {parameters} arguments, {arguments} given")
+
+
+def tooDeep():
+    return PytmeError(f"More than {MAX_CALL_DEPTH} nested calls")
+
+
+def check(program):
+    """Raise the PytmeError of a program that cannot run, before running it.
+
+    A function whose parameters repeat a name is the only such error.
+    """
+    for node in Ast.walk(program):
+        if isinstance(node, Ast.Function):
+            names = [name for _, name in node.parameters]
+            for name in names:
+                if names.count(name) > 1:
+                    raise PytmeError(f"Parameter '{name}' of function '{node.name}' is declared twice", node.line)
+
+
+def declaredKinds(statements, kinds=None):
+    """The variables declared by statements and the blocks in them, as {name: data type}.
+
+    Function bodies are other scopes and are not looked into. A name keeps
+    the type of its first declaration.
+    """
+    kinds = {} if kinds is None else kinds
+    for node in statements:
+        if isinstance(node, Ast.Declaration):
+            for variable in node.variables:
+                kinds.setdefault(variable.name, node.kind)
+        elif isinstance(node, Ast.For):
+            kinds.setdefault(node.variable, "point")
+            declaredKinds(node.body, kinds)
+        elif isinstance(node, (Ast.While, Ast.DoWhile)):
+            declaredKinds(node.body, kinds)
+        elif isinstance(node, Ast.If):
+            for _, body in node.branches:
+                declaredKinds(body, kinds)
+            if node.orelse is not None:
+                declaredKinds(node.orelse, kinds)
+    return kinds
+
+
+def functionKinds(function):
+    """The parameters and declared variables of a function, as {name: data type}, parameters first."""
+    kinds = {}
+    for kind, name in function.parameters:
+        kinds.setdefault(name, kind)
+    return declaredKinds(function.body, kinds)
+
+
+def returnKind(function):
+    """The data type dispatched values are converted to, None for abyss."""
+    return function.returns if function.returns in CONVERTER else None
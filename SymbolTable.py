@@ -0,0 +1,189 @@
+import json
+import struct
+import sys
+from array import array
+from Lexer import Token, TokenList
+
+# Writers for the symbol table, the token report of a lexed file.
+#
+# Every writer takes a token stream (a TokenList, a list of
+# [lexeme, line, col, token] records or a generator such as
+# Lexer.iterTokens) and a sink (an open file, io.StringIO, sys.stdout).
+#
+#   text   : symboltable.txt, the human-readable table, streamed row by row
+#   jsonl  : one JSON object per token, streamed row by row
+#   binary : fixed-width kind/line/col columns plus a string table of lexemes
+#
+# readJsonl and readBinary load the machine formats back into a TokenList
+# that Parser can consume directly.
+
+FORMATS = ["text", "jsonl", "binary"]
+
+# file extension of each format
+EXTENSIONS = {"text": ".txt", "jsonl": ".jsonl", "binary": ".bin"}
+
+HEADER = "TOKEN                LINE#  COL#  \tLEXEME\n" + "=========================================================\n"
+
+# the padded TOKEN column of each token kind, computed once
+TOKEN_COLUMN = {token: f"{repr(str(token)):20} " for token in Token}
+
+
+def formatRow(lexeme, lineNumber, colNumber, token):
+    """Format one token as a row of symboltable.txt.
+
+    Args:
+        lexeme (string): the lexeme
+        lineNumber (int): line of the token
+        colNumber (int): column of the token
+        token (Token): kind of the token
+    """
+    # repr(str(n)) of a number is at least 3 characters wide, so LINE# and COL# are never padded
+    return f"{TOKEN_COLUMN[token]}'{lineNumber}'   '{colNumber}'   \t{lexeme!r}\n"
+
+
+def writeText(tokens, sink):
+    """Stream the symbol table of the tokens to a text sink.
+
+    Args:
+        tokens (iterable): [lexeme, line, col, token] records
+        sink (file): anything with a write() and writelines() method
+    """
+    sink.write(HEADER)
+    sink.writelines(formatRow(lexeme, lineNumber, colNumber, token) for lexeme, lineNumber, colNumber, token in tokens)
+
+
+def writeJsonl(tokens, sink):
+    """Stream the tokens to a text sink as JSON Lines.
+
+    Each line is an object {"token": name, "line": int, "col": int, "lexeme": string}.
+
+    Args:
+        tokens (iterable): [lexeme, line, col, token] records
+        sink (file): anything with a writelines() method
+    """
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    sink.writelines(
+        f'{{"token": "{token}", "line": {lineNumber}, "col": {colNumber}, "lexeme": {encode(lexeme)}}}\n'
+        for lexeme, lineNumber, colNumber, token in tokens
+    )
+
+
+def readJsonl(source):
+    """Load tokens written by writeJsonl.
+
+    Args:
+        source (iterable): lines of the JSON Lines file, e.g. the open file
+
+    Returns:
+        TokenList: the tokens
+    """
+    tokens = TokenList()
+    add = tokens.add
+    for line in source:
+        if line.strip():
+            record = json.loads(line)
+            add(record["lexeme"], record["line"], record["col"], Token[record["token"]])
+    return tokens
+
+
+# Binary token stream, all integers little-endian:
+#   MAGIC
+#   header        : token count, string count, byte size of the string blob (3 x uint32)
+#   kinds         : Token value of every token (uint8 each)
+#   lines         : line of every token (int32 each)
+#   cols          : column of every token (int32 each)
+#   lexemes       : string table index of every token (uint32 each)
+#   string sizes  : length in characters of every distinct lexeme (uint32 each)
+#   string blob   : all distinct lexemes concatenated, UTF-8
+MAGIC = b"PYTMETK1"
+BINARY_HEADER = struct.Struct("<III")
+
+
+def columnBytes(column):
+    """Little-endian bytes of an array column."""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def readColumn(typecode, data, offset, count):
+    """Read an array column of count items from data at offset."""
+    column = array(typecode)
+    column.frombytes(data[offset : offset + count * column.itemsize])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + count * column.itemsize
+
+
+def writeBinary(tokens, sink):
+    """Write the tokens to a binary sink in the compact binary format.
+
+    The header holds the token count, so a stream is collected into a
+    TokenList first.
+
+    Args:
+        tokens (iterable): a TokenList or [lexeme, line, col, token] records
+        sink (file): a file opened in binary mode
+    """
+    if not isinstance(tokens, TokenList):
+        tokens = TokenList(tokens)
+
+    stringIndex = {}
+    lexemeIndexes = array("I", [stringIndex.setdefault(lexeme, len(stringIndex)) for lexeme in tokens.lexemes])
+    strings = list(stringIndex)
+    blob = "".join(strings).encode("utf-8", "surrogatepass")
+
+    sink.write(MAGIC)
+    sink.write(BINARY_HEADER.pack(len(tokens), len(strings), len(blob)))
+    sink.write(columnBytes(tokens.kinds))
+    sink.write(columnBytes(tokens.lines))
+    sink.write(columnBytes(tokens.cols))
+    sink.write(columnBytes(lexemeIndexes))
+    sink.write(columnBytes(array("I", [len(string) for string in strings])))
+    sink.write(blob)
+
+
+def readBinary(source):
+    """Load tokens written by writeBinary.
+
+    Args:
+        source (file): the file opened in binary mode
+
+    Returns:
+        TokenList: the tokens
+    """
+    data = source.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a Pytme binary token stream")
+    offset = len(MAGIC)
+    tokenCount, stringCount, blobSize = BINARY_HEADER.unpack_from(data, offset)
+    offset += BINARY_HEADER.size
+
+    tokens = TokenList()
+    tokens.kinds, offset = readColumn("B", data, offset, tokenCount)
+    tokens.lines, offset = readColumn("i", data, offset, tokenCount)
+    tokens.cols, offset = readColumn("i", data, offset, tokenCount)
+    lexemeIndexes, offset = readColumn("I", data, offset, tokenCount)
+    sizes, offset = readColumn("I", data, offset, stringCount)
+    blob = data[offset : offset + blobSize].decode("utf-8", "surrogatepass")
+
+    strings = []
+    start = 0
+    for size in sizes:
+        strings.append(sys.intern(blob[start : start + size]))
+        start += size
+    tokens.lexemes = [strings[index] for index in lexemeIndexes]
+    return tokens
+
+
+def write(tokens, sink, format="text"):
+    """Write the tokens to the sink in one of FORMATS."""
+    if format == "text":
+        writeText(tokens, sink)
+    elif format == "jsonl":
+        writeJsonl(tokens, sink)
+    elif format == "binary":
+        writeBinary(tokens, sink)
+    else:
+        raise ValueError(f"Unknown symbol table format '{format}', expected one of {FORMATS}")
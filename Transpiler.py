@@ -0,0 +1,477 @@
+import ast
+import functools
+import sys
+import Ast
+from Compiler import LITERAL_KINDS, NUMBER_KINDS, TEXT_KINDS, compileProgram, resultKind
+from Lexer import Token
+import Runtime
+from Runtime import Console, PytmeError
+import VM
+
+# Translator of the Ast built by Parser into a Python module, compiled once
+# with compile() and run as a Python code object:
+#   Transpiler.run(parser.pytme_pl())
+#   print(Transpiler.source(parser.pytme_pl()))
+# The top-level statements become the function _program and every Pytme
+# function a Python function, so loops and arithmetic run as CPython
+# bytecode. The semantics are those of Runtime: stores into declared
+# variables are converted (skipped when the type is known, as in Compiler),
+# an operator is a Python operator when the types of its operands are known
+# to support it and a call of Runtime.binary otherwise.
+#
+# Variables are prefixed with v_ and functions with f_ so no Pytme name
+# clashes with Python or with the helpers, whose names start with "_". The
+# declared globals no function uses are local variables of _program, the
+# other globals live in the module namespace.
+#
+# Every generated statement and inline operator gets a line number of its
+# own, an index into Translation.locations, which holds the .pyt line (and
+# the operator) it stands for. A runtime error is reported with the location
+# of the innermost generated frame in its traceback; the checks a function
+# makes on entry use the line of its caller, like the other engines.
+#
+# CPython does not compile every program: blocks nest at most 20 deep and
+# long expressions exceed the recursion of compile(). run runs those on the
+# VM, which gives the same results.
+
+# the file name of the generated code, to find its frames in a traceback
+FILENAME = "<pytme>"
+
+# the location of the entry checks of a function, reported at the caller
+CALLER = (None, None)
+
+# the Python operators of the Pytme binary operators but && and ||
+BINARY_NODES = {
+    Token.ADD: ast.Add,
+    Token.SUBTRACT: ast.Sub,
+    Token.MULTIPLY: ast.Mult,
+    Token.DIVIDE: ast.Div,
+    Token.MODULO: ast.Mod,
+    Token.DIVFLOOR: ast.FloorDiv,
+    Token.EXPONENT: ast.Pow,
+}
+COMPARE_NODES = {
+    Token.LESS: ast.Lt,
+    Token.GREAT: ast.Gt,
+    Token.LESSEQ: ast.LtE,
+    Token.GREATQ: ast.GtE,
+    Token.EQUAL: ast.Eq,
+    Token.NOTEQUAL: ast.NotEq,
+}
+
+# the helper of every operator, Runtime.binary applied to it
+OPERATION_HELPERS = {operator: f"_{operator.name}" for operator in Runtime.OPERATIONS}
+CONVERTER_HELPERS = {kind: f"_to{kind.capitalize()}" for kind in Runtime.DATA_TYPES}
+
+
+class Translation:
+    """A program translated to Python.
+
+    Attributes:
+        module : the ast.Module defining _program
+        code : the code object of the module
+        locations : the (.pyt line, operator) of every line of the module
+        called : the names of the functions the program calls
+    """
+
+    __slots__ = ("module", "code", "locations", "called")
+
+    def __init__(self, module, code, locations, called) -> None:
+        self.module = module
+        self.code = code
+        self.locations = locations
+        self.called = called
+
+    def namespace(self, console):
+        # the globals the code runs in: the helpers, and a stand-in for every
+        # called function until its definition runs
+        names = {
+            "_write": console.write,
+            "_input": console.input,
+            "_show": Runtime.show,
+            "_bool": bool,
+            "_argumentCount": Runtime.argumentCount,
+            "_tooDeep": Runtime.tooDeep,
+            "_depth": 0,
+        }
+        for operator, helper in OPERATION_HELPERS.items():
+            names[helper] = functools.partial(Runtime.binary, operator)
+        for kind, helper in CONVERTER_HELPERS.items():
+            names[helper] = Runtime.CONVERTER[kind]
+        for name in self.called:
+            names["f_" + name] = undefinedFunction(name)
+        return names
+
+
+def undefinedFunction(name):
+    # the stand-in of a function that is not defined (yet), failing once the
+    # arguments are evaluated like a call in the other engines
+    def call(*arguments):
+        raise Runtime.undefinedFunction(name)
+
+    return call
+
+
+class Transpiler:
+    """Translates an Ast.Program into a Translation.
+
+    Attributes:
+        locations : the (.pyt line, operator) of every generated line
+        globalKinds : {name: data type} of the declared globals
+        shared : the global names functions use, which live in the module namespace
+    """
+
+    def __init__(self) -> None:
+        self.locations = [CALLER]  # Python lines start at 1
+        self.globalKinds = {}
+        self.shared = set()
+        self.called = set()
+        # the function being translated
+        self.localKinds = {}  # empty at the top level
+        self.returns = None
+        self.inFunction = False
+
+    def transpileProgram(self, program):
+        """The Translation of the program."""
+        self.globalKinds = Runtime.declaredKinds(program.statements)
+        for node in Ast.walk(program):
+            if isinstance(node, Ast.Function):
+                kinds = Runtime.functionKinds(node)
+                self.shared.update(name for name in scopeNames(node.body) if name not in kinds)
+            elif isinstance(node, Ast.Call):
+                self.called.add(node.name)
+
+        fast = [name for name in self.globalKinds if name not in self.shared]
+        line = self.locate(program.line)
+        body = self.declareGlobals(program.statements, fast, line)
+        # the declared globals exist from the start
+        for name, kind in self.globalKinds.items():
+            body.append(self.at(assign("v_" + name, ast.Constant(Runtime.DEFAULTS.get(kind))), line))
+        body += self.block(program.statements)
+        module = ast.Module(body=[self.at(define("_program", body), line)], type_ignores=[])
+        ast.fix_missing_locations(module)
+        code = compile(module, FILENAME, "exec")
+        return Translation(module, code, self.locations, sorted(self.called))
+
+    # locations
+    def locate(self, line, operator=None):
+        # a new line of the module, standing for line of the .pyt file
+        self.locations.append((line, operator))
+        return len(self.locations) - 1
+
+    def at(self, node, line):
+        # place a generated node on a line of the module
+        node.lineno = node.end_lineno = line
+        node.col_offset = node.end_col_offset = 0
+        return node
+
+    def declareGlobals(self, statements, local, line, extra=()):
+        # the global statement of a scope: the names it uses but local, and
+        # the functions it defines
+        names = sorted("v_" + name for name in set(scopeNames(statements)) if name not in local)
+        names += sorted({"f_" + node.name for node in scopeNodes(statements) if isinstance(node, Ast.Function)})
+        names += extra
+        return [self.at(ast.Global(names=names), line)] if names else []
+
+    def kindOf(self, name):
+        if name in self.localKinds:
+            return self.localKinds[name]
+        return self.globalKinds.get(name)
+
+    def convert(self, kind, valueKind, value):
+        # the value converted to the type of a variable, skipped as in Compiler
+        if kind not in Runtime.CONVERTER or kind == valueKind:
+            return value
+        if kind in TEXT_KINDS and valueKind in TEXT_KINDS:
+            return value
+        return call(CONVERTER_HELPERS[kind], value)
+
+    def store(self, name, value, valueKind, line):
+        return self.at(assign("v_" + name, self.convert(self.kindOf(name), valueKind, value)), line)
+
+    # statements
+    def block(self, statements):
+        body = []
+        for statement in statements:
+            body += self.statement(statement, self.locate(statement.line))
+        return body
+
+    def body(self, statements):
+        # a Python block, which may not be empty
+        return self.block(statements) or [ast.Pass()]
+
+    def statement(self, node, line):
+        # the Python statements of a statement, on line
+        kind = type(node)
+        if kind is Ast.Declaration:
+            statements = []
+            for variable in node.variables:
+                if variable.value is None:
+                    default = ast.Constant(Runtime.DEFAULTS.get(self.kindOf(variable.name)))
+                    statements.append(self.at(assign("v_" + variable.name, default), line))
+                else:
+                    statements.append(self.store(variable.name, *self.expression(variable.value, line), line))
+            return statements
+        if kind is Ast.Assign:
+            if node.operator == Token.ASSIGN:
+                value, valueKind = self.expression(node.value, line)
+            else:
+                target = (load("v_" + node.target), self.kindOf(node.target))
+                value, valueKind = self.operation(
+                    Runtime.ASSIGN_OPERATORS[node.operator], target, self.expression(node.value, line), line
+                )
+            return [self.store(node.target, value, valueKind, line)]
+        if kind is Ast.Call:
+            arguments = [self.expression(argument, line)[0] for argument in node.arguments]
+            return [self.at(ast.Expr(call("f_" + node.name, *arguments)), line)]
+        if kind is Ast.Display:
+            if node.value is None:
+                text = ast.Constant("")
+            else:
+                value, valueKind = self.expression(node.value, line)
+                text = value if valueKind in TEXT_KINDS else call("_show", value)
+            return [self.at(ast.Expr(call("_write", text)), line)]
+        if kind is Ast.Dispatch:
+            value, valueKind = self.expression(node.value, line)
+            if not self.inFunction:
+                # dispatch at the top level ends the program
+                return [self.at(ast.Return(value), line)]
+            value = self.convert(self.returns, valueKind, value)
+            return [
+                self.at(ast.Expr(value), line),  # calls are statements, the value is not used
+                self.at(ast.AugAssign(target=store("_depth"), op=ast.Sub(), value=ast.Constant(1)), line),
+                self.at(ast.Return(None), line),
+            ]
+        if kind is Ast.If:
+            orelse = None if node.orelse is None else self.body(node.orelse)
+            for condition, body in reversed(node.branches):
+                test = self.expression(condition, line)[0]
+                orelse = [self.at(ast.If(test=test, body=self.body(body), orelse=orelse or []), line)]
+            return orelse
+        if kind is Ast.For:
+            start = self.store(node.variable, ast.Constant(node.start.value), "point", line)
+            body = self.block(node.body)
+            value, valueKind = self.operation(
+                Token.ADD, (load("v_" + node.increment), self.kindOf(node.increment)), (ast.Constant(1), "point"), line
+            )
+            body.append(self.store(node.increment, value, valueKind, line))
+            test = self.expression(node.condition, line)[0]
+            return [start, self.at(ast.While(test=test, body=body, orelse=[]), line)]
+        if kind is Ast.While:
+            test = self.expression(node.condition, line)[0]
+            return [self.at(ast.While(test=test, body=self.body(node.body), orelse=[]), line)]
+        if kind is Ast.DoWhile:
+            body = self.block(node.body)
+            test = ast.UnaryOp(op=ast.Not(), operand=self.expression(node.condition, line)[0])
+            body.append(self.at(ast.If(test=test, body=[ast.Break()], orelse=[]), line))
+            return [self.at(ast.While(test=ast.Constant(True), body=body, orelse=[]), line)]
+        if kind is Ast.Function:
+            return [self.at(self.function(node), line)]
+        raise ValueError(f"Cannot translate {kind.__name__}")
+
+    def function(self, node):
+        # the Python function of a Pytme function, taking its arguments as
+        # _arguments so a wrong count is reported like the other engines
+        outer = (self.localKinds, self.returns, self.inFunction)
+        kinds = Runtime.functionKinds(node)
+        self.localKinds, self.returns, self.inFunction = kinds, Runtime.returnKind(node), True
+        count = len(node.parameters)
+        entry = self.locate(None)  # CALLER
+        arguments = load("_arguments")
+
+        body = self.declareGlobals(node.body, kinds, entry, ["_depth"])
+        given = call("len", arguments)
+        wrongCount = ast.Compare(left=given, ops=[ast.NotEq()], comparators=[ast.Constant(count)])
+        failure = call("_argumentCount", ast.Constant(node.name), ast.Constant(count), call("len", arguments))
+        body.append(self.at(ast.If(test=wrongCount, body=[ast.Raise(exc=failure)], orelse=[]), entry))
+        tooDeep = ast.Compare(left=load("_depth"), ops=[ast.GtE()], comparators=[ast.Constant(Runtime.MAX_CALL_DEPTH)])
+        body.append(self.at(ast.If(test=tooDeep, body=[ast.Raise(exc=call("_tooDeep"))], orelse=[]), entry))
+        body.append(self.at(ast.AugAssign(target=store("_depth"), op=ast.Add(), value=ast.Constant(1)), entry))
+        for slot, (kind, name) in enumerate(node.parameters):
+            argument = ast.Subscript(value=arguments, slice=ast.Constant(slot), ctx=ast.Load())
+            body.append(self.at(assign("v_" + name, call(CONVERTER_HELPERS[kind], argument)), entry))
+        for name, kind in list(kinds.items())[count:]:
+            body.append(self.at(assign("v_" + name, ast.Constant(Runtime.DEFAULTS.get(kind))), entry))
+
+        body += self.block(node.body)
+        end = self.locate(node.line)
+        body.append(self.at(ast.AugAssign(target=store("_depth"), op=ast.Sub(), value=ast.Constant(1)), end))
+        self.localKinds, self.returns, self.inFunction = outer
+        return define("f_" + node.name, body, "_arguments")
+
+    # expressions, each returns the Python expression and the data type of
+    # its value when it is known
+    def expression(self, node, line):
+        kind = type(node)
+        if kind is Ast.Literal:
+            return ast.Constant(node.value), LITERAL_KINDS.get(node.kind)
+        if kind is Ast.Name:
+            return load("v_" + node.name), self.kindOf(node.name)
+        if kind is Ast.Binary:
+            return self.binary(node, line)
+        if kind is Ast.Unary:
+            return ast.UnaryOp(op=ast.Not(), operand=self.expression(node.operand, line)[0]), "truth"
+        if kind is Ast.Input:
+            return call("_input"), "party"
+        raise ValueError(f"Cannot translate {kind.__name__}")
+
+    def binary(self, node, line):
+        # the operators of a chain like a + b + c, which nests to the left,
+        # are translated in a loop as in Compiler.binary
+        chain = []
+        while type(node) is Ast.Binary:
+            chain.append(node)
+            node = node.left
+        left = self.expression(node, line)
+        for node in reversed(chain):
+            operator = node.operator
+            right = self.expression(node.right, line)
+            if operator in (Token.AND, Token.OR):
+                value = ast.BoolOp(op=ast.And() if operator == Token.AND else ast.Or(), values=[left[0], right[0]])
+                left = call("_bool", value), "truth"
+            else:
+                left = self.operation(operator, left, right, line)
+        return left
+
+    def operation(self, operator, left, right, line):
+        # a binary operator applied to the translated operands left and right,
+        # given with their types
+        (leftNode, leftKind), (rightNode, rightKind) = left, right
+        kind = resultKind(operator, leftKind, rightKind)
+        texts = leftKind in TEXT_KINDS and rightKind in TEXT_KINDS
+        if not (
+            operator in (Token.EQUAL, Token.NOTEQUAL)
+            or (leftKind in NUMBER_KINDS and rightKind in NUMBER_KINDS)
+            or (texts and (operator in COMPARE_NODES or operator == Token.ADD))
+        ):
+            return call(OPERATION_HELPERS[operator], leftNode, rightNode), kind
+        # the operator cannot fail on the types, but on the values (division
+        # by zero), so it gets a line of its own to be reported with
+        located = self.locate(self.locations[line][0], operator)
+        if operator in COMPARE_NODES:
+            node = ast.Compare(left=leftNode, ops=[COMPARE_NODES[operator]()], comparators=[rightNode])
+        else:
+            node = ast.BinOp(left=leftNode, op=BINARY_NODES[operator](), right=rightNode)
+        return self.at(node, located), kind
+
+
+def scopeNodes(statements):
+    """The nodes of a scope, without the bodies of the functions defined in it."""
+    stack = list(reversed(statements))
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, Ast.Function):
+            stack.extend(reversed(list(Ast.children(node))))
+
+
+def scopeNames(statements):
+    """The variable names the statements of a scope use, in order and repeated."""
+    for node in scopeNodes(statements):
+        kind = type(node)
+        if kind is Ast.Name:
+            yield node.name
+        elif kind is Ast.Assign:
+            yield node.target
+        elif kind is Ast.Variable:
+            yield node.name
+        elif kind is Ast.For:
+            yield node.variable
+            yield node.increment
+
+
+# building Python nodes
+def load(name):
+    return ast.Name(id=name, ctx=ast.Load())
+
+
+def store(name):
+    return ast.Name(id=name, ctx=ast.Store())
+
+
+def assign(name, value):
+    return ast.Assign(targets=[store(name)], value=value)
+
+
+def call(function, *arguments):
+    return ast.Call(func=load(function), args=list(arguments), keywords=[])
+
+
+def define(name, body, vararg=None):
+    arguments = ast.arguments(
+        posonlyargs=[],
+        args=[],
+        vararg=None if vararg is None else ast.arg(arg=vararg),
+        kwonlyargs=[],
+        kw_defaults=[],
+        kwarg=None,
+        defaults=[],
+    )
+    return ast.FunctionDef(name=name, args=arguments, body=body or [ast.Pass()], decorator_list=[], returns=None)
+
+
+def transpile(program):
+    """The Translation of an Ast.Program, see Transpiler."""
+    return Transpiler().transpileProgram(program)
+
+
+def source(program):
+    """The Python source of an Ast.Program, for reading."""
+    return ast.unparse(transpile(program).module)
+
+
+def locate(error, locations):
+    # the (.pyt line, operator) of the innermost generated frame of the
+    # traceback of an error, skipping the entry checks of functions
+    found = []
+    traceback = error.__traceback__
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == FILENAME:
+            found.append(locations[traceback.tb_lineno])
+        traceback = traceback.tb_next
+    for line, operator in reversed(found):
+        if line is not None:
+            return line, operator
+    return None, None
+
+
+def execute(translation, console=None):
+    """Run a Translation, raises PytmeError on a runtime error."""
+    namespace = translation.namespace(console or Console())
+    exec(translation.code, namespace)
+    # a Pytme call is one Python call, and a few more in the helpers
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, Runtime.MAX_CALL_DEPTH * 2))
+    try:
+        namespace["_program"]()
+    except PytmeError as error:
+        if error.line is None:
+            error.line = locate(error, translation.locations)[0]
+        raise
+    except NameError as error:
+        # only variables are looked up by name, the functions have stand-ins
+        failure = Runtime.undefinedVariable(error.name[2:])
+        failure.line = locate(error, translation.locations)[0]
+        raise failure from None
+    except (ZeroDivisionError, OverflowError) as error:
+        line, operator = locate(error, translation.locations)
+        if operator is None:
+            raise
+        raise PytmeError(Runtime.operationError(operator, None, None, error).message, line) from None
+    except RecursionError:
+        raise Runtime.tooDeep() from None
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def run(program, console=None):
+    """Translate and run an Ast.Program, on the VM when CPython cannot compile it."""
+    Runtime.check(program)
+    try:
+        translation = transpile(program)
+    except (SyntaxError, RecursionError):
+        # more than 20 nested loops, or an expression nested deeper than
+        # compile() and the ast module recurse
+        VM.execute(compileProgram(program), console)
+        return
+    execute(translation, console)
@@ -0,0 +1,224 @@
+import Compiler
+from Compiler import (
+    ADD,
+    ADD_CONST,
+    BINARY,
+    BINARY_CONST,
+    BINARY_OPERATORS,
+    CALL,
+    CONST,
+    CONVERT,
+    DISPLAY,
+    FUNCTION,
+    HALT,
+    INCREMENT_GLOBAL,
+    INCREMENT_LOCAL,
+    INPUT,
+    JUMP,
+    JUMP_IF_FALSE,
+    JUMP_IF_FALSE_OR_POP,
+    JUMP_IF_TRUE,
+    JUMP_IF_TRUE_OR_POP,
+    LOAD_GLOBAL,
+    LOAD_LOCAL,
+    LOAD_UNTYPED,
+    NOT,
+    OPERATORS,
+    RETURN,
+    STORE_GLOBAL,
+    STORE_LOCAL,
+    TRUTH,
+)
+from Lexer import Token
+import Runtime
+from Runtime import Console, PytmeError
+
+# Stack virtual machine running the bytecode of Compiler:
+#   VM.run(parser.pytme_pl())
+# One loop fetches the opcode and argument of every instruction and
+# dispatches on the opcode with an if chain, the most frequent opcodes first.
+# The values are on one stack shared by all calls; a call saves the
+# instructions, constants, local variables and position of its caller on a
+# frame stack instead of recursing in Python, so the depth of Pytme calls
+# does not depend on the Python recursion limit. A runtime error is reported
+# with the line of the instruction that failed.
+
+# the initial value of the untyped globals, which fail to load until assigned
+UNSET = object()
+
+OPERATIONS = [Runtime.OPERATIONS[operator] for operator in BINARY_OPERATORS]
+
+
+class VirtualMachine:
+    """Runs the Code of a program.
+
+    Attributes:
+        console : the Runtime.Console of display and input()
+    """
+
+    def __init__(self, console=None) -> None:
+        self.console = console or Console()
+
+    def run(self, code):
+        """Run the Code of Compiler.compileProgram, raises PytmeError on a runtime error."""
+        write = self.console.write
+        read = self.console.input
+        show = Runtime.show
+        add = Runtime.add
+        converters = Runtime.CONVERTERS
+        operations = OPERATIONS
+        maxDepth = Runtime.MAX_CALL_DEPTH
+
+        globals_ = [UNSET] * len(code.globalNames)
+        functions = {}
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        frames = []
+
+        instructions = code.instructions
+        constants = code.constants
+        lines = code.lines
+        locals_ = []
+        pc = 0
+        opcode = argument = None
+        left = right = operation = None
+        try:
+            while True:
+                opcode = instructions[pc]
+                argument = instructions[pc + 1]
+                pc += 2
+                if opcode == LOAD_LOCAL:
+                    push(locals_[argument])
+                elif opcode == CONST:
+                    push(constants[argument])
+                elif opcode == STORE_LOCAL:
+                    locals_[argument] = pop()
+                elif opcode == LOAD_GLOBAL:
+                    push(globals_[argument])
+                elif opcode == BINARY_CONST:
+                    operation, right = constants[argument]
+                    left = stack[-1]
+                    stack[-1] = operation(left, right)
+                elif opcode == ADD_CONST:
+                    left = stack[-1]
+                    right = constants[argument]
+                    try:
+                        stack[-1] = left + right
+                    except TypeError:
+                        stack[-1] = add(left, right)  # joining party values
+                elif opcode == JUMP_IF_TRUE:
+                    if pop():
+                        pc = argument
+                elif opcode == STORE_GLOBAL:
+                    globals_[argument] = pop()
+                elif opcode == ADD:
+                    right = pop()
+                    left = stack[-1]
+                    try:
+                        stack[-1] = left + right
+                    except TypeError:
+                        stack[-1] = add(left, right)
+                elif opcode == BINARY:
+                    right = pop()
+                    left = stack[-1]
+                    stack[-1] = operations[argument](left, right)
+                elif opcode == INCREMENT_LOCAL:
+                    locals_[argument] += 1
+                elif opcode == INCREMENT_GLOBAL:
+                    globals_[argument] += 1
+                elif opcode == JUMP_IF_FALSE:
+                    if not pop():
+                        pc = argument
+                elif opcode == JUMP:
+                    pc = argument
+                elif opcode == CONVERT:
+                    stack[-1] = converters[argument](stack[-1])
+                elif opcode == LOAD_UNTYPED:
+                    value = globals_[argument]
+                    if value is UNSET:
+                        raise Runtime.undefinedVariable(code.globalNames[argument])
+                    push(value)
+                elif opcode == JUMP_IF_FALSE_OR_POP:
+                    if stack[-1]:
+                        pop()
+                    else:
+                        stack[-1] = False
+                        pc = argument
+                elif opcode == JUMP_IF_TRUE_OR_POP:
+                    if stack[-1]:
+                        stack[-1] = True
+                        pc = argument
+                    else:
+                        pop()
+                elif opcode == NOT:
+                    stack[-1] = not stack[-1]
+                elif opcode == TRUTH:
+                    stack[-1] = bool(stack[-1])
+                elif opcode == DISPLAY:
+                    if argument:
+                        value = pop()
+                        write(value if type(value) is str else show(value))
+                    else:
+                        write("")
+                elif opcode == CALL:
+                    name, count = constants[argument]
+                    function = functions.get(name)
+                    if function is None:
+                        raise Runtime.undefinedFunction(name)
+                    if count != function.parameters:
+                        raise Runtime.argumentCount(name, function.parameters, count)
+                    if len(frames) >= maxDepth:
+                        raise Runtime.tooDeep()
+                    frames.append((instructions, constants, lines, locals_, pc))
+                    start = len(stack) - count
+                    arguments = stack[start:]
+                    del stack[start:]
+                    for slot, converter in function.converters:
+                        arguments[slot] = converter(arguments[slot])
+                    locals_ = arguments + function.defaults
+                    instructions = function.instructions
+                    constants = function.constants
+                    lines = function.lines
+                    pc = 0
+                elif opcode == RETURN:
+                    pop()  # calls are statements, the value is not used
+                    instructions, constants, lines, locals_, pc = frames.pop()
+                elif opcode == INPUT:
+                    push(read())
+                elif opcode == FUNCTION:
+                    function = constants[argument]
+                    functions[function.name] = function
+                elif opcode == HALT:
+                    return
+                else:
+                    raise ValueError(f"Unknown opcode {opcode} at {pc - 2}")
+        except PytmeError as error:
+            if error.line is None:
+                error.line = lines[(pc - 2) // 2]
+            raise
+        except Runtime.OPERATION_ERRORS as error:
+            if opcode in (ADD, ADD_CONST):
+                raise operationError(Token.ADD, left, right, error, lines[(pc - 2) // 2]) from None
+            if opcode == BINARY_CONST:
+                raise operationError(OPERATORS[operation], left, right, error, lines[(pc - 2) // 2]) from None
+            if opcode == BINARY:
+                raise operationError(BINARY_OPERATORS[argument], left, right, error, lines[(pc - 2) // 2]) from None
+            raise
+
+
+def operationError(operator, left, right, error, line):
+    failure = Runtime.operationError(operator, left, right, error)
+    failure.line = line
+    return failure
+
+
+def execute(code, console=None):
+    """Run a Code with a VirtualMachine, see VirtualMachine.run."""
+    VirtualMachine(console).run(code)
+
+
+def run(program, console=None):
+    """Compile and run an Ast.Program."""
+    Runtime.check(program)
+    execute(Compiler.compileProgram(program), console)
@@ -0,0 +1,387 @@
+import io
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Interpreter  # noqa: E402
+from Lexer import Lexer  # noqa: E402
+import Optimizer  # noqa: E402
+from Parser import Parser  # noqa: E402
+from Runtime import Console, PytmeError  # noqa: E402
+import Transpiler  # noqa: E402
+import VM  # noqa: E402
+
+# The engines against each other, run from the repository root:
+#   python -m pytest tests
+# Every program runs on the tree-walking Interpreter, the bytecode VM and the
+# Python translation, as parsed and once optimized, and must print the same
+# lines and fail with the same runtime error on all of them.
+
+ENGINES = {"tree": Interpreter.run, "vm": VM.run, "python": Transpiler.run}
+
+
+def parse(source):
+    lexer = Lexer()
+    lexer.processText(source.splitlines(keepends=True))
+    parser = Parser(lexer.lexemeList)
+    program = parser.pytme_pl()
+    assert parser.diagnostics == []
+    return program
+
+
+def run(source, engine, optimize=False, stdin=""):
+    """The lines a program displays and its runtime error, None if it ends."""
+    program = parse(source)
+    if optimize:
+        Optimizer.optimize(program)
+    output = io.StringIO()
+    try:
+        ENGINES[engine](program, Console(output, io.StringIO(stdin)))
+    except PytmeError as error:
+        return output.getvalue().splitlines(), str(error)
+    return output.getvalue().splitlines(), None
+
+
+everyEngine = pytest.mark.parametrize("engine", ENGINES)
+optimized = pytest.mark.parametrize("optimize", [False, True], ids=["parsed", "optimized"])
+
+# (source, input, displayed lines, runtime error)
+PROGRAMS = {
+    "arithmetic": (
+        "point total = 7  ;\n"
+        "figure half = total  /  2  ;\n"
+        "display( total  /_  2  );\n"
+        "display( half );\n"
+        "display( total  %  4  );\n"
+        'display( "sum "  +  total );\n'
+        "display( total > 5  && half < 4  );\n"
+        'truth flag = "false" ;\n'
+        "display( flag || total < 0  );\n"
+        "party word = 3  ;\n"
+        "word += 4  ;\n"
+        "display( word );\n",
+        "",
+        ["3", "3.5", "3", "sum 7", "true", "false", "34"],
+        None,
+    ),
+    "loops": (
+        "point kk = 0  ;\n"
+        "point sum = 0  ;\n"
+        "while ( kk < 5  ) {\n"
+        "    sum += kk  ;\n"
+        "    kk += 1  ;\n"
+        "}\n"
+        "display( sum );\n"
+        "for ( point ii = 0  ; ii < 3  ; ii++ ){\n"
+        '    display( "for "  +  ii );\n'
+        "}\n"
+        "do {\n"
+        "    kk -= 1  ;\n"
+        " } while ( kk > 3  );\n"
+        "display( kk );\n"
+        "if ( sum > 100  ) {\n"
+        '    display( "big" );\n'
+        " } elseif ( sum > 5  ) {\n"
+        '    display( "medium" );\n'
+        " } else {\n"
+        '    display( "small" );\n'
+        "}\n",
+        "",
+        ["10", "for 0", "for 1", "for 2", "3", "medium"],
+        None,
+    ),
+    "functions": (
+        "point calls = 0  ;\n"
+        "point acc = 1  ;\n"
+        "plaza abyss fact( point nn){\n"
+        "    calls += 1  ;\n"
+        "    if ( nn > 1  ) {\n"
+        "        acc *= nn  ;\n"
+        "        fact( nn  -  1  );\n"
+        "    }\n"
+        "}\n"
+        "plaza abyss greet( party who , point times){\n"
+        "    figure scaled = times ;\n"
+        '    display( "hello "  +  who  +  " "  +  scaled );\n'
+        "}\n"
+        "fact( 10  );\n"
+        "display( acc );\n"
+        "display( calls );\n"
+        'greet( "pytme" , 2  );\n',
+        "",
+        ["3628800", "10", "hello pytme 2.0"],
+        None,
+    ),
+    "input": (
+        "point first = input();\n"
+        "figure second = input();\n"
+        "party third = input();\n"
+        "display( first  +  second );\n"
+        "display( third  +  first );\n"
+        "abyss nothing = input();\n"
+        "display( nothing );\n",
+        "12\n2.5\nabc\n",
+        ["14.5", "abc12", ""],
+        None,
+    ),
+    "division by zero": (
+        "point zero = 0  ;\ndisplay( 1  );\ndisplay( 5  /  zero );\n",
+        "",
+        ["1"],
+        "Runtime Error at line 3: Division by zero in '/'",
+    ),
+    "undefined variable": (
+        "plaza abyss show( point nn){\n    display( nn  +  missing );\n}\nshow( 1  );\n",
+        "",
+        [],
+        "Runtime Error at line 2: Undefined variable 'missing'",
+    ),
+    "undefined function": (
+        'display( "before" );\nnowhere( 1  );\n',
+        "",
+        ["before"],
+        "Runtime Error at line 2: Undefined function 'nowhere'",
+    ),
+    "argument count": (
+        "plaza abyss pair( point aa , point bb){\n    display( aa );\n}\npair( 1  );\n",
+        "",
+        [],
+        "Runtime Error at line 4: Function 'pair' takes 2 arguments, 1 given",
+    ),
+    "endless recursion": (
+        "plaza abyss forever(){\n    forever();\n}\nforever();\n",
+        "",
+        [],
+        "Runtime Error at line 2: More than 1000 nested calls",
+    ),
+    "abyss to point": (
+        "point num = nothing ;\nabyss nothing = 1  ;\n",
+        "",
+        [],
+        "Runtime Error at line 1: Cannot convert abyss to point",
+    ),
+    "text to truth": (
+        'truth flag = "maybe" ;\n',
+        "",
+        [],
+        "Runtime Error at line 1: Cannot convert 'maybe' to truth",
+    ),
+}
+
+
+@everyEngine
+@optimized
+@pytest.mark.parametrize("name", PROGRAMS)
+def test_programs(name, engine, optimize):
+    source, stdin, lines, error = PROGRAMS[name]
+    assert run(source, engine, optimize, stdin) == (lines, error)
+
+
+# squares 2 fourteen times, a point of 4933 digits
+SQUARED = (
+    "point big = 2  ;\n"
+    "point count = 0  ;\n"
+    "while ( count < 14  ) {\n"
+    "    big = big  *  big  ;\n"
+    "    count = count  +  1  ;\n"
+    "}\n"
+    "display( count );\n"
+)
+
+
+@everyEngine
+def test_points_too_long_to_display(engine):
+    assert run(SQUARED + "display( big );\n", engine) == (
+        ["14"],
+        "Runtime Error at line 8: The result is too large to display",
+    )
+    assert run(SQUARED + 'party joined = "n"  +  big ;\n', engine) == (
+        ["14"],
+        "Runtime Error at line 8: The result is too large to display",
+    )
+    assert run(SQUARED + "figure ratio = big ;\n", engine) == (
+        ["14"],
+        "Runtime Error at line 8: The point is too large to convert to figure",
+    )
+
+
+@everyEngine
+@optimized
+def test_long_flat_expressions(engine, optimize):
+    # one Binary per operator, nested to the left
+    names = " + ".join(["xx"] * 1000)
+    ones = "  +  ".join(["1"] * 500)
+    source = f"point xx = 1  ;\ndisplay( {names} );\ndisplay( {ones}  );\ndisplay( xx  +  {ones}  );\n"
+    assert run(source, engine, optimize) == (["1000", "500", "501"], None)
+
+
+@everyEngine
+def test_deeply_nested_loops(engine):
+    # CPython compiles at most 20 nested blocks
+    depth = 25
+    body = 'display( "inside" );\n'
+    for level in reversed(range(depth)):
+        body = f"while ( kk{level} < 1  ) {{\n{body}kk{level} = kk{level}  +  1  ;\n}}\n"
+    source = "".join(f"point kk{level} = 0  ;\n" for level in range(depth)) + body + 'display( "done" );\n'
+    assert run(source, engine) == (["inside", "done"], None)
+
+
+class RandomProgram:
+    """A random Pytme program of declarations, loops, ifs and functions.
+
+    Loops run a few times and the calls are bounded by the call depth, so
+    every program ends, most of them with a runtime error. Every other seed
+    uses only points and truths with + - * and no input(), so it runs
+    further.
+    """
+
+    OPERATORS = ["+", "-", "*", "/", "%", "/_"]
+    TYPES = ["point", "figure", "truth", "party", "avatar"]
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.count = 0
+        self.numbers = seed % 2 == 0
+        self.globals = []
+        self.functions = []
+
+    def name(self, prefix):
+        self.count += 1
+        return f"{prefix}{self.count}"
+
+    def literal(self):
+        chance = self.random.random()
+        if chance < 0.5 or (self.numbers and chance < 0.8):
+            return f"{self.random.randint(0, 20)} "
+        if chance < 0.65 and not self.numbers:
+            return f"{self.random.randint(0, 9)}.{self.random.randint(0, 9)} "
+        if chance < 0.8 and not self.numbers:
+            return f'"s{self.random.randint(0, 9)}"'
+        return self.random.choice(["true", "false"])
+
+    def value(self, names, depth):
+        chance = self.random.random()
+        if chance < 0.45 and names:
+            return self.random.choice(names)
+        if chance < 0.85 or depth <= 0:
+            return self.literal()
+        return f"( {self.expression(names, depth - 1)} )"
+
+    def arithmetic(self, names, depth):
+        written = self.value(names, depth)
+        operators = self.OPERATORS[:3] if self.numbers else self.OPERATORS
+        for _ in range(self.random.randint(0, 2)):
+            written += f" {self.random.choice(operators)}  {self.value(names, depth)}"
+        return written
+
+    def expression(self, names, depth=2):
+        written = self.arithmetic(names, depth)
+        if self.random.random() < 0.4:
+            written += f" {self.random.choice(['<', '>'])} {self.arithmetic(names, depth)}"
+        if self.random.random() < 0.15:
+            written += f" {self.random.choice(['&&', '||'])} {self.arithmetic(names, depth)}"
+        return written
+
+    def kind(self):
+        return self.random.choice(self.TYPES[:3] if self.numbers else self.TYPES)
+
+    def simple(self, names, indent, inFunction):
+        chance = self.random.random()
+        # the loop counters are only read, so every loop ends
+        assignable = [name for name in names if not name.startswith("ii")]
+        if chance < 0.3 and assignable:
+            operators = ["=", "=", "+=", "-=", "*="] if self.numbers else ["=", "=", "+=", "-=", "*=", "/=", "%="]
+            operator = self.random.choice(operators)
+            return [f"{indent}{self.random.choice(assignable)} {operator} {self.expression(names)} ;"]
+        if chance < 0.45:
+            name = self.name("vv")
+            names.append(name)
+            kind = "abyss" if self.random.random() < 0.15 and not self.numbers else self.kind()
+            return [f"{indent}{kind} {name} = {self.expression(names)} ;"]
+        if chance < 0.55 and assignable and not self.numbers:
+            return [f"{indent}{self.random.choice(assignable)} = input();"]
+        if chance < 0.65 and self.functions:
+            function, count = self.random.choice(self.functions)
+            if self.random.random() < 0.1:
+                count += 1  # a wrong argument count
+            arguments = " , ".join(self.expression(names, 1) for _ in range(count))
+            return [f"{indent}{function}( {arguments} );" if arguments else f"{indent}{function}();"]
+        if chance < 0.7 and inFunction:
+            return [f"{indent}dispatch {self.expression(names)} ;"]
+        if chance < 0.75:
+            return [f"{indent}{self.name('uu')} = {self.expression(names)} ;"]
+        return [f"{indent}display( {self.expression(names)} );"]
+
+    def block(self, names, level, depth, inFunction):
+        lines = []
+        for _ in range(self.random.randint(1, 3)):
+            lines += self.statement(names, level + 1, depth - 1, inFunction)
+        # a block may not end with a loop
+        return lines + self.simple(names, "    " * (level + 1), inFunction)
+
+    def statement(self, names, level, depth, inFunction):
+        indent = "    " * level
+        closer = indent or " "  # a "}" followed by more is never first on its line
+        chance = self.random.random() if depth > 0 else 1
+        if chance < 0.15:
+            lines = [f"{indent}if ( {self.expression(names)} ) {{"] + self.block(names, level, depth, inFunction)
+            for _ in range(self.random.randint(0, 2)):
+                lines += [f"{closer}}} elseif ( {self.expression(names)} ) {{"] + self.block(names, level, depth, inFunction)
+            if self.random.random() < 0.5:
+                lines += [f"{closer}}} else {{"] + self.block(names, level, depth, inFunction)
+            return lines + [f"{indent}}}"]
+        counter = self.name("ii")
+        names.append(counter)
+        if chance < 0.25:
+            header = f"{indent}for ( point {counter} = 0  ; {counter} < {self.random.randint(0, 4)}  ; {counter}++ ){{"
+            return [header] + self.block(names, level, depth, inFunction) + [f"{indent}}}"]
+        if chance < 0.32:
+            header = f"{indent}while ( {counter} < {self.random.randint(0, 4)}  ) {{"
+            body = self.block(names, level, depth, inFunction) + [f"{indent}    {counter} += 1  ;"]
+            return [f"{indent}point {counter} = 0  ;", header] + body + [f"{indent}}}"]
+        if chance < 0.37:
+            body = self.block(names, level, depth, inFunction) + [f"{indent}    {counter} += 1  ;"]
+            footer = f"{closer}}} while ( {counter} < {self.random.randint(0, 3)}  );"
+            return [f"{indent}point {counter} = 0  ;", f"{indent}do {{"] + body + [footer]
+        names.pop()
+        return self.simple(names, indent, inFunction)
+
+    def function(self):
+        name = self.name("ff")
+        parameters = [(self.kind(), self.name("pp")) for _ in range(self.random.randint(0, 3))]
+        written = " , ".join(f"{kind} {parameter}" for kind, parameter in parameters)
+        returns = self.random.choice(self.TYPES + ["abyss"])
+        header = f"plaza {returns} {name}( {written}){{" if written else f"plaza {returns} {name}(){{"
+        if self.random.random() < 0.5:
+            self.functions.append((name, len(parameters)))  # it may call itself
+        body = self.block([parameter for _, parameter in parameters] + self.globals, 0, 2, True)
+        if (name, len(parameters)) not in self.functions:
+            self.functions.append((name, len(parameters)))
+        return [header] + body + ["}"]
+
+    def program(self):
+        lines = []
+        for _ in range(self.random.randint(2, 5)):
+            name = self.name("gg")
+            self.globals.append(name)
+            lines.append(f"{self.kind()} {name} = {self.literal()} ;")
+        for _ in range(self.random.randint(4, 12)):
+            if self.random.random() < 0.25:
+                lines += self.function()
+            else:
+                lines += self.statement(self.globals, 0, 3, False)
+        return "".join(line + "\n" for line in lines)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_programs_agree(seed):
+    source = RandomProgram(seed).program()
+    stdin = "".join(random.Random(seed).choice(["12\n", "3.5\n", "true\n", "abc\n", "\n"]) for _ in range(50))
+    expected = run(source, "tree", stdin=stdin)
+    for engine in ENGINES:
+        for optimize in (False, True):
+            assert run(source, engine, optimize, stdin) == expected, (engine, optimize, source)
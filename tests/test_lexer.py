@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Lexer import IncrementalLexer, LineCounts  # noqa: E402
+
+# Regression tests of the Lexer, run from the repository root:
+#   python -m pytest tests
+
+
+def tokens(lexemeList):
+    return list(zip(lexemeList.lexemes, lexemeList.kinds, lexemeList.cols, lexemeList.lines))
+
+
+def test_line_counts_sum_the_lines_before_an_index():
+    generator = random.Random(1)
+    counts = [generator.randrange(5) for _ in range(100)]
+    lineCounts = LineCounts(counts)
+    for _ in range(200):
+        start = generator.randrange(len(counts))
+        stop = generator.randrange(start, min(start + 3, len(counts)) + 1)
+        size = stop - start if generator.random() < 0.5 else generator.randrange(4)
+        new = [generator.randrange(5) for _ in range(size)]
+        counts[start:stop] = new
+        lineCounts.replace(start, stop, new)
+        assert len(lineCounts) == len(counts)
+        assert all(lineCounts.prefix(index) == sum(counts[:index]) for index in range(len(counts) + 1))
+
+
+def test_updates_lex_like_the_whole_source():
+    lines = ["point total = 1  ;\n", "/* a\n", "comment */\n", 'party name = "pytme" ;\n', "display( total );\n"]
+    edits = [
+        (1, 2, ["/* still\n"]),
+        (0, 0, ["abyss nothing = 2  ;\n", "point more = 3  ;\n"]),
+        (3, 5, ["display( 4  );\n"]),
+        (2, 3, ["/* opened\n"]),
+        (0, 1, []),
+    ]
+    incremental = IncrementalLexer(lines)
+    for start, end, newLines in edits:
+        incremental.update(start, end, newLines)
+        lines[start:end] = newLines
+        assert tokens(incremental.lexemeList) == tokens(IncrementalLexer(lines).lexemeList)
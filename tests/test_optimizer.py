@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Lexer import Lexer  # noqa: E402
+import Optimizer  # noqa: E402
+from Parser import Parser  # noqa: E402
+
+# Regression tests of the Optimizer, run from the repository root:
+#   python -m pytest tests
+
+
+def optimize(source):
+    lexer = Lexer()
+    lexer.processText(source.splitlines(keepends=True))
+    program = Parser(lexer.lexemeList).pytme_pl()
+    return program, Optimizer.optimize(program)
+
+
+def test_removed_branches_report_nothing_inside_them():
+    program, changes = optimize(
+        "if ( 5 < 6  ) {\n"
+        '    display( "taken" );\n'
+        " } elseif ( 5 < 6  ) {\n"
+        "    display( 2  *  3  );\n"
+        "}\n"
+        "while ( 1  > 2  ) {\n"
+        "    display( 7  +  7  );\n"
+        "}\n"
+    )
+    assert changes == [
+        (1, "replaced the if by the branch of 5 < 6, which is always true"),
+        (6, "removed the while loop, its condition 1 > 2 is always false"),
+    ]
+    assert [statement.line for statement in program.statements] == [2]
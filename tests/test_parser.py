@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Ast import Display, Literal  # noqa: E402
+from Lexer import Lexer  # noqa: E402
+from Parser import Parser  # noqa: E402
+
+# Regression tests of the Parser, run from the repository root:
+#   python -m pytest tests
+
+
+def parse(source):
+    lexer = Lexer()
+    lexer.processText(source.splitlines(keepends=True))
+    parser = Parser(lexer.lexemeList)
+    parser.parse()
+    return parser
+
+
+def test_numerals_read_by_their_digit_value():
+    # the Lexer takes "²" for a digit, int() does not read it
+    parser = parse("display( ²  );\n")
+    assert parser.diagnostics == []
+    [display] = parser.program.statements
+    assert isinstance(display, Display)
+    assert isinstance(display.value, Literal) and display.value.value == 2
+
+
+def test_numerals_without_a_digit_value_are_syntax_errors():
+    parser = parse("display( ½  );\ndisplay( 1  );\n")
+    assert [(error.line, error.column, error.message) for error in parser.diagnostics] == [
+        (1, 10, "Invalid number '½'")
+    ]
+
+
+def test_streamed_parses_record_no_spans():
+    # a stream cannot be parsed again, its spans would only grow with the file
+    source = "plaza abyss fun(){\n    display( 1  );\n}\ndisplay( 2  );\n"
+    lexer = Lexer()
+    streamed = Parser(lexer.iterTokens(source.splitlines(keepends=True)), keep_tree=False)
+    streamed.parse()
+    assert streamed.diagnostics == []
+    assert streamed.statement_spans == [] and streamed.function_bodies == []
+    indexed = parse(source)
+    assert len(indexed.statement_spans) == 2 and len(indexed.function_bodies) == 1
+
+
+def test_streamed_errors_are_printed_before_the_end_of_the_file(capsys):
+    printed = []
+
+    def lines():
+        yield "display( 1  ;\n"
+        for _ in range(50):
+            yield "display( 2  );\n"
+        printed.append(capsys.readouterr().out)
+        yield "display( 3  );\n"
+
+    parser = Parser(Lexer().iterTokens(lines()), keep_tree=False)
+    parser.parse()
+    assert printed == ["Syntax Error at line 1 column 13: Expected ')' after the expression\n"]